@@ -5,8 +5,12 @@ class AdaptationAgent(BaseAgent):
     """
     Agent responsible for adapting the learning strategy based on progress.
     """
+    inputs = ("progress",)
+    outputs = ("strategy",)
+    # Works from the progress numbers, not the conversation
+    include_history = False
     
-    async def process(self, input_data: AgentInput) -> AgentOutput:
+    def build_prompt(self, input_data: AgentInput):
         # Context should contain user progress/history
         progress = input_data.context.get("progress", {})
         
@@ -16,12 +20,9 @@ class AdaptationAgent(BaseAgent):
             "Options: 'Increase Difficulty', 'Decrease Difficulty', 'Switch to Visuals', 'Maintain Pace'."
         )
         
-        raw_response = await self.call_llm(
-            system_prompt=system_prompt,
-            user_message="Analyze my progress and adapt.",
-            model_id=input_data.selected_model
-        )
-        
+        return system_prompt, "Analyze my progress and adapt."
+    
+    def build_output(self, input_data: AgentInput, raw_response: str) -> AgentOutput:
         return AgentOutput(
             response=raw_response,
             agent_name="adaptation_agent",
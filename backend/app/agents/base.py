@@ -1,22 +1,188 @@
-from abc import ABC, abstractmethod
-from app.schemas.base import AgentInput, AgentOutput
+from abc import ABC
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from app.schemas.base import AgentInput, AgentOutput, StreamEvent
 from app.core.model_router import ModelRouter
+from app.core.context_builder import ContextBuilder, PackedContext
+from app.core.routing_policy import ModelResult
+from app.core.scheduler import PRIORITY_INTERACTIVE, resolve_priority
+from app.core.tracing import span
 
 class BaseAgent(ABC):
+    # Whether identical prompts from this agent may be served from the ModelRouter response cache.
+    # Agents whose answers should vary per call can opt out by setting this to False.
+    use_cache: bool = True
+
+    # Whether the chat history from context["chat_history"] is sent along with the prompt.
+    # The memory profile summary is always included when present.
+    include_history: bool = True
+
+    # Whether prompts carrying memory or history (see PackedContext.personalized) go through
+    # the response cache. Off by default: the key covers the whole packed prompt, so nothing
+    # leaks across users, but history grows every turn and such prompts almost never repeat,
+    # so storing them mostly evicts the shared entries that do get hits. They are still
+    # coalesced while in flight, which merges duplicate submits of the same turn.
+    cache_personalized: bool = False
+
+    # Pipeline wiring (see core/pipeline.py): context keys this agent reads, and keys it produces
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+
     def __init__(self, model_router: ModelRouter):
         self.model_router = model_router
+        self.context_builder = ContextBuilder.from_env()
+
+    def build_prompt(self, input_data: AgentInput) -> Optional[Tuple[str, str]]:
+        """
+        Returns (system_prompt, user_message) for LLM backed agents.
+        Agents that don't call a model return None and override process().
+        """
+        return None
+
+    def build_output(self, input_data: AgentInput, raw_response: str) -> AgentOutput:
+        """
+        Wraps the raw model text into the agent's structured output.
+        """
+        raise NotImplementedError
+
+    def pack_context(self, input_data: AgentInput, system_prompt: str, user_message: str) -> PackedContext:
+        """
+        Fits the memory profile and chat history from the request context around this
+        agent's prompt, within the selected model's context window.
+        """
+        context = input_data.context or {}
+        return self.context_builder.pack(
+            self.model_router.get_context_window(input_data.selected_model or "gemini-pro"),
+            system_prompt,
+            user_message,
+            history=context.get("chat_history") if self.include_history else None,
+            memory_profile=context.get("memory_profile"),
+            summary=context.get("session_summary") if self.include_history else None
+        )
+
+    def cache_enabled(self, packed: PackedContext) -> bool:
+        """
+        Whether this call may use the response cache (see cache_personalized).
+        """
+        return self.use_cache and (self.cache_personalized or not packed.personalized)
+
+    @staticmethod
+    def request_priority(input_data: AgentInput) -> int:
+        """
+        Scheduling priority for this request's model calls; context["priority"] may be
+        "interactive" (default) or "batch" for research/benchmark jobs.
+        """
+        return resolve_priority((input_data.context or {}).get("priority"))
+
+    def extract_outputs(self, output: AgentOutput) -> Dict[str, Any]:
+        """
+        Maps this agent's output to the context keys declared in `outputs`,
+        for dependent pipeline steps. Defaults to the raw response text.
+        """
+        return {key: output.response for key in self.outputs}
 
-    @abstractmethod
     async def process(self, input_data: AgentInput) -> AgentOutput:
         """
         Process the input and return a structure output.
         """
-        pass
-    
-    async def call_llm(self, system_prompt: str, user_message: str, model_id: str = None) -> str:
+        prompt = self.build_prompt(input_data)
+        if prompt is None:
+            raise NotImplementedError(f"{type(self).__name__} must implement build_prompt or process")
+
+        packed = self.pack_context(input_data, *prompt)
+        with span("agent", agent=type(self).__name__):
+            result = await self.call_model(
+                system_prompt=packed.system_prompt,
+                user_message=packed.user_message,
+                model_id=input_data.selected_model,
+                priority=self.request_priority(input_data),
+                use_cache=self.cache_enabled(packed),
+                coalesce=self.use_cache
+            )
+            output = self.build_output(input_data, result.text)
+            return self.with_routing(output, {**result.metadata(), **packed.metadata()})
+
+    @staticmethod
+    def with_routing(output: AgentOutput, routing_metadata: Dict[str, Any]) -> AgentOutput:
+        """
+        Records which model actually answered (after fallback/hedging), and how its context
+        was packed, in the output metadata.
+        """
+        output.metadata = {**(output.metadata or {}), **routing_metadata}
+        return output
+
+    async def stream(self, input_data: AgentInput) -> AsyncIterator[StreamEvent]:
+        """
+        Streaming variant of process(). Yields "token" events while the model generates,
+        then a single "done" event carrying the assembled AgentOutput.
+        """
+        prompt = self.build_prompt(input_data)
+        if prompt is None:
+            # Non-LLM agents have nothing to stream, emit the full result at once
+            output = await self.process(input_data)
+            yield StreamEvent(type="token", content=output.response)
+            yield StreamEvent(type="done", output=output)
+            return
+
+        packed = self.pack_context(input_data, *prompt)
+        chunks = []
+        route: Dict[str, Any] = {}
+        with span("agent", agent=type(self).__name__):
+            async for chunk in self.stream_llm(
+                packed.system_prompt, packed.user_message, input_data.selected_model,
+                priority=self.request_priority(input_data), route=route,
+                use_cache=self.cache_enabled(packed)
+            ):
+                chunks.append(chunk)
+                yield StreamEvent(type="token", content=chunk)
+
+            output = self.build_output(input_data, "".join(chunks))
+        yield StreamEvent(type="done", output=self.with_routing(output, {**route, **packed.metadata()}))
+
+    async def call_llm(
+        self, system_prompt: str, user_message: str, model_id: str = None, priority: int = PRIORITY_INTERACTIVE
+    ) -> str:
         """
         Helper to call the model router.
         """
+        result = await self.call_model(system_prompt, user_message, model_id, priority)
+        return result.text
+
+    async def call_model(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model_id: str = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        use_cache: Optional[bool] = None,
+        coalesce: Optional[bool] = None
+    ) -> ModelResult:
+        """
+        Like call_llm, but also returns which model answered and how it was routed.
+        use_cache defaults to the agent's use_cache setting, coalesce to use_cache.
+        """
         # Default to a configured default or the input's preference
         selected_model = model_id or "gemini-pro"
-        return await self.model_router.generate_response(selected_model, system_prompt, user_message)
+        use_cache = self.use_cache if use_cache is None else use_cache
+        return await self.model_router.generate(
+            selected_model, system_prompt, user_message,
+            use_cache=use_cache, priority=priority, coalesce=use_cache if coalesce is None else coalesce
+        )
+
+    async def stream_llm(
+        self,
+        system_prompt: str,
+        user_message: str,
+        model_id: str = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        route: Optional[Dict[str, Any]] = None,
+        use_cache: Optional[bool] = None
+    ) -> AsyncIterator[str]:
+        """
+        Helper to stream from the model router.
+        """
+        selected_model = model_id or "gemini-pro"
+        async for chunk in self.model_router.stream_response(
+            selected_model, system_prompt, user_message,
+            use_cache=self.use_cache if use_cache is None else use_cache, priority=priority, route=route
+        ):
+            yield chunk
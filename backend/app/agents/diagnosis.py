@@ -1,15 +1,16 @@
+import re
 from app.agents.base import BaseAgent
 from app.schemas.base import AgentInput, AgentOutput
 
+LEVEL_PATTERN = re.compile(r"Level:\s*\**\s*(Beginner|Intermediate|Advanced)", re.IGNORECASE)
+
 class DiagnosisAgent(BaseAgent):
     """
     Agent responsible for assessing the user's knowledge level on a specific topic.
     """
+    outputs = ("user_level",)
     
-    async def process(self, input_data: AgentInput) -> AgentOutput:
-        user_message = input_data.message
-        context = input_data.context or {}
-        
+    def build_prompt(self, input_data: AgentInput):
         system_prompt = (
             "You are a Learning Diagnosis Agent. Your goal is to assess the user's "
             "understanding of the current topic. Analyze their input and categorize "
@@ -20,12 +21,9 @@ class DiagnosisAgent(BaseAgent):
             "Reasoning: [Reasoning]"
         )
         
-        raw_response = await self.call_llm(
-            system_prompt=system_prompt,
-            user_message=user_message,
-            model_id=input_data.selected_model
-        )
-        
+        return system_prompt, input_data.message
+    
+    def build_output(self, input_data: AgentInput, raw_response: str) -> AgentOutput:
         # In a real system, we'd parse the raw_response into structured data
         # For now, wrap text in AgentOutput
         
@@ -35,3 +33,8 @@ class DiagnosisAgent(BaseAgent):
             metadata={"type": "diagnosis"},
             next_action="update_memory" 
         )
+    
+    def extract_outputs(self, output: AgentOutput):
+        # Only pass a level on when the model followed the output format
+        match = LEVEL_PATTERN.search(output.response)
+        return {"user_level": match.group(1).capitalize()} if match else {}
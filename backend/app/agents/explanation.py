@@ -5,9 +5,10 @@ class ExplanationAgent(BaseAgent):
     """
     Agent responsible for explaining concepts tailored to the user's level.
     """
+    inputs = ("user_level",)
+    outputs = ("explanation",)
     
-    async def process(self, input_data: AgentInput) -> AgentOutput:
-        user_message = input_data.message
+    def build_prompt(self, input_data: AgentInput):
         context = input_data.context or {}
         user_level = context.get("user_level", "Beginner") # Default to Beginner if unknown
         
@@ -18,15 +19,13 @@ class ExplanationAgent(BaseAgent):
             "Avoid jargon unless explained."
         )
         
-        raw_response = await self.call_llm(
-            system_prompt=system_prompt,
-            user_message=user_message,
-            model_id=input_data.selected_model
-        )
-        
+        return system_prompt, input_data.message
+    
+    def build_output(self, input_data: AgentInput, raw_response: str) -> AgentOutput:
+        context = input_data.context or {}
         return AgentOutput(
             response=raw_response,
             agent_name="explanation_agent",
-            metadata={"user_level": user_level},
+            metadata={"user_level": context.get("user_level", "Beginner")},
             next_action="check_understanding" # Suggests triggering Socratic agent next
         )
@@ -1,23 +1,29 @@
 from app.agents.base import BaseAgent
 from app.schemas.base import AgentInput, AgentOutput
-from app.services.memory_service import MemoryService
+from app.db.database import AsyncSessionLocal
+from app.services.memory_service import AsyncMemoryService
+from app.services.persistence_queue import persistence_queue
 
 class MemoryAgent(BaseAgent):
     """
     Agent responsible for managing user memory. 
     It can summarize sessions and store key insights.
     """
-    def __init__(self, model_router):
-        super().__init__(model_router)
-        self.memory_service = MemoryService()
+    outputs = ("progress",)
+
+    def _resolve_user_id(self, input_data: AgentInput):
+        # Prefer the authenticated id injected by the chat endpoint over the client supplied one
+        user_id = str(input_data.context.get("user_id") or input_data.user_id)
+        return int(user_id) if user_id.isdigit() else None
 
     async def process(self, input_data: AgentInput) -> AgentOutput:
         # Action: 'retrieve' or 'store'
         action = input_data.context.get("action", "retrieve")
-        user_id = input_data.user_id
+        user_id = self._resolve_user_id(input_data)
         
         if action == "retrieve":
-            memory = self.memory_service.get_user_memory(user_id)
+            async with AsyncSessionLocal() as db:
+                memory = await AsyncMemoryService(db, write_queue=persistence_queue).get_user_memory(user_id)
             return AgentOutput(
                 response="Memory retrieved successfully.",
                 agent_name="memory_agent",
@@ -28,10 +34,16 @@ class MemoryAgent(BaseAgent):
             # If we want to store something, we might use the LLM to summarize it first
             # For now, just direct storage from context 'data'
             data_to_store = input_data.context.get("data", {})
-            self.memory_service.update_user_memory(user_id, data_to_store)
+            if user_id is not None:
+                # Written behind; later retrieves see it immediately
+                persistence_queue.update_user_memory(user_id, data_to_store)
             return AgentOutput(
                 response="Memory updated successfully.",
                 agent_name="memory_agent"
             )
         
         return AgentOutput(response="Unknown memory action.", agent_name="memory_agent")
+
+    def extract_outputs(self, output: AgentOutput):
+        memory = (output.metadata or {}).get("memory")
+        return {"progress": memory.get("progress", {})} if memory else {}
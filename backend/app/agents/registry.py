@@ -0,0 +1,53 @@
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterator, List
+from app.core.model_router import ModelRouter
+from app.agents.base import BaseAgent
+
+AgentFactory = Callable[[ModelRouter], BaseAgent]
+
+class AgentRegistry(Mapping):
+    """
+    Agents by name, each constructed on first access. Membership checks and the list of
+    names only need the registrations, so a process builds the agents its requests use
+    instead of every agent at startup.
+    """
+
+    def __init__(self, model_router: ModelRouter):
+        self.model_router = model_router
+        self._factories: Dict[str, AgentFactory] = {}
+        self._agents: Dict[str, BaseAgent] = {}
+
+    def register(self, name: str, factory: AgentFactory):
+        """
+        Registers an agent class (or any callable taking the model router).
+        """
+        self._factories[name] = factory
+        self._agents.pop(name, None)
+
+    def add(self, name: str, agent: BaseAgent):
+        """
+        Registers an already constructed agent.
+        """
+        self._factories[name] = lambda model_router: agent
+        self._agents[name] = agent
+
+    def __getitem__(self, name: str) -> BaseAgent:
+        agent = self._agents.get(name)
+        if agent is None:
+            agent = self._factories[name](self.model_router)
+            self._agents[name] = agent
+        return agent
+
+    def __contains__(self, name: object) -> bool:
+        # Mapping's default would construct the agent
+        return name in self._factories
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._factories)
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+    @property
+    def loaded(self) -> List[str]:
+        return list(self._agents)
@@ -5,21 +5,18 @@ class SocraticAgent(BaseAgent):
     """
     Agent responsible for asking guiding questions (Socratic Method).
     """
+    outputs = ("follow_up_question",)
     
-    async def process(self, input_data: AgentInput) -> AgentOutput:
-        user_message = input_data.message
+    def build_prompt(self, input_data: AgentInput):
         system_prompt = (
             "You are a Socratic Questioning Agent. Your goal is NOT to give the answer, "
             "but to ask a guiding question that helps the user discover the answer themselves. "
             "Based on the user's last message, formulate a single, thought-provoking question."
         )
         
-        raw_response = await self.call_llm(
-            system_prompt=system_prompt,
-            user_message=user_message,
-            model_id=input_data.selected_model
-        )
-        
+        return system_prompt, input_data.message
+    
+    def build_output(self, input_data: AgentInput, raw_response: str) -> AgentOutput:
         return AgentOutput(
             response=raw_response,
             agent_name="socratic_agent",
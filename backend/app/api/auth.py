@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from app.db import models
-from app.db.database import get_db
-from app.core.security import get_password_hash, verify_password, create_access_token, get_current_user
+from app.db.database import get_async_db
+from app.core.scheduler import SchedulerOverloaded
+from app.core.security import password_hasher, create_access_token, get_current_user
+from app.services.user_cache import CurrentUser, user_cache
 
 router = APIRouter()
 
@@ -25,21 +28,35 @@ class UserProfile(BaseModel):
     full_name: str
     preferences: dict
 
+def overloaded_exception(e: SchedulerOverloaded) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(int(e.retry_after))}
+    )
+
+# Async handlers: bcrypt runs on password_hasher's own pool, so a login storm
+# doesn't hold the default threadpool that sync handlers and DB calls need.
 @router.post("/register", response_model=Token)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(models.User.id).where(models.User.email == user.email))
+    if result.first():
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except SchedulerOverloaded as e:
+        raise overloaded_exception(e)
     new_user = models.User(
         email=user.email,
         hashed_password=hashed_password,
         full_name=user.full_name
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    # Drop anything cached under this email (e.g. a deleted and re-registered account)
+    user_cache.invalidate_user(new_user.id, new_user.email)
     
     access_token = create_access_token(data={"sub": new_user.email})
     return {
@@ -50,10 +67,15 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     # OAuth2PasswordRequestForm expects username field, usually mapped to email
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    result = await db.execute(select(models.User).where(models.User.email == form_data.username))
+    user = result.scalars().first()
+    try:
+        valid = user is not None and await password_hasher.verify(form_data.password, user.hashed_password)
+    except SchedulerOverloaded as e:
+        raise overloaded_exception(e)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -69,7 +91,7 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     }
 
 @router.get("/me", response_model=UserProfile)
-def read_users_me(current_user: models.User = Depends(get_current_user)):
+def read_users_me(current_user: CurrentUser = Depends(get_current_user)):
     return {
         "id": current_user.id,
         "email": current_user.email,
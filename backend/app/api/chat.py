@@ -1,79 +1,300 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+import os
+import json
+import logging
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.base import AgentInput, AgentOutput
 from app.core.orchestrator import AgentOrchestrator
-from app.core.security import get_current_user
+from app.core.app_state import get_orchestrator
+from app.core.scheduler import SchedulerOverloaded
+from app.core.routing_policy import ProviderError, ProviderUnavailable
+from app.api.research import log_research_event
+from app.core.tracing import span, timing_breakdown
+from app.core.security import get_current_user_async
 from app.db import models
-from app.db.database import get_db
-from app.services.memory_service import MemoryService
+from app.db.database import get_async_db, get_async_read_db
+from app.services.memory_service import AsyncMemoryService, encode_history_cursor
+from app.services.persistence_queue import persistence_queue
+from app.services.session_compactor import session_compactor
+from app.services.runtime_state import runtime_state
+from app.services.user_cache import CurrentUser
 from typing import Optional
 
-# Create global orchestrator (assuming stateless orchestrator logic, 
-# dependencies treated per request)
-orchestrator = AgentOrchestrator()
+# Most recent turns loaded into the agent context; agents keep as many as fit the
+# model's context window (see core/context_builder.py)
+HISTORY_CONTEXT_TURNS = int(os.getenv("CHAT_HISTORY_MAX_TURNS", "40"))
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/chat", response_model=AgentOutput)
-async def chat_endpoint(
-    input_data: AgentInput, 
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+def overloaded_exception(e: SchedulerOverloaded) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(int(e.retry_after))}
+    )
+
+# Provider errors can quote upstream responses, so clients get these and the details are logged
+PROVIDER_UNAVAILABLE_DETAIL = "No model is available to answer right now"
+PROVIDER_FAILED_DETAIL = "The model provider failed to answer"
+INTERNAL_ERROR_DETAIL = "The chat turn failed"
+
+def provider_exception(e: ProviderError) -> HTTPException:
     """
-    Authenticated Chat Endpoint.
-    1. Loads/Creates Chat Session.
-    2. Retrieves History.
-    3. Calls Orchestrator.
-    4. Saves Interaction.
+    503 when no model could be called (none configured), 502 when the providers were
+    called and failed.
+    """
+    logger.warning("Chat turn failed: %s", e)
+    if isinstance(e, ProviderUnavailable):
+        return HTTPException(status_code=503, detail=PROVIDER_UNAVAILABLE_DETAIL)
+    return HTTPException(status_code=502, detail=PROVIDER_FAILED_DETAIL)
+
+def ensure_known_model(input_data: AgentInput, orchestrator: AgentOrchestrator):
+    """
+    Rejects a model the router doesn't serve with a 400, and one none of whose candidates
+    is configured with a 503, before anything is scheduled, traced or saved for the turn.
+    """
+    model_id = input_data.selected_model
+    if model_id and not orchestrator.model_router.is_supported(model_id):
+        raise HTTPException(status_code=400, detail=f"Unknown model: {model_id}")
+    try:
+        orchestrator.model_router.ensure_available(model_id or "gemini-pro")
+    except ProviderError as e:
+        raise provider_exception(e)
+
+async def prepare_chat_turn(
+    input_data: AgentInput,
+    current_user: CurrentUser,
+    memory_service: AsyncMemoryService
+) -> models.ChatSession:
+    """
+    Shared setup for the blocking and streaming chat endpoints.
+    Resolves the session, injects history/user context and queues the user message.
     """
-    memory_service = MemoryService(db)
-    
     # 1. Resolve Session
     # For MVP, if input has session_id, verify ownership. If not, create new/use default.
     # We will use input_data.session_id as a string literal or ID.
     session_id = input_data.session_id
-    
-    session = None
-    if session_id and session_id.isdigit():
-        session = db.query(models.ChatSession).filter(models.ChatSession.id == int(session_id), models.ChatSession.user_id == current_user.id).first()
-    
-    if not session:
-        # Create new session if invalid or missing
-        session = memory_service.create_chat_session(current_user.id, title=input_data.message[:30])
-        # Update input with new session id so response matches
-        input_data.session_id = str(session.id)
-    
+
+    with span("session.resolve"):
+        session = None
+        if session_id and session_id.isdigit():
+            session = await memory_service.get_chat_session(int(session_id), current_user.id)
+
+        if not session:
+            # Create new session if invalid or missing
+            session = await memory_service.create_chat_session(current_user.id, title=input_data.message[:30])
+            # Update input with new session id so response matches
+            input_data.session_id = str(session.id)
+
     # 2. Retrieve History (Context)
-    # We can fetch last k messages to pass as context to the agent if needed.
-    # For now, we assume the Agent/Orchestrator might want them provided in input_data.context
-    history_msgs = memory_service.get_chat_history(session.id)
+    # The session summary stands in for compacted messages; only the turns after it are
+    # loaded (indexed keyset query), so this stays flat as the session grows
+    with span("history.load"):
+        summary = await memory_service.get_session_summary(session.id)
+        history_msgs = await memory_service.get_chat_history(
+            session.id, limit=HISTORY_CONTEXT_TURNS, after_id=summary.covered_until_id if summary else None
+        )
     history_context = [{"role": m.role, "content": m.content} for m in history_msgs]
-    
+
     if not input_data.context:
         input_data.context = {}
-    input_data.context["chat_history"] = history_context[-5:] # Last 5 turns
+    input_data.context["chat_history"] = history_context
+    if summary and summary.summary:
+        input_data.context["session_summary"] = summary.summary
     input_data.context["user_id"] = str(current_user.id) # Inject real user ID
-    
-    # Save User Message to DB
-    memory_service.add_chat_message(session.id, "user", input_data.message)
+
+    # Summarized into the system prompt (served from the user cache after the first turn)
+    with span("memory.load"):
+        input_data.context["memory_profile"] = await memory_service.get_user_memory(current_user.id)
+
+    # Save User Message (written behind, visible to history reads right away)
+    with span("persist.enqueue"):
+        await memory_service.add_chat_message(session.id, "user", input_data.message)
+
+    # Add research mode pref if set in user profile
+    if current_user.preferences and current_user.preferences.get("research_mode"):
+         input_data.context["research_mode"] = True
+
+    # Writes from here on are queued, so hand the connection back to the pool
+    # instead of holding it for the whole (slow) agent call.
+    await memory_service.db.close()
+
+    return session
+
+def attach_timing(input_data: AgentInput, output: AgentOutput):
+    """
+    Adds this request's per-phase timing breakdown to the output for research mode users.
+    """
+    if input_data.context.get("research_mode"):
+        output.metadata = {**(output.metadata or {}), "timing": timing_breakdown()}
+
+def log_chat_turn(input_data: AgentInput, output: AgentOutput):
+    """
+    Records the turn in the research log for users who have research mode on.
+    """
+    if not input_data.context.get("research_mode"):
+        return
+    log_research_event(
+        "agent_response",
+        {
+            "session_id": input_data.session_id,
+            "message": input_data.message,
+            "response": output.response,
+            "agent_name": output.agent_name,
+            "metadata": output.metadata
+        },
+        user_id=input_data.context.get("user_id")
+    )
+
+@router.post("/chat", response_model=AgentOutput)
+async def chat_endpoint(
+    input_data: AgentInput,
+    http_response: Response,
+    current_user: CurrentUser = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+    orchestrator: AgentOrchestrator = Depends(get_orchestrator)
+):
+    """
+    Authenticated Chat Endpoint.
+    1. Loads/Creates Chat Session.
+    2. Retrieves History.
+    3. Calls Orchestrator.
+    4. Saves Interaction.
+    """
+    ensure_known_model(input_data, orchestrator)
+    memory_service = AsyncMemoryService(db, write_queue=persistence_queue)
+    try:
+        persistence_queue.ensure_capacity()
+        session = await prepare_chat_turn(input_data, current_user, memory_service)
+    except SchedulerOverloaded as e:
+        raise overloaded_exception(e)
+    # Lets clients keep chatting in a session created by this call
+    http_response.headers["X-Session-Id"] = str(session.id)
 
     try:
         # 3. Process with Orchestrator
-        # Add research mode pref if set in user profile
-        if current_user.preferences and current_user.preferences.get("research_mode"):
-             input_data.context["research_mode"] = True
-             
-        response = await orchestrator.route_request(input_data)
-        
-        # 4. Save Assistant Response to DB
-        memory_service.add_chat_message(
-            session.id, 
-            "assistant", 
-            response.response, 
-            metadata={"agent_name": response.agent_name, "raw_metadata": response.metadata}
-        )
-        
+        with span("orchestrator"):
+            response = await orchestrator.route_request(input_data)
+        attach_timing(input_data, response)
+
+        # 4. Queue Assistant Response for the write-behind worker
+        with span("persist.enqueue"):
+            await memory_service.add_chat_message(
+                session.id,
+                "assistant",
+                response.response,
+                metadata={"agent_name": response.agent_name, "raw_metadata": response.metadata}
+            )
+        session_compactor.notify(session.id)
+        runtime_state.incr("chat_turns")
+        log_chat_turn(input_data, response)
+
         return response
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    except SchedulerOverloaded as e:
+        raise overloaded_exception(e)
+    except ProviderError as e:
+        raise provider_exception(e)
+    except Exception:
+        logger.exception("Chat turn failed")
+        raise HTTPException(status_code=500, detail=INTERNAL_ERROR_DETAIL)
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(
+    input_data: AgentInput,
+    format: str = "sse",
+    current_user: CurrentUser = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+    orchestrator: AgentOrchestrator = Depends(get_orchestrator)
+):
+    """
+    Streaming variant of /chat.
+    Sends tokens as they are generated, either as Server-Sent Events (format=sse)
+    or newline-delimited JSON (format=ndjson). The assembled assistant message is
+    persisted once the stream ends.
+    """
+    if format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'sse' or 'ndjson'")
+    ensure_known_model(input_data, orchestrator)
+
+    # Shed before committing to a 200 streaming response
+    memory_service = AsyncMemoryService(db, write_queue=persistence_queue)
+    try:
+        orchestrator.model_router.ensure_capacity(input_data.selected_model or "gemini-pro")
+        persistence_queue.ensure_capacity()
+        session = await prepare_chat_turn(input_data, current_user, memory_service)
+    except SchedulerOverloaded as e:
+        raise overloaded_exception(e)
+    session_id = session.id
+
+    def encode(payload: dict) -> str:
+        data = json.dumps(payload)
+        return f"data: {data}\n\n" if format == "sse" else data + "\n"
+
+    async def event_stream():
+        try:
+            async for event in orchestrator.stream_request(input_data):
+                if event.type == "done":
+                    output = event.output
+                    attach_timing(input_data, output)
+                    # Queued, so it doesn't depend on the request-scoped db session still being open
+                    persistence_queue.add_chat_message(
+                        session_id,
+                        "assistant",
+                        output.response,
+                        metadata={"agent_name": output.agent_name, "raw_metadata": output.metadata}
+                    )
+                    session_compactor.notify(session_id)
+                    runtime_state.incr("chat_turns")
+                    log_chat_turn(input_data, output)
+                    yield encode({"type": "done", "session_id": str(session_id), "output": output.model_dump()})
+                else:
+                    yield encode(event.model_dump(exclude_none=True))
+        except SchedulerOverloaded as e:
+            yield encode({"type": "error", "content": str(e), "retry_after": e.retry_after})
+        except ProviderError as e:
+            yield encode({"type": "error", "content": provider_exception(e).detail})
+        except Exception:
+            logger.exception("Streamed chat turn failed")
+            yield encode({"type": "error", "content": INTERNAL_ERROR_DETAIL})
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        event_stream(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/sessions/{session_id}/messages")
+async def get_session_messages(
+    session_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[str] = None,
+    current_user: CurrentUser = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Paginated chat history, newest page first.
+    Messages within a page are chronological; pass `next_cursor` as `before` to load older ones.
+    """
+    memory_service = AsyncMemoryService(db, write_queue=persistence_queue)
+    session = await memory_service.get_chat_session(session_id, current_user.id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    try:
+        rows = await memory_service.get_chat_history(session_id, limit=limit, before=before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "session_id": str(session_id),
+        "messages": [
+            {"id": r.id, "role": r.role, "content": r.content, "timestamp": r.timestamp.isoformat()}
+            for r in rows
+        ],
+        # A full page means there may be older messages
+        "next_cursor": encode_history_cursor(rows[0]) if len(rows) == limit else None
+    }
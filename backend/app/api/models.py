@@ -1,13 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from typing import List
 from app.schemas.base import ModelMetadata
 from app.core.model_router import ModelRouter
+from app.core.app_state import get_router
 
 router = APIRouter()
-model_router = ModelRouter()
 
 @router.get("/models", response_model=List[ModelMetadata])
-async def list_models():
+async def list_models(model_router: ModelRouter = Depends(get_router)):
     """
     List all available AI models supported by the system.
     """
@@ -20,3 +20,31 @@ async def get_current_model_config():
     """
     # For MVP, just return default
     return {"current_model": "gemini-pro"}
+
+@router.get("/models/cache")
+async def get_cache_stats(model_router: ModelRouter = Depends(get_router)):
+    """
+    Hit/miss/eviction counters for the response cache used by the agents.
+    """
+    return model_router.get_cache_stats()
+
+@router.get("/models/coalescing")
+async def get_coalescing_stats(model_router: ModelRouter = Depends(get_router)):
+    """
+    How many identical in-flight calls were folded into a single provider request.
+    """
+    return model_router.get_coalescing_stats()
+
+@router.get("/models/scheduler")
+async def get_scheduler_stats(model_router: ModelRouter = Depends(get_router)):
+    """
+    Per-provider/per-model admission control: in-flight calls, queue depth, wait times and shed counts.
+    """
+    return model_router.get_scheduler_stats()
+
+@router.get("/models/routing")
+async def get_routing_stats(model_router: ModelRouter = Depends(get_router)):
+    """
+    Rolling latency/error stats per model, plus hedge and fallback counters.
+    """
+    return model_router.get_routing_stats()
@@ -1,14 +1,20 @@
 from fastapi import APIRouter, Depends, Body, HTTPException
 from sqlalchemy.orm import Session
 from app.db import models
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.core.security import get_current_user
+from app.services.memory_service import MemoryService
+from app.services.persistence_queue import persistence_queue
+from app.services.user_cache import CurrentUser, user_cache
 from typing import Dict, Any
 
 router = APIRouter()
 
 @router.get("/profile")
-def get_profile(current_user: models.User = Depends(get_current_user)):
+def get_profile(
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
     """
     Get detailed profile with learning stats.
     """
@@ -17,25 +23,32 @@ def get_profile(current_user: models.User = Depends(get_current_user)):
         "full_name": current_user.full_name,
         "email": current_user.email,
         "preferences": current_user.preferences,
-        "memory_profile": current_user.memory_profile
+        # Merges memory updates still waiting in the write-behind queue
+        "memory_profile": MemoryService(db, write_queue=persistence_queue).get_user_memory(current_user.id)
     }
 
 @router.put("/profile/update")
 def update_profile(
     preferences: Dict[str, Any] = Body(None),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Update user preferences (e.g. model selection, research mode).
     """
-    if preferences:
-        # Deep merge or replace? For simple JSON, replace top keys.
-        current_prefs = dict(current_user.preferences or {})
-        current_prefs.update(preferences)
-        current_user.preferences = current_prefs
-        
-        db.add(current_user)
-        db.commit()
-    
-    return {"status": "updated", "preferences": current_user.preferences}
+    if not preferences:
+        return {"status": "updated", "preferences": current_user.preferences}
+
+    # current_user is a cached snapshot; update the row itself
+    user = db.get(models.User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # Deep merge or replace? For simple JSON, replace top keys.
+    current_prefs = dict(user.preferences or {})
+    current_prefs.update(preferences)
+    user.preferences = current_prefs
+    db.commit()
+    user_cache.invalidate_user(user.id, user.email)
+
+    return {"status": "updated", "preferences": user.preferences}
@@ -1,38 +1,175 @@
-from fastapi import APIRouter, Body
-from typing import List, Dict, Any
+import json
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
+from app.db import models
+from app.db.database import AsyncSessionLocal, get_async_db
+from app.core.app_state import AppState, get_app_state
+from app.services.research_log import research_log, decode_log_cursor, encode_log_cursor
+from app.services.runtime_state import runtime_state
+from app.services.benchmark import (
+    BenchmarkRunner, benchmark_config, create_benchmark_run, get_latest_benchmark_run, run_benchmark
+)
 
 router = APIRouter()
 
-# In-memory log store for research mode (persisted to file in real app)
-RESEARCH_LOGS = []
-RESEARCH_MODE = {"enabled": True}
+# Events go to the research log service (ring buffer flushed to JSONL segments).
+# The on/off switch is a shared runtime flag, so a toggle applies to every worker.
+RESEARCH_MODE_FLAG = "research_mode"
+RESEARCH_MODE_DEFAULT = True
+
+# Keeps background benchmark tasks referenced until they finish
+_benchmark_tasks = set()
+
+class BenchmarkRequest(BaseModel):
+    models: Optional[List[str]] = None # Defaults to every available model with an API key
+    prompt_set: Optional[Dict[str, List[Any]]] = None # Defaults to the built-in prompt set
+    concurrency: int = 4
+    repeats: int = 1
 
 @router.post("/research/enable")
 async def set_research_mode(enabled: bool = Body(..., embed=True)):
-    RESEARCH_MODE["enabled"] = enabled
+    await asyncio.to_thread(runtime_state.set_flag, RESEARCH_MODE_FLAG, enabled)
     return {"status": "updated", "research_mode": enabled}
 
+@router.get("/research/runtime")
+async def get_runtime_state():
+    """
+    Shared runtime flags, event counters summed over all workers, and the live workers.
+    """
+    return await asyncio.to_thread(runtime_state.stats)
+
 @router.get("/research/logs")
-async def get_research_logs():
-    return {"logs": RESEARCH_LOGS}
+async def get_research_logs(
+    type: Optional[str] = None,
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=10000),
+    format: str = "json"
+):
+    """
+    Research events, oldest first, filtered by event type, user and time range.
+    Pass `next_cursor` back as `cursor` for the next page. With format=ndjson the page is
+    streamed one event per line, followed by a final {"next_cursor": ...} line.
+    """
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+    if cursor:
+        try:
+            decode_log_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    filters = dict(
+        event_type=type,
+        user_id=user_id,
+        since=since.timestamp() if since else None,
+        until=until.timestamp() if until else None,
+        cursor=cursor,
+        limit=limit
+    )
+
+    if format == "ndjson":
+        def stream():
+            last, count = None, 0
+            for event in research_log.query(**filters):
+                last, count = event, count + 1
+                yield json.dumps(event) + "\n"
+            # A full page means there may be more
+            yield json.dumps({"next_cursor": encode_log_cursor(last) if count == limit else None}) + "\n"
+
+        # Sync iterator: Starlette runs it in a thread pool, keeping file reads off the event loop
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    logs = await asyncio.to_thread(lambda: list(research_log.query(**filters)))
+    return {
+        "logs": logs,
+        "next_cursor": encode_log_cursor(logs[-1]) if len(logs) == limit else None
+    }
+
+@router.get("/research/logs/stats")
+async def get_research_log_stats():
+    return await asyncio.to_thread(research_log.stats)
 
 @router.get("/research/compare")
-async def compare_models_mock():
+async def compare_models(db: AsyncSession = Depends(get_async_db)):
     """
-    Mock endpoint to demonstrate model comparison data structure.
+    Model comparison from the most recent completed benchmark run.
     """
+    run = await get_latest_benchmark_run(db)
+    if not run:
+        return {"run_id": None, "comparison": [], "detail": "No benchmark run yet, start one with POST /research/benchmarks"}
+
+    results = run.results or {}
     return {
+        "run_id": run.id,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
         "comparison": [
-            {"model": "gemini-pro", "accuracy": 0.85, "speed_ms": 1200},
-            {"model": "gpt-4", "accuracy": 0.92, "speed_ms": 2500},
-            {"model": "local-research", "accuracy": 0.60, "speed_ms": 400}
-        ]
+            {"model": model_id, "speed_ms": summary["latency_ms_p50"], **summary}
+            for model_id, summary in results.get("models", {}).items()
+        ],
+        "by_agent": results.get("agents", {}),
+        "recommended": results.get("recommended", {})
+    }
+
+@router.post("/research/benchmarks", status_code=202)
+async def start_benchmark(
+    request: BenchmarkRequest,
+    db: AsyncSession = Depends(get_async_db),
+    services: AppState = Depends(get_app_state)
+):
+    """
+    Starts a benchmark run in the background (batch priority, behind live chat traffic).
+    """
+    model_router = services.model_router
+    available = [m.id for m in model_router.get_available_models()]
+    unknown = [m for m in (request.models or []) if m not in available]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown models: {unknown}")
+
+    runner = BenchmarkRunner(
+        model_router,
+        services.orchestrator.agents, # Agents only supply prompts here
+        concurrency=max(1, request.concurrency),
+        repeats=max(1, request.repeats)
+    )
+    try:
+        runner.build_cases(request.prompt_set or {})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    model_ids = request.models or runner.default_models()
+    run = await create_benchmark_run(db, benchmark_config(runner, model_ids, request.prompt_set))
+
+    task = asyncio.create_task(
+        run_benchmark(runner, AsyncSessionLocal, model_ids, request.prompt_set, run_id=run.id)
+    )
+    _benchmark_tasks.add(task)
+    task.add_done_callback(_benchmark_tasks.discard)
+    return {"run_id": run.id, "status": run.status}
+
+@router.get("/research/benchmarks/{run_id}")
+async def get_benchmark(run_id: int, db: AsyncSession = Depends(get_async_db)):
+    run = await db.get(models.BenchmarkRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Benchmark run not found")
+    return {
+        "run_id": run.id,
+        "status": run.status,
+        "created_at": run.created_at.isoformat() if run.created_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+        "config": run.config,
+        "results": run.results
     }
     
-def log_research_event(event_type: str, data: Dict[str, Any]):
-    if RESEARCH_MODE["enabled"]:
-        RESEARCH_LOGS.append({
-            "type": event_type, 
-            "data": data, 
-            "timestamp": "iso-timestamp-placeholder"
-        })
+def log_research_event(event_type: str, data: Dict[str, Any], user_id: Optional[str] = None):
+    if runtime_state.get_flag(RESEARCH_MODE_FLAG, RESEARCH_MODE_DEFAULT):
+        # Only buffers in memory; written to disk by the research log flusher
+        research_log.append(event_type, data, user_id=user_id)
+        runtime_state.incr("research_events")
@@ -0,0 +1,25 @@
+from typing import Optional
+from fastapi import Request
+from app.core.model_router import ModelRouter, get_model_router
+from app.core.orchestrator import AgentOrchestrator
+
+class AppState:
+    """
+    The long-lived services request handlers need, created once per process in the app
+    lifespan (app.state.services) rather than at import time. Handlers reach them through
+    the dependencies below.
+    """
+
+    def __init__(self, model_router: Optional[ModelRouter] = None):
+        # The process-wide router, also used by the background workers
+        self.model_router = model_router or get_model_router()
+        self.orchestrator = AgentOrchestrator(self.model_router)
+
+def get_app_state(request: Request) -> AppState:
+    return request.app.state.services
+
+def get_orchestrator(request: Request) -> AgentOrchestrator:
+    return request.app.state.services.orchestrator
+
+def get_router(request: Request) -> ModelRouter:
+    return request.app.state.services.model_router
@@ -0,0 +1,202 @@
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from app.core.scheduler import estimate_tokens
+
+# Characters per token assumed by estimate_tokens(), used to cut text to a token count
+CHARS_PER_TOKEN = 4
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max(0, (max_tokens - 1) * CHARS_PER_TOKEN - 2)].rstrip() + " …"
+
+def _first_sentence(text: str, max_chars: int = 160) -> str:
+    text = " ".join(text.split())
+    for stop in (". ", "? ", "! "):
+        index = text.find(stop)
+        if 0 < index < max_chars:
+            return text[:index + 1]
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "…"
+
+def summarize_memory_profile(profile: Optional[Dict[str, Any]], max_items: int = 20) -> str:
+    """
+    Short text rendering of a memory profile for the prompt; long lists keep their most
+    recent items.
+    """
+    if not profile:
+        return ""
+
+    def recent(items: List[Any]) -> str:
+        shown = ", ".join(str(i) for i in items[-max_items:])
+        return shown + (f" (+{len(items) - max_items} earlier)" if len(items) > max_items else "")
+
+    lines = []
+    if profile.get("topics_learned"):
+        lines.append("Topics learned: " + recent(profile["topics_learned"]))
+    if profile.get("weak_areas"):
+        lines.append("Weak areas: " + recent(profile["weak_areas"]))
+    if profile.get("progress"):
+        lines.append("Progress: " + recent([f"{topic} {value}" for topic, value in profile["progress"].items()]))
+    for key, value in profile.items():
+        if key not in ("topics_learned", "weak_areas", "progress") and value not in (None, "", [], {}):
+            lines.append(f"{key}: {truncate_to_tokens(str(value), 50)}")
+    return "Learner profile:\n" + "\n".join(lines) if lines else ""
+
+def summarize_turns(turns: List[Dict[str, str]], max_tokens: int) -> str:
+    """
+    Extractive summary of older turns: the opening sentence of each, oldest first,
+    cut to max_tokens. Cheap enough to run on every request.
+    """
+    lines = [f"{'User' if t['role'] == 'user' else 'Tutor'}: {_first_sentence(t['content'])}" for t in turns]
+    return truncate_to_tokens("\n".join(lines), max_tokens)
+
+@dataclass
+class PackedContext:
+    system_prompt: str
+    user_message: str
+    budget: int
+    tokens: Dict[str, int] = field(default_factory=dict) # Per part: system, memory, history, summary, message
+    turns_included: int = 0
+    turns_summarized: int = 0
+    truncated: bool = False # A part had to be cut to fit
+    personalized: bool = False # Carries this user's memory or conversation, so the prompt isn't shared
+
+    @property
+    def tokens_used(self) -> int:
+        return sum(self.tokens.values())
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "context": {
+                "budget_tokens": self.budget,
+                "used_tokens": self.tokens_used,
+                "tokens": self.tokens,
+                "turns_included": self.turns_included,
+                "turns_summarized": self.turns_summarized,
+                "truncated": self.truncated
+            }
+        }
+
+class ContextBuilder:
+    """
+    Packs the agent's system prompt, a memory profile summary and as much recent chat history
+    as fits into a model's context window.
+
+    The budget is the model's context_window (times a safety margin for estimation error)
+    minus room reserved for the answer. The system prompt and current message always go in
+    (the message is cut if it alone overflows), then the memory summary, then turns from
+    newest to oldest. Turns that no longer fit are replaced by a short summary: the session
+    summary when one is passed in, otherwise an extractive one.
+
+    The agent's system prompt is sent unchanged, so it stays the same for every user and
+    request (one Gemini model per prompt, a stable prefix for provider-side caching). The
+    memory summary, conversation summary and history go into the user turn ahead of the
+    current message, so they reach every provider through the same (system_prompt,
+    user_message) call. A prompt carrying any of them is specific to one user and rarely
+    repeats, so agents don't store it in the response cache unless they opt in; it is still
+    coalesced while in flight (see `personalized` and BaseAgent.cache_personalized).
+    """
+
+    def __init__(
+        self,
+        reserve_output_tokens: int = 1024,
+        safety_margin: float = 0.9,
+        memory_max_tokens: int = 300,
+        summary_max_tokens: int = 300
+    ):
+        self.reserve_output_tokens = reserve_output_tokens
+        self.safety_margin = safety_margin
+        self.memory_max_tokens = memory_max_tokens
+        self.summary_max_tokens = summary_max_tokens
+
+    @classmethod
+    def from_env(cls) -> "ContextBuilder":
+        return cls(
+            reserve_output_tokens=int(os.getenv("CONTEXT_RESERVE_OUTPUT_TOKENS", "1024")),
+            safety_margin=float(os.getenv("CONTEXT_SAFETY_MARGIN", "0.9")),
+            memory_max_tokens=int(os.getenv("CONTEXT_MEMORY_MAX_TOKENS", "300")),
+            summary_max_tokens=int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", "300"))
+        )
+
+    def budget(self, context_window: int) -> int:
+        # Small windows keep at least three quarters for the prompt
+        reserve = min(self.reserve_output_tokens, context_window // 4)
+        return int(context_window * self.safety_margin) - reserve
+
+    def pack(
+        self,
+        context_window: int,
+        system_prompt: str,
+        user_message: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        memory_profile: Optional[Dict[str, Any]] = None,
+        summary: Optional[str] = None
+    ) -> PackedContext:
+        """
+        history is oldest first ([{"role", "content"}]); summary, if given, already covers
+        turns older than history.
+        """
+        budget = self.budget(context_window)
+        packed = PackedContext(system_prompt=system_prompt, user_message=user_message, budget=budget)
+
+        packed.tokens["system"] = estimate_tokens(system_prompt)
+        message_budget = max(1, budget - packed.tokens["system"])
+        if estimate_tokens(user_message) > message_budget:
+            user_message = truncate_to_tokens(user_message, message_budget)
+            packed.truncated = True
+        packed.tokens["message"] = estimate_tokens(user_message)
+        remaining = budget - packed.tokens["system"] - packed.tokens["message"]
+
+        memory_text = summarize_memory_profile(memory_profile)
+        if memory_text and remaining > 0:
+            memory_text = truncate_to_tokens(memory_text, min(self.memory_max_tokens, remaining))
+            packed.tokens["memory"] = estimate_tokens(memory_text)
+            remaining -= packed.tokens["memory"]
+        else:
+            memory_text = ""
+
+        turns = [f"{'User' if t['role'] == 'user' else 'Tutor'}: {t['content']}" for t in history or []]
+        turn_tokens = [estimate_tokens(t) for t in turns]
+        if summary or sum(turn_tokens) > remaining:
+            # Keep room for the summary of whatever doesn't fit
+            remaining -= min(self.summary_max_tokens, max(0, remaining // 4))
+
+        included: List[str] = []
+        for text, tokens in zip(reversed(turns), reversed(turn_tokens)):
+            if tokens > remaining:
+                if not included and remaining > 50:
+                    # The latest turn alone is too long: keep its beginning rather than nothing
+                    included.append(truncate_to_tokens(text, remaining))
+                    packed.truncated = True
+                break
+            included.append(text)
+            remaining -= tokens
+        included.reverse()
+        packed.turns_included = len(included)
+        packed.turns_summarized = len(turns) - len(included)
+        packed.tokens["history"] = sum(estimate_tokens(t) for t in included)
+
+        summary_budget = min(self.summary_max_tokens, budget - packed.tokens_used)
+        summary_parts = [summary] if summary else []
+        if packed.turns_summarized:
+            summary_parts.append(summarize_turns(history[:packed.turns_summarized], summary_budget))
+        summary = None
+        if summary_parts and summary_budget > 0:
+            summary = truncate_to_tokens("\n".join(summary_parts), summary_budget)
+            packed.tokens["summary"] = estimate_tokens(summary)
+
+        sections = []
+        if memory_text:
+            sections.append(memory_text)
+        if summary:
+            sections.append(f"Summary of earlier conversation:\n{summary}")
+        if included:
+            sections.append("Recent conversation:\n" + "\n".join(included))
+        if sections:
+            sections.append(f"Current message:\n{user_message}")
+            packed.user_message = "\n\n".join(sections)
+            packed.personalized = True
+        else:
+            packed.user_message = user_message
+        return packed
@@ -0,0 +1,331 @@
+import os
+import re
+import math
+import time
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTENTS = ("diagnosis", "explanation", "socratic", "adaptation")
+
+# Phrases that strongly signal an intent; each match adds RULE_WEIGHT to its score
+KEYWORD_RULES: Dict[str, List[str]] = {
+    "diagnosis": [
+        r"\b(test|quiz|assess|evaluate|check) (me|my)\b",
+        r"\bwhat('s| is) my (level|understanding)\b",
+        r"\bhow (well|much) do i (know|understand)\b",
+        r"\bi think\b", r"\bmy understanding\b", r"\bam i (right|correct)\b",
+        r"\bis (it|this|that) (true|correct|right) that\b"
+    ],
+    "explanation": [
+        r"\b(explain|define|describe)\b", r"\bwhat (is|are|does)\b", r"\bhow (does|do|is|are)\b",
+        r"\bwhy (does|do|is|are)\b", r"\bdifference between\b", r"\bexample of\b", r"\bteach me\b"
+    ],
+    "socratic": [
+        r"\b(guide|walk) me\b", r"\bhelp me (figure|work|think|reason)\b", r"\bdon'?t (tell|give) me\b",
+        r"\b(hint|clue)\b", r"\bask me\b", r"\bwithout (telling|giving)\b", r"\bwhere did i go wrong\b"
+    ],
+    "adaptation": [
+        r"\bmy progress\b", r"\btoo (hard|easy|fast|slow|difficult)\b", r"\b(slow|speed) (it )?(down|up)\b",
+        r"\bchange (the )?(pace|difficulty|approach|plan)\b", r"\b(learning|study) (plan|strategy|path)\b",
+        r"\bwhat should i (learn|study) next\b", r"\b(more|fewer) (visuals|examples|exercises)\b"
+    ]
+}
+RULE_WEIGHT = 0.25
+
+# Seed training data; fit_from_logs() adds explicitly routed turns from chat history
+DEFAULT_EXAMPLES: List[Tuple[str, str]] = [
+    ("I think entropy is just how messy a room is", "diagnosis"),
+    ("Can you test my understanding of recursion?", "diagnosis"),
+    ("Quiz me on linear algebra", "diagnosis"),
+    ("How well do I know SQL joins?", "diagnosis"),
+    ("I believe photosynthesis happens in the roots, am I right?", "diagnosis"),
+    ("Is it true that heavier objects fall faster?", "diagnosis"),
+    ("Check my understanding: a pointer stores a value directly", "diagnosis"),
+    ("What's my level in probability?", "diagnosis"),
+    ("My understanding is that TCP is connectionless", "diagnosis"),
+    ("Assess how much I know about neural networks", "diagnosis"),
+    ("What is a hash table?", "explanation"),
+    ("Explain how backpropagation works", "explanation"),
+    ("How does public key encryption work?", "explanation"),
+    ("Why is quicksort O(n log n) on average?", "explanation"),
+    ("What's the difference between a process and a thread?", "explanation"),
+    ("Define eigenvalue", "explanation"),
+    ("Can you describe how vaccines train the immune system?", "explanation"),
+    ("Give me an example of polymorphism", "explanation"),
+    ("What are closures in JavaScript?", "explanation"),
+    ("Teach me the basics of supply and demand", "explanation"),
+    ("Help me figure out why my loop never ends, but don't tell me the answer", "socratic"),
+    ("Guide me through solving this integral step by step", "socratic"),
+    ("Give me a hint for this proof", "socratic"),
+    ("Ask me questions so I can work out how binary search works", "socratic"),
+    ("I want to reason through this physics problem myself", "socratic"),
+    ("Walk me through it without giving away the solution", "socratic"),
+    ("Where did I go wrong in this derivation?", "socratic"),
+    ("Help me think about why the sky is blue", "socratic"),
+    ("Don't give me the answer, just a clue", "socratic"),
+    ("Can you question me until I understand recursion?", "socratic"),
+    ("Analyze my progress and adapt", "adaptation"),
+    ("This is too hard, can we slow down?", "adaptation"),
+    ("These exercises are too easy for me", "adaptation"),
+    ("Can you change the pace of the lessons?", "adaptation"),
+    ("Make me a study plan for the next two weeks", "adaptation"),
+    ("What should I learn next?", "adaptation"),
+    ("I learn better with more visuals", "adaptation"),
+    ("Adjust the difficulty based on how I'm doing", "adaptation"),
+    ("Let's speed up, I already know the basics", "adaptation"),
+    ("How am I doing overall in calculus?", "adaptation")
+]
+
+# Agent names recorded in ChatMessage.metadata_json, mapped back to intents
+AGENT_INTENTS = {f"{intent}_agent": intent for intent in INTENTS}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word unigrams plus bigrams.
+    """
+    words = TOKEN_PATTERN.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+class TfidfCentroidModel:
+    """
+    Linear text classifier: TF-IDF vectors (sublinear tf, L2 normalized) scored against
+    one normalized centroid per class. Sparse dicts throughout, so it needs no numpy and a
+    prediction costs a few microseconds per token.
+    """
+
+    def __init__(self, idf: Dict[str, float], centroids: Dict[str, Dict[str, float]], default_idf: float):
+        self.idf = idf
+        self.centroids = centroids
+        self.default_idf = default_idf
+
+    @classmethod
+    def fit(cls, examples: Sequence[Tuple[str, str]]) -> "TfidfCentroidModel":
+        docs = [(Counter(tokenize(text)), label) for text, label in examples]
+        df: Counter = Counter()
+        for counts, _ in docs:
+            df.update(counts.keys())
+        n = len(docs)
+        idf = {term: math.log((1 + n) / (1 + d)) + 1 for term, d in df.items()}
+        model = cls(idf, {}, default_idf=math.log(1 + n) + 1)
+
+        sums: Dict[str, Counter] = {}
+        for counts, label in docs:
+            sums.setdefault(label, Counter()).update(model.vectorize_counts(counts))
+        model.centroids = {label: cls._normalize(dict(total)) for label, total in sums.items()}
+        return model
+
+    @staticmethod
+    def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {k: v / norm for k, v in vector.items()} if norm else vector
+
+    def vectorize_counts(self, counts: Counter) -> Dict[str, float]:
+        # Terms never seen in training can't match any centroid; they only dilute the norm
+        return self._normalize({
+            term: (1 + math.log(tf)) * self.idf.get(term, self.default_idf) for term, tf in counts.items()
+        })
+
+    def scores(self, text: str) -> Dict[str, float]:
+        vector = self.vectorize_counts(Counter(tokenize(text)))
+        return {
+            label: sum(weight * centroid.get(term, 0.0) for term, weight in vector.items())
+            for label, centroid in self.centroids.items()
+        }
+
+@dataclass
+class IntentDecision:
+    intent: str
+    confidence: float
+    source: str # "classifier" or "llm"
+    scores: Dict[str, float] = field(default_factory=dict)
+    latency_ms: float = 0.0
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "intent": {
+                "agent": self.intent,
+                "confidence": round(self.confidence, 3),
+                "source": self.source,
+                "latency_ms": round(self.latency_ms, 3)
+            }
+        }
+
+class IntentRouter:
+    """
+    Picks the agent for messages that arrive without context["target_agent"].
+
+    Keyword rules and a TF-IDF centroid model are combined into one score per intent; the
+    softmax of the scores is the confidence. Only when it is below `min_confidence` and a
+    fallback model is configured (opt-in, INTENT_FALLBACK_MODEL) is a short LLM
+    classification call made. An unusable answer keeps the local prediction, and so does
+    one served by another model after a fallback or by a local stand-in model, whose text
+    only echoes the message.
+    """
+
+    def __init__(
+        self,
+        examples: Optional[Sequence[Tuple[str, str]]] = None,
+        min_confidence: float = 0.5,
+        temperature: float = 0.1,
+        fallback_model: Optional[str] = None,
+        model_router=None
+    ):
+        self.examples = list(examples or DEFAULT_EXAMPLES)
+        self.min_confidence = min_confidence
+        self.temperature = temperature
+        self.fallback_model = fallback_model
+        self.model_router = model_router
+        self.rules = {intent: [re.compile(p) for p in patterns] for intent, patterns in KEYWORD_RULES.items()}
+        self.model = TfidfCentroidModel.fit(self.examples)
+
+        self.classified = 0
+        self.llm_fallbacks = 0
+        self.llm_overrides = 0
+        self.llm_ignored = 0
+
+    @classmethod
+    def from_env(cls, model_router=None) -> "IntentRouter":
+        return cls(
+            min_confidence=float(os.getenv("INTENT_MIN_CONFIDENCE", "0.5")),
+            temperature=float(os.getenv("INTENT_SOFTMAX_TEMPERATURE", "0.1")),
+            # Unset or empty disables the LLM fallback
+            fallback_model=os.getenv("INTENT_FALLBACK_MODEL") or None,
+            model_router=model_router
+        )
+
+    def fit(self, extra_examples: Iterable[Tuple[str, str]] = ()):
+        """
+        Retrains on the seed examples plus extra_examples. The new model replaces the old
+        one in a single assignment, so concurrent classify() calls are unaffected.
+        """
+        self.model = TfidfCentroidModel.fit(self.examples + [e for e in extra_examples if e[1] in INTENTS])
+
+    def fit_from_logs(self, session_factory, limit: int = 5000) -> int:
+        """
+        Retrains with logged turns whose agent was chosen explicitly by the client
+        (auto-routed turns are skipped so the model doesn't learn from its own guesses).
+        Blocking; run it in a thread. Returns the number of logged examples used.
+        """
+        try:
+            examples = load_logged_examples(session_factory, limit)
+        except Exception:
+            logger.exception("Could not load logged intent examples; keeping the seed model")
+            return 0
+        self.fit(examples)
+        return len(examples)
+
+    def classify(self, message: str) -> IntentDecision:
+        started = time.perf_counter()
+        text = message.lower()
+        scores = self.model.scores(text)
+        for intent, patterns in self.rules.items():
+            hits = sum(1 for p in patterns if p.search(text))
+            if hits:
+                scores[intent] = scores.get(intent, 0.0) + RULE_WEIGHT * hits
+
+        top = max(scores, key=scores.get)
+        exps = {k: math.exp((v - scores[top]) / self.temperature) for k, v in scores.items()}
+        confidence = exps[top] / sum(exps.values())
+        self.classified += 1
+        return IntentDecision(
+            intent=top,
+            confidence=confidence,
+            source="classifier",
+            scores={k: round(v, 4) for k, v in scores.items()},
+            latency_ms=(time.perf_counter() - started) * 1000
+        )
+
+    async def route(self, message: str) -> IntentDecision:
+        decision = self.classify(message)
+        if decision.confidence >= self.min_confidence or not (self.fallback_model and self.model_router):
+            return decision
+
+        self.llm_fallbacks += 1
+        started = time.perf_counter()
+        try:
+            result = await self.model_router.generate(
+                self.fallback_model,
+                "Classify the learner's message. Reply with exactly one word: "
+                "diagnosis (assess their level), explanation (explain a concept), "
+                "socratic (guide them with questions) or adaptation (adjust pace/plan).",
+                message,
+                temperature=0.0
+            )
+        except Exception:
+            logger.warning("Intent fallback model failed, keeping classifier result", exc_info=True)
+            return decision
+
+        if result.fell_back or self.model_router.get_provider(result.model_id) == "local":
+            self.llm_ignored += 1
+            return decision
+
+        # The prompt asks for exactly one word; an answer that doesn't start with an intent
+        # (e.g. a sentence quoting the message) isn't a classification
+        words = TOKEN_PATTERN.findall(result.text.lower())
+        intent = words[0] if words and words[0] in INTENTS else None
+        if intent is None:
+            self.llm_ignored += 1
+        else:
+            if intent != decision.intent:
+                self.llm_overrides += 1
+            decision = IntentDecision(
+                intent=intent,
+                confidence=decision.confidence,
+                source="llm",
+                scores=decision.scores,
+                latency_ms=decision.latency_ms + (time.perf_counter() - started) * 1000
+            )
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "examples": len(self.examples),
+            "min_confidence": self.min_confidence,
+            "fallback_model": self.fallback_model,
+            "classified": self.classified,
+            "llm_fallbacks": self.llm_fallbacks,
+            "llm_overrides": self.llm_overrides,
+            "llm_ignored": self.llm_ignored
+        }
+
+def load_logged_examples(session_factory, limit: int = 5000) -> List[Tuple[str, str]]:
+    """
+    (user message, intent) pairs from chat history: each assistant message tagged with an
+    agent name is paired with the user message just before it in the same session.
+    session_factory may also be a list (the main database and the shards of sharded storage).
+    """
+    from sqlalchemy import select
+    from app.db import models
+
+    examples = []
+    for factory in session_factory if isinstance(session_factory, (list, tuple)) else [session_factory]:
+        with factory() as db:
+            rows = db.execute(
+                select(
+                    models.ChatMessage.session_id,
+                    models.ChatMessage.role,
+                    models.ChatMessage.content,
+                    models.ChatMessage.metadata_json
+                )
+                .order_by(models.ChatMessage.id.desc())
+                .limit(limit * 2)
+            ).all()
+
+        last_user: Dict[int, str] = {}
+        for row in reversed(rows):
+            if row.role == "user":
+                last_user[row.session_id] = row.content
+                continue
+            metadata = row.metadata_json or {}
+            intent = AGENT_INTENTS.get(metadata.get("agent_name"))
+            auto_routed = "intent" in (metadata.get("raw_metadata") or {})
+            message = last_user.pop(row.session_id, None)
+            if intent and message and not auto_routed:
+                examples.append((message, intent))
+    return examples[-limit:]
@@ -1,8 +1,36 @@
 import os
-from typing import List, Optional
-import google.generativeai as genai
-# from openai import AsyncOpenAI # Uncomment when ready for OpenAI
+import time
+import random
+import asyncio
+import importlib
+from collections import OrderedDict
+from types import ModuleType
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import httpx
 from app.schemas.base import ModelMetadata
+from app.core.response_cache import ResponseCache
+from app.core.single_flight import SingleFlight
+from app.core.scheduler import RequestScheduler, SchedulerOverloaded, PRIORITY_INTERACTIVE, estimate_tokens
+from app.core.routing_policy import RoutingPolicy, ModelResult, ProviderError, ProviderUnavailable
+from app.core.tracing import span
+
+# Marks the default so ModelRouter(cache=None) can explicitly disable caching
+_DEFAULT_CACHE = object()
+
+# Provider SDKs whose import has completed
+_sdks: Dict[str, ModuleType] = {}
+
+async def import_sdk(name: str) -> ModuleType:
+    """
+    Imports a provider SDK on first use. The SDKs take most of a second to import, so
+    they aren't loaded at startup, and the first import runs in a thread so it doesn't
+    block the event loop. (sys.modules isn't checked instead: it already holds the
+    half-initialized module while the import runs; import_module waits for it.)
+    """
+    module = _sdks.get(name)
+    if module is None:
+        module = _sdks[name] = await asyncio.to_thread(importlib.import_module, name)
+    return module
 
 class ModelRouter:
     """
@@ -10,79 +38,590 @@ class ModelRouter:
     Standardizes the interface so agents don't care which model is running.
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        cache: Any = _DEFAULT_CACHE,
+        scheduler: Optional[RequestScheduler] = None,
+        routing: Optional[RoutingPolicy] = None
+    ):
         self.gemini_key = os.getenv("GEMINI_API_KEY")
         self.openai_key = os.getenv("OPENAI_API_KEY")
         
-        # Initialize providers
-        if self.gemini_key:
-            genai.configure(api_key=self.gemini_key)
-        
         self.supported_models = [
             ModelMetadata(id="gemini-pro", provider="google", name="Gemini Pro", description="Google's capable generative model", context_window=32000),
             ModelMetadata(id="gpt-4", provider="openai", name="GPT-4", description="OpenAI's most capable model", context_window=8192),
             ModelMetadata(id="local-research", provider="local", name="Local Research Model", description="Mock local model for experimentation", context_window=4096),
         ]
+        
+        # Offline stand-in with injectable latency, for benchmarks and load tests (never on by default)
+        self.stub_enabled = os.getenv("MODEL_STUB_ENABLED", "false").lower() in ("1", "true", "yes")
+        self.stub_latency_ms = float(os.getenv("MODEL_STUB_LATENCY_MS", "200"))
+        self.stub_jitter_ms = float(os.getenv("MODEL_STUB_JITTER_MS", "50"))
+        self.stub_ttft_ms = float(os.getenv("MODEL_STUB_TTFT_MS", "50"))
+        self.stub_error_rate = float(os.getenv("MODEL_STUB_ERROR_RATE", "0"))
+        if self.stub_enabled:
+            self.supported_models.append(
+                ModelMetadata(id="local-stub", provider="local", name="Stub Provider", description="Latency-injecting stand-in for a hosted model", context_window=8192)
+            )
+        
+        # Response cache (memory LRU+TTL, optional disk tier). Configured via MODEL_CACHE_* env vars.
+        self.cache = ResponseCache.from_env() if cache is _DEFAULT_CACHE else cache
+        
+        # Identical in-flight calls share one provider request
+        self.coalesce = os.getenv("MODEL_COALESCE_ENABLED", "true").lower() not in ("0", "false", "no")
+        self.single_flight = SingleFlight()
+        
+        # Per-provider/per-model admission control (LLM_* env vars)
+        self.scheduler = scheduler or RequestScheduler.from_env()
+        # Output allowance added to the prompt size when budgeting tokens/min up front
+        self.output_token_estimate = int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", "256"))
+        
+        # Latency/error tracking, hedging and fallback chain (MODEL_* env vars)
+        self.routing = routing or RoutingPolicy.from_env()
+        
+        # Long-lived provider clients (and their SDKs), created on first use
+        self._genai: Optional[ModuleType] = None
+        self._gemini_models: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._gemini_models_max = int(os.getenv("GEMINI_MODEL_CACHE_SIZE", "64"))
+        self._openai_client = None
+
+    async def aclose(self):
+        """
+        Releases pooled provider connections (called on app shutdown).
+        """
+        if self._openai_client is not None:
+            await self._openai_client.close()
+            self._openai_client = None
+        self._gemini_models.clear()
+
+    async def _get_genai(self) -> ModuleType:
+        """
+        google.generativeai, imported and configured on the first Gemini call.
+        """
+        if self._genai is None:
+            genai = await import_sdk("google.generativeai")
+            genai.configure(api_key=self.gemini_key)
+            self._genai = genai
+        return self._genai
+
+    async def _get_gemini_model(self, model_id: str, system_prompt: str):
+        """
+        GenerativeModel per (model_id, system_instruction), kept in a small LRU.
+        Agent system prompts are mostly static, so most calls reuse an existing model
+        and the prompt goes out as a real system_instruction.
+        """
+        genai = await self._get_genai()
+        key = (model_id, system_prompt)
+        model = self._gemini_models.get(key)
+        if model is None:
+            model = genai.GenerativeModel(model_name=model_id, system_instruction=system_prompt)
+            self._gemini_models[key] = model
+            while len(self._gemini_models) > self._gemini_models_max:
+                self._gemini_models.popitem(last=False)
+        else:
+            self._gemini_models.move_to_end(key)
+        return model
+
+    async def _get_openai_client(self):
+        """
+        Single AsyncOpenAI client over a tuned httpx connection pool (keep-alive, bounded
+        connections, explicit timeouts). OPENAI_BASE_URL points it at a compatible server.
+        """
+        if self._openai_client is not None:
+            return self._openai_client
+        openai = await import_sdk("openai")
+        # Another call may have created it while the SDK was importing
+        if self._openai_client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+                    max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "20")),
+                    keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "60"))
+                ),
+                timeout=httpx.Timeout(
+                    float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60")),
+                    connect=float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", "5"))
+                )
+            )
+            self._openai_client = openai.AsyncOpenAI(
+                api_key=self.openai_key,
+                base_url=os.getenv("OPENAI_BASE_URL") or None,
+                max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2")),
+                http_client=http_client
+            )
+        return self._openai_client
 
     def get_available_models(self) -> List[ModelMetadata]:
         return self.supported_models
 
+    def get_cache_stats(self) -> Dict[str, Any]:
+        if not self.cache:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.stats()}
+
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        return {"enabled": self.coalesce, **self.single_flight.stats()}
+
+    def get_scheduler_stats(self) -> Dict[str, Any]:
+        return self.scheduler.stats()
+
+    def get_routing_stats(self) -> Dict[str, Any]:
+        return self.routing.stats()
+
+    def get_provider(self, model_id: str) -> str:
+        for model in self.supported_models:
+            if model.id == model_id:
+                return model.provider
+        if model_id.startswith("gemini"):
+            return "google"
+        if model_id.startswith("gpt"):
+            return "openai"
+        return "local"
+
+    def is_supported(self, model_id: str) -> bool:
+        return any(model.id == model_id for model in self.supported_models)
+
+    def get_context_window(self, model_id: str) -> int:
+        """
+        Context window (tokens) of a model; unknown models get the smallest known window.
+        """
+        for model in self.supported_models:
+            if model.id == model_id:
+                return model.context_window
+        return min(model.context_window for model in self.supported_models)
+
+    def ensure_capacity(self, model_id: str):
+        """
+        Raises SchedulerOverloaded if a call to model_id would be shed right now.
+        """
+        self.scheduler.ensure_capacity(self.get_provider(model_id), model_id)
+
+    def ensure_available(self, model_id: str):
+        """
+        Raises ProviderUnavailable if no configured model could answer a call to model_id.
+        """
+        self._candidates(model_id)
+
+    def is_configured(self, model_id: str) -> bool:
+        """
+        Whether model_id can be called: hosted providers need their API key.
+        """
+        provider = self.get_provider(model_id)
+        if provider == "google":
+            return bool(self.gemini_key)
+        if provider == "openai":
+            return bool(self.openai_key)
+        return True
+
+    def _candidates(self, model_id: str) -> List[str]:
+        """
+        The routing policy's candidates that can actually answer. Hosted models without an
+        API key are skipped, and local models are only used when asked for by name: their
+        canned text is no substitute for a real model's answer.
+        Unknown model ids are rejected here, before they are scheduled or show up in metrics.
+        """
+        if not self.is_supported(model_id):
+            raise ValueError(f"Unknown model_id: {model_id}")
+        candidates = [
+            m for m in self.routing.candidates(model_id)
+            if self.is_configured(m) and (m == model_id or self.get_provider(m) != "local")
+        ]
+        if not candidates:
+            raise ProviderUnavailable(model_id, f"no API key configured for provider '{self.get_provider(model_id)}'")
+        return candidates
+
+    def _record_usage(self, model_id: str, estimated: int, system_prompt: str, user_message: str, response: str):
+        self.scheduler.record_usage(
+            self.get_provider(model_id), model_id, estimated, estimate_tokens(system_prompt, user_message, response)
+        )
+
+    def _cache_key(self, use_cache: bool, model_id: str, system_prompt: str, user_message: str, temperature: float) -> Optional[str]:
+        """
+        Returns the cache key for a call, or None if this call must bypass the cache.
+        """
+        if not (use_cache and self.cache and self.cache.is_cacheable(temperature)):
+            return None
+        return self.cache.make_key(model_id, system_prompt, user_message, temperature)
+
     async def generate_response(
         self, 
         model_id: str, 
         system_prompt: str, 
         user_message: str,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE
     ) -> str:
+        """
+        Same as generate(), returning only the text.
+        """
+        result = await self.generate(model_id, system_prompt, user_message, temperature, use_cache, priority)
+        return result.text
+
+    async def generate(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_message: str,
+        temperature: float = 0.7,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        coalesce: Optional[bool] = None
+    ) -> ModelResult:
         """
         Unified generation method. Routes to the specific provider.
+        Identical calls are served from the response cache when use_cache is set,
+        and identical calls already in flight are coalesced into one provider request
+        (coalesce defaults to use_cache; pass it to coalesce calls that skip the cache).
+        Slow or failing calls are hedged / fall back according to the routing policy;
+        the result records which model actually answered.
+        Raises ProviderError when every candidate failed, SchedulerOverloaded when shed.
         """
         
         # Log payload if research mode is on (TODO: Move logging to orchestrated decorator/middleware)
         
+        cache_key = self._cache_key(use_cache, model_id, system_prompt, user_message, temperature)
+        if cache_key:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return ModelResult(text=cached, model_id=model_id, requested_model=model_id, cached=True)
+        
+        async def call_provider() -> ModelResult:
+            result = await self._route(model_id, system_prompt, user_message, temperature, priority)
+            # A fallback answer isn't what this model would have said, so it isn't cached under its key
+            if cache_key and not result.fell_back:
+                await self.cache.set(cache_key, result.text)
+            return result
+        
+        # Agents that opt out of caching expect their own answer, so they aren't coalesced either
+        if coalesce is None:
+            coalesce = use_cache
+        if not (coalesce and self.coalesce):
+            return await call_provider()
+        
+        flight_key = cache_key or ResponseCache.make_key(model_id, system_prompt, user_message, temperature)
+        return await self.single_flight.do(flight_key, call_provider)
+
+    async def _route(self, model_id: str, system_prompt: str, user_message: str, temperature: float, priority: int) -> ModelResult:
+        """
+        Tries the candidate models in order until one answers.
+        """
+        candidates = self._candidates(model_id)
+        attempts: List[Dict[str, Any]] = []
+        overloaded: Optional[SchedulerOverloaded] = None
+
+        for i, candidate in enumerate(candidates):
+            hedge_model = candidates[i + 1] if i + 1 < len(candidates) else None
+            try:
+                text, answered_by, hedged = await self._attempt_hedged(
+                    candidate, hedge_model, system_prompt, user_message, temperature, priority
+                )
+            except SchedulerOverloaded as e:
+                overloaded = e
+                attempts.append({"model_id": candidate, "error": str(e)})
+                continue
+            except ProviderError as e:
+                attempts.append({"model_id": candidate, "error": str(e)})
+                continue
+
+            if answered_by != model_id:
+                self.routing.fallbacks += 1
+            return ModelResult(text=text, model_id=answered_by, requested_model=model_id, hedged=hedged, attempts=attempts)
+
+        if overloaded:
+            raise overloaded
+        raise ProviderError(model_id, "all models failed: " + "; ".join(a["error"] for a in attempts))
+
+    async def _attempt_hedged(
+        self, model_id: str, hedge_model: Optional[str], system_prompt: str, user_message: str, temperature: float, priority: int
+    ) -> Tuple[str, str, bool]:
+        """
+        One call to model_id. If it runs past that model's p95, a second call goes to hedge_model
+        and the first successful answer wins. Returns (text, model that answered, hedged).
+        """
+        delay = self.routing.hedge_delay(model_id) if hedge_model else None
+        if delay is None:
+            text = await self._attempt(model_id, system_prompt, user_message, temperature, priority)
+            return text, model_id, False
+
+        primary = asyncio.create_task(self._attempt(model_id, system_prompt, user_message, temperature, priority))
+        tasks = {primary: model_id}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result(), model_id, False
+
+            self.routing.hedges_sent += 1
+            hedge = asyncio.create_task(self._attempt(hedge_model, system_prompt, user_message, temperature, priority))
+            tasks[hedge] = hedge_model
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.routing.hedges_won += 1
+                        return task.result(), tasks[task], True
+                    error = task.exception()
+            raise error
+        finally:
+            # The losing call is cancelled, which also frees its scheduler slot
+            for task in tasks:
+                task.cancel()
+
+    async def _attempt(self, model_id: str, system_prompt: str, user_message: str, temperature: float, priority: int) -> str:
+        """
+        A single scheduled, timed provider call; the outcome feeds the routing stats.
+        """
+        estimated = estimate_tokens(system_prompt, user_message) + self.output_token_estimate
+        async with self.scheduler.slot(self.get_provider(model_id), model_id, estimated, priority):
+            # Measured from admission, so queueing doesn't count as provider latency
+            started = time.perf_counter()
+            try:
+                with span("llm", model=model_id):
+                    response = await asyncio.wait_for(
+                        self._dispatch(model_id, system_prompt, user_message, temperature),
+                        timeout=self.routing.timeout_seconds
+                    )
+            except asyncio.TimeoutError:
+                self.routing.record(model_id, ok=False)
+                raise ProviderError(model_id, f"timed out after {self.routing.timeout_seconds}s")
+            except ProviderError:
+                self.routing.record(model_id, ok=False)
+                raise
+            self.routing.record(model_id, ok=True, latency_ms=(time.perf_counter() - started) * 1000)
+
+        self._record_usage(model_id, estimated, system_prompt, user_message, response)
+        return response
+
+    async def _dispatch(self, model_id: str, system_prompt: str, user_message: str, temperature: float) -> str:
         if model_id.startswith("gemini"):
             return await self._call_gemini(model_id, system_prompt, user_message, temperature)
         elif model_id.startswith("gpt"):
             return await self._call_openai(model_id, system_prompt, user_message, temperature)
         elif model_id == "local-research":
             return await self._call_local(system_prompt, user_message)
+        elif model_id == "local-stub" and self.stub_enabled:
+            return await self._call_stub(model_id, user_message)
         else:
             raise ValueError(f"Unknown model_id: {model_id}")
 
+    def _open_stream(self, model_id: str, system_prompt: str, user_message: str, temperature: float) -> AsyncIterator[str]:
+        if model_id.startswith("gemini"):
+            return self._stream_gemini(model_id, system_prompt, user_message, temperature)
+        elif model_id.startswith("gpt"):
+            return self._stream_openai(model_id, system_prompt, user_message, temperature)
+        elif model_id == "local-research":
+            return self._stream_local(system_prompt, user_message)
+        elif model_id == "local-stub" and self.stub_enabled:
+            return self._stream_stub(model_id, user_message)
+        else:
+            raise ValueError(f"Unknown model_id: {model_id}")
+
+    async def stream_response(
+        self,
+        model_id: str,
+        system_prompt: str,
+        user_message: str,
+        temperature: float = 0.7,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        route: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Streaming variant of generate_response. Yields text chunks as the provider produces them.
+        A cache hit is replayed as chunks; a completed stream is stored in the cache.
+        A model that fails before its first chunk falls back along the chain; once text has been
+        sent the error is raised, since the client already holds part of the answer.
+        When `route` is given it's filled with the routing metadata of the call.
+        """
+        cache_key = self._cache_key(use_cache, model_id, system_prompt, user_message, temperature)
+        if cache_key:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                if route is not None:
+                    route.update(ModelResult(text=cached, model_id=model_id, requested_model=model_id, cached=True).metadata())
+                async for chunk in self._chunk_text(cached):
+                    yield chunk
+                return
+
+        attempts: List[Dict[str, Any]] = []
+        overloaded: Optional[SchedulerOverloaded] = None
+        estimated = estimate_tokens(system_prompt, user_message) + self.output_token_estimate
+
+        for candidate in self._candidates(model_id):
+            chunks = []
+            try:
+                # The slot is held for the whole stream, since that's how long the provider is busy
+                async with self.scheduler.slot(self.get_provider(candidate), candidate, estimated, priority):
+                    with span("llm.stream", model=candidate):
+                        async for chunk in self._open_stream(candidate, system_prompt, user_message, temperature):
+                            if chunk:
+                                chunks.append(chunk)
+                                yield chunk
+            except SchedulerOverloaded as e:
+                overloaded = e
+                attempts.append({"model_id": candidate, "error": str(e)})
+                continue
+            except ProviderError as e:
+                self.routing.record(candidate, ok=False)
+                if chunks:
+                    raise
+                attempts.append({"model_id": candidate, "error": str(e)})
+                continue
+
+            # Stream durations depend on answer length, so only the outcome feeds the stats
+            self.routing.record(candidate, ok=True)
+            result = ModelResult(text="".join(chunks), model_id=candidate, requested_model=model_id, attempts=attempts)
+            if result.fell_back:
+                self.routing.fallbacks += 1
+            if route is not None:
+                route.update(result.metadata())
+
+            self._record_usage(candidate, estimated, system_prompt, user_message, result.text)
+            if cache_key and not result.fell_back:
+                await self.cache.set(cache_key, result.text)
+            return
+
+        if overloaded:
+            raise overloaded
+        raise ProviderError(model_id, "all models failed: " + "; ".join(a["error"] for a in attempts))
+
     async def _call_gemini(self, model_id: str, system_prompt: str, user_message: str, temperature: float) -> str:
         if not self.gemini_key:
-            return "[Mock] Gemini API Key not found. Response to: " + user_message
-            
+            raise ProviderError(model_id, "GEMINI_API_KEY not set")
+
         try:
             # Gemini Python SDK usually uses 'gemini-pro'
-            # Note: System prompts in Gemini 1.0 are often handled via initial context or specific API methods 
-            # (GenerativeModel(system_instruction=...)) depending on library version. 
-            # We will prepend system prompt for broad compatibility if needed, 
-            # or use the new system_instruction param if available.
-            
-            model = genai.GenerativeModel(model_name=model_id) 
-            # Simple combined prompt for now
-            full_prompt = f"System: {system_prompt}\n\nUser: {user_message}"
+            model = await self._get_gemini_model(model_id, system_prompt)
             
             response = await model.generate_content_async(
-                full_prompt, 
-                generation_config=genai.types.GenerationConfig(temperature=temperature)
+                user_message, 
+                generation_config=self._genai.types.GenerationConfig(temperature=temperature)
             )
             return response.text
         except Exception as e:
-            return f"Gemini Error: {str(e)}"
+            raise ProviderError(model_id, f"Gemini Error: {str(e)}") from e
+
+    async def _stream_gemini(self, model_id: str, system_prompt: str, user_message: str, temperature: float) -> AsyncIterator[str]:
+        if not self.gemini_key:
+            raise ProviderError(model_id, "GEMINI_API_KEY not set")
+
+        try:
+            model = await self._get_gemini_model(model_id, system_prompt)
+
+            response = await model.generate_content_async(
+                user_message,
+                generation_config=self._genai.types.GenerationConfig(temperature=temperature),
+                stream=True
+            )
+            async for chunk in response:
+                yield chunk.text
+        except Exception as e:
+            raise ProviderError(model_id, f"Gemini Error: {str(e)}") from e
 
     async def _call_openai(self, model_id: str, system_prompt: str, user_message: str, temperature: float) -> str:
         if not self.openai_key:
-            return f"[Mock] OpenAI API Key not found. Selected {model_id}. Response to: {user_message}"
-        
-        # Mocking actual call for now to avoid dependency crash if library not fully set up
-        # client = AsyncOpenAI(api_key=self.openai_key)
-        # ...
-        return f"[Mock] Real OpenAI call implementation pending. Model: {model_id}"
+            raise ProviderError(model_id, "OPENAI_API_KEY not set")
+
+        try:
+            client = await self._get_openai_client()
+            response = await client.chat.completions.create(
+                model=model_id,
+                messages=self._openai_messages(system_prompt, user_message),
+                temperature=temperature
+            )
+            return response.choices[0].message.content or ""
+        except Exception as e:
+            raise ProviderError(model_id, f"OpenAI Error: {str(e)}") from e
+
+    async def _stream_openai(self, model_id: str, system_prompt: str, user_message: str, temperature: float) -> AsyncIterator[str]:
+        if not self.openai_key:
+            raise ProviderError(model_id, "OPENAI_API_KEY not set")
+
+        try:
+            client = await self._get_openai_client()
+            stream = await client.chat.completions.create(
+                model=model_id,
+                messages=self._openai_messages(system_prompt, user_message),
+                temperature=temperature,
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise ProviderError(model_id, f"OpenAI Error: {str(e)}") from e
+
+    @staticmethod
+    def _openai_messages(system_prompt: str, user_message: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
 
     async def _call_local(self, system_prompt: str, user_message: str) -> str:
         """
         Simulates a local model response for research/testing.
         """
         return f"[Local Model] Analysis: Processed '{user_message}' with system context length {len(system_prompt)}. Ready for research task."
+
+    async def _stream_local(self, system_prompt: str, user_message: str) -> AsyncIterator[str]:
+        """
+        Streams the local stand-in response word by word, like a real token stream.
+        """
+        text = await self._call_local(system_prompt, user_message)
+        async for chunk in self._chunk_text(text):
+            yield chunk
+
+    def _stub_text(self, user_message: str) -> str:
+        return f"[Stub Model] Answer to: {user_message} " + "lorem ipsum dolor sit amet " * 8
+
+    async def _call_stub(self, model_id: str, user_message: str) -> str:
+        """
+        Sleeps for the configured latency (+/- jitter) and fails at the configured rate.
+        """
+        delay = self.stub_latency_ms + random.uniform(-self.stub_jitter_ms, self.stub_jitter_ms)
+        await asyncio.sleep(max(0.0, delay) / 1000)
+        if random.random() < self.stub_error_rate:
+            raise ProviderError(model_id, "Stub Error: injected failure")
+        return self._stub_text(user_message)
+
+    async def _stream_stub(self, model_id: str, user_message: str) -> AsyncIterator[str]:
+        """
+        First chunk after MODEL_STUB_TTFT_MS, the rest spread over the remaining latency.
+        """
+        total = max(0.0, self.stub_latency_ms + random.uniform(-self.stub_jitter_ms, self.stub_jitter_ms)) / 1000
+        ttft = min(total, self.stub_ttft_ms / 1000)
+        await asyncio.sleep(ttft)
+        if random.random() < self.stub_error_rate:
+            raise ProviderError(model_id, "Stub Error: injected failure")
+
+        words = self._stub_text(user_message).split(" ")
+        gap = (total - ttft) / max(1, len(words) - 1)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(gap)
+            yield word + " "
+
+    async def _chunk_text(self, text: str) -> AsyncIterator[str]:
+        """
+        Splits an already complete text into word chunks, yielding control between them.
+        """
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+            await asyncio.sleep(0)
+
+_shared_router: Optional[ModelRouter] = None
+
+def get_model_router() -> ModelRouter:
+    """
+    Process-wide ModelRouter, so the API and all agents share one cache and one set of provider clients.
+    """
+    global _shared_router
+    if _shared_router is None:
+        _shared_router = ModelRouter()
+    return _shared_router
@@ -1,7 +1,11 @@
-from typing import Dict
-from app.schemas.base import AgentInput, AgentOutput
-from app.core.model_router import ModelRouter
+from typing import AsyncIterator, Optional
+from app.schemas.base import AgentInput, AgentOutput, StreamEvent
+from app.core.model_router import ModelRouter, get_model_router
 from app.agents.base import BaseAgent
+from app.agents.registry import AgentRegistry
+from app.core.pipeline import PipelineExecutor
+from app.core.intent_router import IntentDecision, IntentRouter
+from app.core.speculation import SpeculativeExecutor
 
 from app.agents.diagnosis import DiagnosisAgent
 from app.agents.explanation import ExplanationAgent
@@ -10,41 +14,114 @@ from app.agents.memory import MemoryAgent
 from app.agents.adaptation import AdaptationAgent
 
 class AgentOrchestrator:
-    def __init__(self):
-        self.model_router = ModelRouter()
-        self.agents: Dict[str, BaseAgent] = {}
+    def __init__(self, model_router: Optional[ModelRouter] = None, intent_router: Optional[IntentRouter] = None):
+        self.model_router = model_router or get_model_router()
+        self.intent_router = intent_router or IntentRouter.from_env(self.model_router)
+        self.agents = AgentRegistry(self.model_router)
         
-        # Register Agents
-        self.register_agent("diagnosis", DiagnosisAgent(self.model_router))
-        self.register_agent("explanation", ExplanationAgent(self.model_router))
-        self.register_agent("socratic", SocraticAgent(self.model_router))
-        self.register_agent("memory", MemoryAgent(self.model_router))
-        self.register_agent("adaptation", AdaptationAgent(self.model_router))
+        # Register Agents (each is constructed on first use)
+        self.agents.register("diagnosis", DiagnosisAgent)
+        self.agents.register("explanation", ExplanationAgent)
+        self.agents.register("socratic", SocraticAgent)
+        self.agents.register("memory", MemoryAgent)
+        self.agents.register("adaptation", AdaptationAgent)
+        
+        self.pipeline = PipelineExecutor(self.agents)
+        self.speculation = SpeculativeExecutor.from_env(self.agents)
 
     def register_agent(self, name: str, agent: BaseAgent):
-        self.agents[name] = agent
+        self.agents.add(name, agent)
 
     async def route_request(self, input_data: AgentInput) -> AgentOutput:
         """
         Determines which agent should handle the request.
         For MVP, we might use a simple keyword or metadata field, 
         or a 'Router Agent' (LLM based) to decide.
+
+        A step precomputed for this session (see core/speculation.py) is served directly,
+        and the step the answer announces as next_action may be started in the background.
         """
-        
+        precomputed = await self.speculation.take(input_data)
+        if precomputed is not None:
+            return precomputed
+
+        output = await self._route_request(input_data)
+        self.speculation.maybe_launch(input_data, output)
+        return output
+
+    async def _route_request(self, input_data: AgentInput) -> AgentOutput:
         # 1. Simple routing strategy based on context or explicit intent
         # (This is a placeholder logic until specific agents are built)
         
-        target_agent_name = input_data.context.get("target_agent", "general")
+        target_agent_name = input_data.context.get("target_agent")
+        
+        if not target_agent_name:
+            # No explicit agent: pick one with the local intent classifier
+            decision = await self.intent_router.route(input_data.message)
+            output = await self.agents[decision.intent].process(input_data)
+            return self._with_intent(output, decision)
         
         if target_agent_name in self.agents:
              return await self.agents[target_agent_name].process(input_data)
         
+        if target_agent_name == "pipeline":
+            # Several agents in one request; context["pipeline"] optionally lists the steps
+            return await self.pipeline.run(input_data, input_data.context.get("pipeline"))
+        
         # Fallback / General routing logic
         # For now, if no agent matches, return a default system response
         
         # If we have a 'Socratic' agent or 'Chat' agent, default to that.
         # For now, return a stub.
         
+        return self._fallback_output(target_agent_name)
+
+    async def stream_request(self, input_data: AgentInput) -> AsyncIterator[StreamEvent]:
+        """
+        Streaming counterpart of route_request. Same agent selection,
+        but yields StreamEvents ending with a single "done" event.
+        """
+        precomputed = await self.speculation.take(input_data)
+        if precomputed is not None:
+            yield StreamEvent(type="token", content=precomputed.response)
+            yield StreamEvent(type="done", output=precomputed)
+            return
+
+        async for event in self._stream_request(input_data):
+            if event.type == "done":
+                self.speculation.maybe_launch(input_data, event.output)
+            yield event
+
+    async def _stream_request(self, input_data: AgentInput) -> AsyncIterator[StreamEvent]:
+        target_agent_name = input_data.context.get("target_agent")
+        
+        if not target_agent_name:
+            decision = await self.intent_router.route(input_data.message)
+            async for event in self.agents[decision.intent].stream(input_data):
+                if event.type == "done":
+                    self._with_intent(event.output, decision)
+                yield event
+            return
+        
+        if target_agent_name in self.agents:
+            async for event in self.agents[target_agent_name].stream(input_data):
+                yield event
+            return
+        
+        if target_agent_name == "pipeline":
+            output = await self.pipeline.run(input_data, input_data.context.get("pipeline"))
+        else:
+            output = self._fallback_output(target_agent_name)
+        yield StreamEvent(type="token", content=output.response)
+        yield StreamEvent(type="done", output=output)
+
+    @staticmethod
+    def _with_intent(output: AgentOutput, decision: IntentDecision) -> AgentOutput:
+        # Also marks the turn as auto-routed, so it isn't used to retrain the classifier
+        output.metadata = {**(output.metadata or {}), **decision.metadata()}
+        return output
+
+    def _fallback_output(self, target_agent_name: str) -> AgentOutput:
         return AgentOutput(
             response=f"Orchestrator: No specific agent found for '{target_agent_name}'. Available: {list(self.agents.keys())}",
             agent_name="orchestrator",
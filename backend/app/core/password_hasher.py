@@ -0,0 +1,92 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from app.core.scheduler import SchedulerOverloaded
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing/verification on its own bounded thread pool.
+
+    bcrypt releases the GIL, so a few threads use a few cores without blocking the event
+    loop, and (unlike sync handlers) hashing never takes threads from the default pool
+    that sync DB calls and dependencies run in. At most `max_workers` hashes run at once;
+    up to `max_waiting` more wait for a slot for at most `max_wait` seconds. Beyond that
+    requests are shed with SchedulerOverloaded (503 + Retry-After), so a login storm costs
+    those cores and nothing else.
+    """
+
+    def __init__(
+        self,
+        context,
+        max_workers: int = 2,
+        max_waiting: int = 64,
+        max_wait: float = 5.0
+    ):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._slots = asyncio.Semaphore(max_workers)
+        self._waiting = 0
+        self._average_seconds = 0.25 # Running estimate of one hash, for Retry-After
+
+        self.completed = {"hash": 0, "verify": 0}
+        self.rejected = {"queue_full": 0, "wait_timeout": 0}
+
+    @classmethod
+    def from_env(cls, context) -> "PasswordHasher":
+        return cls(
+            context,
+            max_workers=int(os.getenv("AUTH_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))),
+            max_waiting=int(os.getenv("AUTH_HASH_MAX_WAITING", "64")),
+            max_wait=float(os.getenv("AUTH_HASH_MAX_WAIT_MS", "5000")) / 1000
+        )
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: Optional[str]) -> bool:
+        if not hashed_password:
+            return False
+        return await self._run("verify", self.context.verify, password, hashed_password)
+
+    async def _run(self, op: str, fn, *args) -> Any:
+        await self._acquire()
+        try:
+            started = time.perf_counter()
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+            self._average_seconds = 0.9 * self._average_seconds + 0.1 * (time.perf_counter() - started)
+            self.completed[op] += 1
+            return result
+        finally:
+            self._slots.release()
+
+    async def _acquire(self):
+        if self._slots.locked() and self._waiting >= self.max_waiting:
+            self.rejected["queue_full"] += 1
+            raise SchedulerOverloaded("auth", "queue full", self._retry_after())
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected["wait_timeout"] += 1
+            raise SchedulerOverloaded("auth", "wait timeout", self._retry_after())
+        finally:
+            self._waiting -= 1
+
+    def _retry_after(self) -> float:
+        # Time to drain the current queue, at least one second
+        return max(1.0, self._waiting * self._average_seconds / self.max_workers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "waiting": self._waiting,
+            "completed": dict(self.completed),
+            "rejected": dict(self.rejected),
+            "average_ms": round(self._average_seconds * 1000, 2)
+        }
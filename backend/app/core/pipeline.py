@@ -0,0 +1,132 @@
+import time
+import asyncio
+from typing import Any, Dict, List, Mapping, Sequence
+from app.schemas.base import AgentInput, AgentOutput
+from app.agents.base import BaseAgent
+
+# Full learning flow from prototype/agent_flow_pseudocode.py, in presentation order
+DEFAULT_PIPELINE = ["diagnosis", "memory", "explanation", "socratic", "adaptation"]
+
+# Steps whose responses are shown to the learner; the others only feed context to dependents
+RESPONSE_STEPS = ("explanation", "socratic", "adaptation")
+
+class PipelineExecutor:
+    """
+    Runs several agents for one request as a dependency graph.
+
+    Each agent declares the context keys it reads (`inputs`) and produces (`outputs`).
+    A step depends on the steps in the same pipeline that produce one of its inputs;
+    inputs nobody in the pipeline produces are expected from the caller's context.
+    Every step starts as soon as its dependencies finish, so independent agents
+    run concurrently and the request costs roughly the critical path.
+    """
+
+    def __init__(self, agents: Mapping[str, BaseAgent]):
+        self.agents = agents
+
+    def resolve_dependencies(self, steps: Sequence[str]) -> Dict[str, List[str]]:
+        unknown = [s for s in steps if s not in self.agents]
+        if unknown:
+            raise ValueError(f"Unknown pipeline steps: {unknown}")
+
+        producers: Dict[str, List[str]] = {}
+        for step in steps:
+            for key in self.agents[step].outputs:
+                producers.setdefault(key, []).append(step)
+
+        dependencies = {}
+        for step in steps:
+            deps = []
+            for key in self.agents[step].inputs:
+                deps.extend(p for p in producers.get(key, []) if p != step and p not in deps)
+            dependencies[step] = deps
+
+        self._check_acyclic(dependencies)
+        return dependencies
+
+    def _check_acyclic(self, dependencies: Dict[str, List[str]]):
+        visiting, done = set(), set()
+
+        def visit(step):
+            if step in done:
+                return
+            if step in visiting:
+                raise ValueError(f"Pipeline has a dependency cycle through '{step}'")
+            visiting.add(step)
+            for dep in dependencies[step]:
+                visit(dep)
+            visiting.discard(step)
+            done.add(step)
+
+        for step in dependencies:
+            visit(step)
+
+    async def run(self, input_data: AgentInput, steps: Sequence[str] = None) -> AgentOutput:
+        steps = list(steps or DEFAULT_PIPELINE)
+        dependencies = self.resolve_dependencies(steps)
+
+        base_context = dict(input_data.context or {})
+        base_context.pop("target_agent", None)
+        base_context.pop("pipeline", None)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        produced: Dict[str, Dict[str, Any]] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        pipeline_start = time.perf_counter()
+
+        async def run_step(step: str):
+            if dependencies[step]:
+                await asyncio.gather(*(tasks[dep] for dep in dependencies[step]))
+
+            context = dict(base_context)
+            for dep in dependencies[step]:
+                context.update(produced.get(dep, {}))
+            step_input = input_data.model_copy(update={"context": context})
+
+            agent = self.agents[step]
+            started = time.perf_counter()
+            record: Dict[str, Any] = {"depends_on": dependencies[step]}
+            try:
+                output = await agent.process(step_input)
+                produced[step] = agent.extract_outputs(output)
+                record.update({
+                    "agent_name": output.agent_name,
+                    "response": output.response,
+                    "metadata": output.metadata,
+                    "next_action": output.next_action
+                })
+            except Exception as e:
+                # Dependents still run, just without this step's outputs
+                record["error"] = str(e)
+            finished = time.perf_counter()
+            record["started_ms"] = round((started - pipeline_start) * 1000, 2)
+            record["duration_ms"] = round((finished - started) * 1000, 2)
+            results[step] = record
+
+        for step in steps:
+            tasks[step] = asyncio.create_task(run_step(step))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        total_ms = round((time.perf_counter() - pipeline_start) * 1000, 2)
+        response_parts = [
+            results[step]["response"] for step in steps
+            if step in RESPONSE_STEPS and results[step].get("response")
+        ]
+
+        return AgentOutput(
+            response="\n\n".join(response_parts),
+            agent_name="pipeline",
+            metadata={
+                "pipeline": {
+                    "steps": {step: results[step] for step in steps},
+                    "total_ms": total_ms,
+                    # What the same steps would have cost run one after another
+                    "sequential_ms": round(sum(r["duration_ms"] for r in results.values()), 2)
+                }
+            },
+            next_action="wait_for_user"
+        )
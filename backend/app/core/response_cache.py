@@ -0,0 +1,204 @@
+import os
+import time
+import json
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+class LRUTTLCache:
+    """
+    Bounded in-memory LRU cache where every entry also expires after a TTL.
+    Not coroutine-aware on its own; operations are synchronous and never await,
+    so they are safe to call from the event loop.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteCacheTier:
+    """
+    Optional disk tier so cached responses survive restarts.
+    Uses the stdlib sqlite3 driver with a single shared connection guarded by a lock;
+    callers run it off the event loop via asyncio.to_thread.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return row[0]
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl_seconds)
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ResponseCache:
+    """
+    Two-tier cache for model responses keyed by (model_id, system_prompt, user_message, temperature).
+    Memory tier is an LRU with TTL; the disk tier is optional.
+
+    Any object exposing the same async get/set, make_key, is_cacheable and stats
+    methods can be passed to ModelRouter instead.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600,
+        max_temperature: float = 0.7,
+        disk_path: Optional[str] = None
+    ):
+        self.memory = LRUTTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.disk = SQLiteCacheTier(disk_path, ttl_seconds=ttl_seconds) if disk_path else None
+        self.max_temperature = max_temperature
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """
+        Builds the cache from MODEL_CACHE_* environment variables.
+        Returns None when caching is disabled.
+        """
+        if os.getenv("MODEL_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+
+        return cls(
+            max_entries=int(os.getenv("MODEL_CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.getenv("MODEL_CACHE_TTL_SECONDS", "3600")),
+            max_temperature=float(os.getenv("MODEL_CACHE_MAX_TEMPERATURE", "0.7")),
+            disk_path=os.getenv("MODEL_CACHE_DISK_PATH") or None
+        )
+
+    @staticmethod
+    def make_key(model_id: str, system_prompt: str, user_message: str, temperature: float) -> str:
+        """
+        Only leading/trailing whitespace is ignored: inner whitespace can carry meaning
+        (indentation in a code snippet), so prompts differing in it get their own answers.
+        """
+        payload = json.dumps([
+            model_id,
+            system_prompt.strip(),
+            user_message.strip(),
+            round(temperature, 3)
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, temperature: float) -> bool:
+        """
+        High temperature calls are expected to vary, so serving a stored answer would change behaviour.
+        """
+        if temperature > self.max_temperature:
+            self.skipped += 1
+            return False
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        if self.disk:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self.memory.set(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        if self.disk:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "evictions": self.memory.evictions,
+            "expirations": self.memory.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self.memory),
+            "max_entries": self.memory.max_entries,
+            "ttl_seconds": self.memory.ttl_seconds,
+            "max_temperature": self.max_temperature,
+            "disk_enabled": self.disk is not None
+        }
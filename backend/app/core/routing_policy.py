@@ -0,0 +1,188 @@
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+class ProviderError(Exception):
+    """
+    A provider call failed (API error, timeout, empty answer).
+    Raised instead of returning the error text as if it were a model response.
+    """
+
+    def __init__(self, model_id: str, message: str):
+        super().__init__(f"{model_id}: {message}")
+        self.model_id = model_id
+
+class ProviderUnavailable(ProviderError):
+    """
+    No model could be called at all (e.g. none of the candidates has an API key configured),
+    as opposed to providers that were called and failed.
+    """
+
+@dataclass
+class ModelResult:
+    text: str
+    model_id: str # Model that actually produced the text
+    requested_model: str
+    cached: bool = False
+    hedged: bool = False # A hedge request was sent while this call was running
+    attempts: List[Dict[str, Any]] = field(default_factory=list) # Failed attempts before the answer
+
+    @property
+    def fell_back(self) -> bool:
+        return self.model_id != self.requested_model
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            "model_id": self.model_id,
+            "routing": {
+                "requested_model": self.requested_model,
+                "fallback": self.fell_back,
+                "hedged": self.hedged,
+                "cached": self.cached,
+                "failed_attempts": self.attempts
+            }
+        }
+
+class LatencyStats:
+    """
+    Rolling latency and error statistics for one model: EWMA plus a windowed p95.
+    The error rate also decays with time (halving every `half_life` seconds without calls),
+    so a model that stopped getting traffic after failing becomes eligible again.
+    """
+
+    def __init__(self, window: int = 200, alpha: float = 0.2, half_life: float = 30.0):
+        self.alpha = alpha
+        self.half_life = half_life
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.ewma_ms: Optional[float] = None
+        self._error_rate = 0.0 # EWMA of failures (1) vs successes (0) as of _updated
+        self._updated = time.monotonic()
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def error_rate(self) -> float:
+        if self.half_life <= 0:
+            return self._error_rate
+        return self._error_rate * 0.5 ** ((time.monotonic() - self._updated) / self.half_life)
+
+    def record(self, ok: bool, latency_ms: Optional[float] = None):
+        self._error_rate = (1 - self.alpha) * self.error_rate + self.alpha * (0.0 if ok else 1.0)
+        self._updated = time.monotonic()
+        if ok:
+            self.successes += 1
+        else:
+            self.failures += 1
+        if ok and latency_ms is not None:
+            self.latencies.append(latency_ms)
+            self.ewma_ms = latency_ms if self.ewma_ms is None else (1 - self.alpha) * self.ewma_ms + self.alpha * latency_ms
+
+    def p95(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "samples": len(self.latencies),
+            "ewma_ms": round(self.ewma_ms, 2) if self.ewma_ms is not None else None,
+            "p95_ms": round(p95, 2) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "successes": self.successes,
+            "failures": self.failures
+        }
+
+class RoutingPolicy:
+    """
+    Decides which models to try for a request and when to hedge.
+
+    A request goes to its model first, then along the configured fallback chain
+    (e.g. gemini-pro -> gpt-4) on errors or timeouts. A model whose recent error rate is
+    above `unhealthy_error_rate` is tried last instead of first; the rate decays over
+    `error_half_life_seconds`, so an unhealthy model is retried once it has been left alone
+    for a while, and recovers for good when those calls succeed.
+    With hedging on, a second request goes to the next model in the chain once the
+    first has run longer than its own p95; whichever answers first wins.
+    """
+
+    def __init__(
+        self,
+        fallback_chain: List[str] = None,
+        hedge_enabled: bool = False,
+        hedge_min_samples: int = 20,
+        timeout_seconds: float = 60.0,
+        unhealthy_error_rate: float = 0.5,
+        error_half_life_seconds: float = 30.0
+    ):
+        self.fallback_chain = list(fallback_chain or [])
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_samples = hedge_min_samples
+        self.timeout_seconds = timeout_seconds
+        self.unhealthy_error_rate = unhealthy_error_rate
+        self.error_half_life_seconds = error_half_life_seconds
+        self.models: Dict[str, LatencyStats] = {}
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_env(cls) -> "RoutingPolicy":
+        chain = os.getenv("MODEL_FALLBACK_CHAIN", "gemini-pro,gpt-4")
+        return cls(
+            fallback_chain=[m.strip() for m in chain.split(",") if m.strip()],
+            hedge_enabled=os.getenv("MODEL_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes"),
+            hedge_min_samples=int(os.getenv("MODEL_HEDGE_MIN_SAMPLES", "20")),
+            timeout_seconds=float(os.getenv("MODEL_CALL_TIMEOUT_SECONDS", "60")),
+            unhealthy_error_rate=float(os.getenv("MODEL_UNHEALTHY_ERROR_RATE", "0.5")),
+            error_half_life_seconds=float(os.getenv("MODEL_ERROR_HALF_LIFE_SECONDS", "30"))
+        )
+
+    def _stats(self, model_id: str) -> LatencyStats:
+        if model_id not in self.models:
+            self.models[model_id] = LatencyStats(half_life=self.error_half_life_seconds)
+        return self.models[model_id]
+
+    def is_healthy(self, model_id: str) -> bool:
+        stats = self.models.get(model_id)
+        return stats is None or stats.error_rate < self.unhealthy_error_rate
+
+    def candidates(self, model_id: str) -> List[str]:
+        """
+        Models to try in order: the requested one, then the rest of its chain.
+        A model outside the chain has no fallbacks.
+        """
+        if model_id not in self.fallback_chain:
+            return [model_id]
+
+        ordered = self.fallback_chain[self.fallback_chain.index(model_id):]
+        healthy = [m for m in ordered if self.is_healthy(m)]
+        return healthy + [m for m in ordered if m not in healthy]
+
+    def hedge_delay(self, model_id: str) -> Optional[float]:
+        """
+        Seconds to wait before hedging a call to model_id, or None to not hedge.
+        """
+        if not self.hedge_enabled:
+            return None
+        stats = self.models.get(model_id)
+        if stats is None or len(stats.latencies) < self.hedge_min_samples:
+            return None
+        return stats.p95() / 1000
+
+    def record(self, model_id: str, ok: bool, latency_ms: Optional[float] = None):
+        self._stats(model_id).record(ok, latency_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fallback_chain": self.fallback_chain,
+            "hedge_enabled": self.hedge_enabled,
+            "timeout_seconds": self.timeout_seconds,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "fallbacks": self.fallbacks,
+            "models": {model_id: s.stats() for model_id, s in self.models.items()}
+        }
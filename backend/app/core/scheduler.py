@@ -0,0 +1,358 @@
+import os
+import json
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Union
+from app.core.tracing import span
+
+# Lower value runs first. Chat traffic goes ahead of research/benchmark jobs.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+PRIORITY_NAMES = {"interactive": PRIORITY_INTERACTIVE, "batch": PRIORITY_BATCH}
+
+def resolve_priority(value: Union[str, int, None]) -> int:
+    """
+    Accepts a priority name ("interactive", "batch") or a raw number; defaults to interactive.
+    """
+    if value is None:
+        return PRIORITY_INTERACTIVE
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.lstrip("-").isdigit():
+        return int(value)
+    return PRIORITY_NAMES.get(str(value).lower(), PRIORITY_INTERACTIVE)
+
+def estimate_tokens(*texts: str) -> int:
+    # ~4 characters per token is close enough for budgeting
+    return sum(len(t or "") for t in texts) // 4 + 1
+
+class SchedulerOverloaded(Exception):
+    """
+    Raised when a request is shed instead of queued (queue full or waited too long).
+    `retry_after` is a hint in seconds for the Retry-After header.
+    """
+
+    def __init__(self, limit_name: str, reason: str, retry_after: float):
+        super().__init__(f"{limit_name} is overloaded ({reason}), retry after {retry_after:.0f}s")
+        self.limit_name = limit_name
+        self.reason = reason
+        self.retry_after = retry_after
+
+@dataclass
+class Limits:
+    # 0 disables the corresponding limit
+    max_in_flight: int = 0
+    requests_per_minute: float = 0
+    tokens_per_minute: float = 0
+    max_queue: int = 256
+    max_wait_seconds: float = 30.0
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously; capacity is one minute's worth of budget.
+    The level may go negative when actual usage is reconciled after a call.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Seconds until `amount` can be consumed (0 if it can be right now).
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        self._refill()
+        self.level -= delta
+
+class LimitGroup:
+    """
+    Limits and counters for one provider or one model.
+    """
+
+    def __init__(self, name: str, limits: Limits):
+        self.name = name
+        self.limits = limits
+        self.requests = TokenBucket(limits.requests_per_minute) if limits.requests_per_minute > 0 else None
+        self.tokens = TokenBucket(limits.tokens_per_minute) if limits.tokens_per_minute > 0 else None
+
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.peak_queue = 0
+        self.waits_ms: Deque[float] = deque(maxlen=1000)
+        self._hold_ewma = 1.0 # seconds a slot is typically held, for Retry-After hints
+
+    def blocked_for(self, tokens: int) -> Optional[float]:
+        """
+        None if a request can start now; otherwise how long until it might (0 = when a slot frees up).
+        """
+        if self.limits.max_in_flight and self.in_flight >= self.limits.max_in_flight:
+            return 0.0
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait if wait > 0 else None
+
+    def admit(self, tokens: int, waited: float):
+        self.in_flight += 1
+        self.admitted += 1
+        self.waits_ms.append(waited * 1000)
+        if self.requests:
+            self.requests.consume(1)
+        if self.tokens:
+            self.tokens.consume(tokens)
+
+    def release(self, held: float):
+        self.in_flight -= 1
+        self._hold_ewma = 0.8 * self._hold_ewma + 0.2 * held
+
+    def retry_after(self) -> float:
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.limits.max_in_flight:
+            # Rough time for the current queue to drain through the available slots
+            wait = max(wait, self._hold_ewma * (self.queued + 1) / self.limits.max_in_flight)
+        return max(1.0, math.ceil(wait))
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self.waits_ms)
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "peak_queue_depth": self.peak_queue,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+            "wait_ms_avg": round(sum(waits) / len(waits), 2) if waits else 0.0,
+            "wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2) if waits else 0.0,
+            "max_in_flight": self.limits.max_in_flight,
+            "requests_per_minute": self.limits.requests_per_minute,
+            "tokens_per_minute": self.limits.tokens_per_minute,
+            "max_queue": self.limits.max_queue
+        }
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "groups", "tokens", "future", "enqueued")
+
+    def __init__(self, priority: int, seq: int, groups: List[LimitGroup], tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.groups = groups
+        self.tokens = tokens
+        self.future = future
+        self.enqueued = time.monotonic()
+
+    def __lt__(self, other: "_Waiter"):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class RequestScheduler:
+    """
+    Admission control in front of the model providers.
+
+    Every call is checked against its provider's limits and, when configured, its model's
+    limits (max in flight, requests/min, tokens/min). Calls that can't start yet wait in a
+    bounded priority queue; when the queue is full, or a call has waited longer than
+    max_wait_seconds, it is rejected with SchedulerOverloaded so the API can answer 503
+    quickly instead of piling more work onto a saturated provider.
+    """
+
+    def __init__(self, provider_limits: Dict[str, Limits] = None, model_limits: Dict[str, Limits] = None):
+        self.groups: Dict[str, LimitGroup] = {}
+        for provider, limits in (provider_limits or {}).items():
+            self.groups[f"provider:{provider}"] = LimitGroup(f"provider:{provider}", limits)
+        for model_id, limits in (model_limits or {}).items():
+            self.groups[f"model:{model_id}"] = LimitGroup(f"model:{model_id}", limits)
+
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @classmethod
+    def from_env(cls) -> "RequestScheduler":
+        """
+        LLM_<PROVIDER>_MAX_IN_FLIGHT / _RPM / _TPM / _MAX_QUEUE / _MAX_WAIT_SECONDS per provider
+        (GOOGLE, OPENAI, LOCAL), plus LLM_MODEL_LIMITS as JSON for per-model overrides, e.g.
+        {"gpt-4": {"max_in_flight": 4, "requests_per_minute": 60}}.
+        """
+        defaults = {"google": 32, "openai": 32, "local": 0}
+        provider_limits = {}
+        for provider, in_flight in defaults.items():
+            prefix = f"LLM_{provider.upper()}_"
+            provider_limits[provider] = Limits(
+                max_in_flight=int(os.getenv(prefix + "MAX_IN_FLIGHT", str(in_flight))),
+                requests_per_minute=float(os.getenv(prefix + "RPM", "0")),
+                tokens_per_minute=float(os.getenv(prefix + "TPM", "0")),
+                max_queue=int(os.getenv(prefix + "MAX_QUEUE", "256")),
+                max_wait_seconds=float(os.getenv(prefix + "MAX_WAIT_SECONDS", "30"))
+            )
+
+        model_limits = {
+            model_id: Limits(**values)
+            for model_id, values in json.loads(os.getenv("LLM_MODEL_LIMITS") or "{}").items()
+        }
+        return cls(provider_limits, model_limits)
+
+    def _groups_for(self, provider: str, model_id: str) -> List[LimitGroup]:
+        groups = []
+        for key in (f"provider:{provider}", f"model:{model_id}"):
+            if key in self.groups:
+                groups.append(self.groups[key])
+        return groups
+
+    def ensure_capacity(self, provider: str, model_id: str):
+        """
+        Raises SchedulerOverloaded right away if a new call would be shed.
+        Lets streaming endpoints answer 503 before they commit to a 200 response.
+        """
+        for group in self._groups_for(provider, model_id):
+            if group.queued >= group.limits.max_queue and group.blocked_for(1) is not None:
+                group.shed += 1
+                raise SchedulerOverloaded(group.name, "queue full", group.retry_after())
+
+    @asynccontextmanager
+    async def slot(self, provider: str, model_id: str, tokens: int = 1, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[None]:
+        """
+        Holds one in-flight slot for the duration of the block.
+        """
+        groups = self._groups_for(provider, model_id)
+        if not groups:
+            yield
+            return
+
+        with span("llm.queue", model=model_id):
+            await self._acquire(groups, tokens, priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            held = time.monotonic() - started
+            for group in groups:
+                group.release(held)
+            self._pump()
+
+    async def _acquire(self, groups: List[LimitGroup], tokens: int, priority: int):
+        # Fast path: nothing queued ahead of us and every limit has room
+        if not any(g.queued for g in groups) and all(g.blocked_for(tokens) is None for g in groups):
+            for group in groups:
+                group.admit(tokens, 0.0)
+            return
+
+        for group in groups:
+            if group.queued >= group.limits.max_queue:
+                group.shed += 1
+                raise SchedulerOverloaded(group.name, "queue full", group.retry_after())
+
+        waiter = _Waiter(priority, next(self._seq), groups, tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, waiter)
+        for group in groups:
+            group.queued += 1
+            group.peak_queue = max(group.peak_queue, group.queued)
+        self._pump()
+
+        timeout = min(g.limits.max_wait_seconds for g in groups)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as we gave up; hand the slot back
+                for group in groups:
+                    group.release(0.0)
+                self._pump()
+            else:
+                waiter.future.cancel()
+                self._remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                group = max(groups, key=lambda g: g.queued)
+                group.timed_out += 1
+                raise SchedulerOverloaded(group.name, "queue wait timed out", group.retry_after())
+            raise
+
+    def _remove(self, waiter: _Waiter):
+        if waiter in self._queue:
+            self._queue.remove(waiter)
+            heapq.heapify(self._queue)
+            for group in waiter.groups:
+                group.queued -= 1
+
+    def _pump(self):
+        """
+        Admits queued calls in priority order. A call blocked on one group doesn't hold back
+        calls for other groups, but lower-priority calls for the same group stay behind it.
+        """
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+        blocked = set()
+        next_check = None
+        remaining = []
+        for waiter in sorted(self._queue):
+            if waiter.future.done():
+                continue
+            if any(g.name in blocked for g in waiter.groups):
+                remaining.append(waiter)
+                continue
+
+            waits = [g.blocked_for(waiter.tokens) for g in waiter.groups]
+            if all(w is None for w in waits):
+                waited = time.monotonic() - waiter.enqueued
+                for group in waiter.groups:
+                    group.queued -= 1
+                    group.admit(waiter.tokens, waited)
+                waiter.future.set_result(None)
+                continue
+
+            remaining.append(waiter)
+            for group, wait in zip(waiter.groups, waits):
+                if wait is not None:
+                    blocked.add(group.name)
+                    if wait > 0:
+                        next_check = wait if next_check is None else min(next_check, wait)
+
+        self._queue = remaining
+        heapq.heapify(self._queue)
+
+        # Rate limits free up with time rather than on release, so wake up when they refill
+        if next_check is not None:
+            self._timer = asyncio.get_running_loop().call_later(next_check, self._pump)
+
+    def record_usage(self, provider: str, model_id: str, estimated_tokens: int, actual_tokens: int):
+        """
+        Reconciles the tokens/min budget once the real size of a call is known.
+        """
+        for group in self._groups_for(provider, model_id):
+            if group.tokens:
+                group.tokens.adjust(actual_tokens - min(estimated_tokens, group.tokens.capacity))
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: group.stats() for name, group in self.groups.items()}
@@ -4,9 +4,15 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.db import models
-from app.db.database import get_db
+from app.db.database import get_db, get_async_db
+from app.core.tracing import span
+from app.core.password_hasher import PasswordHasher
+from app.core.token_cache import token_cache
+from app.services.user_cache import CurrentUser, user_cache
 
 # Configuration
 SECRET_KEY = "CHANGE_THIS_TO_A_SECURE_SECRET_IN_PRODUCTION" # TODO: Load from env
@@ -15,6 +21,8 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours for MVP convenience
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+# Request handlers hash through this (off the event loop and the default threadpool)
+password_hasher = PasswordHasher.from_env(pwd_context)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -32,21 +40,64 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_access_token(token: str) -> str:
+    """
+    Validates the JWT and returns the subject (email).
+    Tokens verified before are answered from token_cache until they expire.
+    """
+    email = token_cache.get(token)
+    if email is not None:
+        return email
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    token_cache.put(token, email, payload.get("exp"))
+    return email
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> CurrentUser:
+    # Sync dependency: FastAPI runs it in the threadpool, so the query doesn't block the event loop
+    with span("auth.decode"):
+        email = decode_access_token(token)
+    
+    with span("auth.user_lookup"):
+        user = user_cache.get_user(email)
+        if user is None:
+            load_token = user_cache.load_token()
+            row = db.query(models.User).filter(models.User.email == email).first()
+            if row is not None:
+                user = CurrentUser.from_row(row)
+                user_cache.put_user(user, load_token)
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> CurrentUser:
+    """
+    Async variant of get_current_user for handlers that use the async DB session.
+    """
+    with span("auth.decode"):
+        email = decode_access_token(token)
     
-    user = db.query(models.User).filter(models.User.email == email).first()
+    with span("auth.user_lookup"):
+        user = user_cache.get_user(email)
+        if user is None:
+            load_token = user_cache.load_token()
+            result = await db.execute(select(models.User).where(models.User.email == email))
+            row = result.scalars().first()
+            if row is not None:
+                user = CurrentUser.from_row(row)
+                user_cache.put_user(user, load_token)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
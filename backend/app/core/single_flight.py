@@ -0,0 +1,58 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one underlying call.
+
+    The first caller (the leader) starts the work as a task; callers arriving while it
+    is in flight await the same task through asyncio.shield, so one waiter being
+    cancelled doesn't cancel the work for the others. When every waiter has gone,
+    the task is cancelled so an abandoned call doesn't keep holding a provider slot.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None or call.task.cancelled():
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _task, key=key, call=call: self._forget(key, call))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Only reachable when the remaining waiters were all cancelled
+                self.abandoned += 1
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "leader_calls": self.leaders,
+            "coalesced_calls": self.coalesced,
+            "abandoned_calls": self.abandoned,
+            "coalesce_rate": round(self.coalesced / total, 4) if total else 0.0
+        }
@@ -0,0 +1,215 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional
+from app.schemas.base import AgentInput, AgentOutput
+from app.core.scheduler import TokenBucket, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# next_action announced by an agent -> agent that performs it. Only side-effect free,
+# LLM backed steps belong here ("update_memory" writes, so it is never speculated).
+SPECULATIVE_STEPS: Dict[str, str] = {
+    "check_understanding": "socratic"
+}
+
+@dataclass
+class SpeculativeStep:
+    action: str
+    agent: str
+    message: str
+    task: asyncio.Task
+    tokens: int
+    started: float
+
+class SpeculativeExecutor:
+    """
+    Runs the step an agent announced as its next_action in the background, so the
+    follow-up turn can be answered from the stored result.
+
+    After e.g. an explanation (next_action "check_understanding"), the Socratic agent is
+    run at batch priority on the same message with the explanation appended to the history.
+    The result is kept per session. The follow-up request gets it if it asks for that step:
+    context["next_action"] equal to the announced action, or target_agent equal to the
+    predicted agent with the same message. A still-running step is awaited rather than
+    started again. Any other request in the session cancels it.
+
+    Spending is capped by max_in_flight, a token budget per minute and a TTL on results.
+    """
+
+    def __init__(
+        self,
+        agents: Mapping[str, Any],
+        enabled: bool = False,
+        max_in_flight: int = 8,
+        tokens_per_minute: float = 20000,
+        ttl_seconds: float = 300,
+        max_entries: int = 1000,
+        output_token_estimate: int = 256
+    ):
+        self.agents = agents
+        self.enabled = enabled
+        self.max_in_flight = max_in_flight
+        self.budget = TokenBucket(tokens_per_minute)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.output_token_estimate = output_token_estimate
+
+        self._steps: "OrderedDict[str, SpeculativeStep]" = OrderedDict()
+
+        self.launched = 0
+        self.hits = 0 # Served with the result already there
+        self.hits_in_flight = 0 # Served by awaiting a step that was still running
+        self.discarded = 0 # Cancelled or expired unused
+        self.skipped_budget = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls, agents: Mapping[str, Any]) -> "SpeculativeExecutor":
+        return cls(
+            agents,
+            enabled=os.getenv("SPECULATION_ENABLED", "false").lower() in ("1", "true", "yes"),
+            max_in_flight=int(os.getenv("SPECULATION_MAX_IN_FLIGHT", "8")),
+            tokens_per_minute=float(os.getenv("SPECULATION_TOKENS_PER_MINUTE", "20000")),
+            ttl_seconds=float(os.getenv("SPECULATION_TTL_SECONDS", "300")),
+            max_entries=int(os.getenv("SPECULATION_MAX_ENTRIES", "1000")),
+            output_token_estimate=int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", "256"))
+        )
+
+    def in_flight(self) -> int:
+        return sum(1 for step in self._steps.values() if not step.task.done())
+
+    def maybe_launch(self, input_data: AgentInput, output: AgentOutput) -> bool:
+        """
+        Starts the step predicted by output.next_action for this session, if speculation is
+        on (SPECULATION_ENABLED, or context["speculate"] per request) and within budget.
+        """
+        context = input_data.context or {}
+        if not context.get("speculate", self.enabled):
+            return False
+        agent_name = SPECULATIVE_STEPS.get(output.next_action or "")
+        if agent_name not in self.agents or not input_data.session_id:
+            return False
+
+        self.cancel(input_data.session_id)
+        self._expire()
+        history = list(context.get("chat_history") or []) + [
+            {"role": "user", "content": input_data.message},
+            {"role": "assistant", "content": output.response}
+        ]
+        tokens = estimate_tokens(input_data.message, output.response) + self.output_token_estimate
+        if self.in_flight() >= self.max_in_flight or self.budget.wait_time(tokens) > 0:
+            self.skipped_budget += 1
+            return False
+        self.budget.consume(tokens)
+
+        step_input = input_data.model_copy(update={
+            "context": {
+                **context,
+                "chat_history": history,
+                "target_agent": agent_name,
+                "priority": "batch" # Behind live traffic, and shed first under load
+            }
+        })
+        task = asyncio.create_task(self.agents[agent_name].process(step_input))
+        task.add_done_callback(self._log_failure)
+        self._steps[input_data.session_id] = SpeculativeStep(
+            action=output.next_action,
+            agent=agent_name,
+            message=input_data.message,
+            task=task,
+            tokens=tokens,
+            started=time.monotonic()
+        )
+        while len(self._steps) > self.max_entries:
+            _, oldest = self._steps.popitem(last=False)
+            self._discard(oldest)
+        self.launched += 1
+        return True
+
+    async def take(self, input_data: AgentInput) -> Optional[AgentOutput]:
+        """
+        The precomputed output for this request, or None. A stored step that doesn't match
+        the request is cancelled, since the conversation moved on.
+        """
+        step = self._steps.pop(input_data.session_id, None)
+        if step is None:
+            return None
+
+        context = input_data.context or {}
+        matches = context.get("next_action") == step.action or (
+            context.get("target_agent") == step.agent and input_data.message == step.message
+        )
+        if not matches or time.monotonic() - step.started > self.ttl_seconds:
+            self._discard(step)
+            return None
+
+        ready = step.task.done()
+        try:
+            output = await step.task
+        except Exception:
+            # Already counted by _log_failure; the caller runs the step normally
+            return None
+        if ready:
+            self.hits += 1
+        else:
+            self.hits_in_flight += 1
+
+        output.metadata = {
+            **(output.metadata or {}),
+            "speculative": {
+                "precomputed_for": step.action,
+                "ready": ready,
+                "age_ms": round((time.monotonic() - step.started) * 1000, 2)
+            }
+        }
+        return output
+
+    def cancel(self, session_id: str):
+        step = self._steps.pop(session_id, None)
+        if step is not None:
+            self._discard(step)
+
+    def cancel_all(self):
+        while self._steps:
+            _, step = self._steps.popitem()
+            self._discard(step)
+
+    def _discard(self, step: SpeculativeStep):
+        if not step.task.done():
+            step.task.cancel()
+            # Unspent budget goes back
+            self.budget.adjust(-step.tokens)
+        self.discarded += 1
+
+    def _expire(self):
+        now = time.monotonic()
+        for session_id, step in list(self._steps.items()):
+            if now - step.started > self.ttl_seconds:
+                del self._steps[session_id]
+                self._discard(step)
+
+    def _log_failure(self, task: asyncio.Task):
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self.failed += 1
+            logger.warning("Speculative step failed: %s", task.exception())
+
+    def stats(self) -> Dict[str, Any]:
+        served = self.hits + self.hits_in_flight
+        return {
+            "enabled": self.enabled,
+            "stored": len(self._steps),
+            "in_flight": self.in_flight(),
+            "launched": self.launched,
+            "hits": self.hits,
+            "hits_in_flight": self.hits_in_flight,
+            "discarded": self.discarded,
+            "skipped_budget": self.skipped_budget,
+            "failed": self.failed,
+            "hit_rate": round(served / self.launched, 4) if self.launched else None
+        }
@@ -0,0 +1,92 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of access tokens whose signature was already checked -> subject (email).
+
+    An entry lives until the token's own `exp` or `ttl_seconds`, whichever comes first, so
+    the cache never accepts a token the JWT library would reject as expired. Keys are
+    SHA-256 digests, so the raw bearer tokens aren't kept in memory. The user behind the
+    subject is resolved separately (services/user_cache.py), so deactivating a user or
+    changing their row is not delayed by this cache. Thread safe: the sync dependency
+    runs in the threadpool.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+
+        # digest -> (expires_at as wall-clock time, subject)
+        self._entries: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "VerifiedTokenCache":
+        return cls(
+            max_entries=int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000")),
+            ttl_seconds=float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300")),
+            enabled=os.getenv("TOKEN_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+        )
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, subject: str, exp: Optional[Any]):
+        """
+        exp is the token's exp claim (seconds since the epoch); tokens without one are
+        only kept for ttl_seconds.
+        """
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= time.time():
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, subject)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+token_cache = VerifiedTokenCache.from_env()
@@ -0,0 +1,266 @@
+import os
+import time
+import random
+import bisect
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Seconds, following the Prometheus convention
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Label combinations kept per metric; further ones are folded into a single "other" series
+MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", "1000"))
+OVERFLOW_LABEL = "other"
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _series_key(label_names: Tuple[str, ...], labels: Dict[str, Any], series: Dict, max_series: int) -> Tuple[Any, ...]:
+    key = tuple(labels.get(n, "") for n in label_names)
+    if key not in series and len(series) >= max_series:
+        # Unbounded label values (ids, user input) would grow memory and every scrape forever
+        return tuple(OVERFLOW_LABEL for _ in label_names)
+    return key
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), max_series: int = MAX_SERIES):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.max_series = max_series
+        self._values: Dict[Tuple[Any, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _series_key(self.label_names, labels, self._values, self.max_series)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(
+        self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS, max_series: int = MAX_SERIES
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.max_series = max_series
+        # label values -> [per-bucket counts (non-cumulative, last one is +Inf), sum, count]
+        self._series: Dict[Tuple[Any, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _series_key(self.label_names, labels, self._series, self.max_series)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """
+    Counters and histograms rendered in the Prometheus text exposition format.
+    Collectors are callables returning (name, type, help, [(labels dict, value)]) tuples
+    for values that already live elsewhere (cache stats, queue depths).
+    """
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]]]] = []
+
+    def counter(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable):
+        self._collectors.append(collector)
+
+    def render(self, extra: Iterable[Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]] = ()) -> str:
+        """
+        `extra` takes collector-style tuples gathered by the caller, e.g. values that need
+        blocking I/O and were read off the event loop.
+        """
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        collected = [collector() for collector in self._collectors] + [list(extra)]
+        for results in collected:
+            for name, metric_type, help_text, samples in results:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    names = tuple(labels.keys())
+                    lines.append(f"{name}{_format_labels(names, tuple(labels.values()))} {value}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+SPAN_SECONDS = registry.histogram(
+    "app_span_duration_seconds",
+    "Time spent per request phase",
+    ("span", "agent", "model")
+)
+SPAN_ERRORS = registry.counter(
+    "app_span_errors_total",
+    "Request phases that raised",
+    ("span", "agent", "model")
+)
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total",
+    "HTTP requests by route and status",
+    ("method", "route", "status")
+)
+HTTP_SECONDS = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency, including streamed response bodies",
+    ("method", "route")
+)
+
+class Trace:
+    """
+    Span timings for one request, in the order the spans finished.
+    """
+
+    __slots__ = ("started", "spans", "sampled")
+
+    def __init__(self, sampled: bool = False):
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, Dict[str, Any], float, float]] = []
+        self.sampled = sampled
+
+    def breakdown(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "spans": [
+                {"span": name, **labels, "start_ms": round(start * 1000, 2), "duration_ms": round(duration * 1000, 2)}
+                for name, labels, start, duration in self.spans
+            ]
+        }
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+
+# Fraction of requests whose full trace is kept in recent_traces (0 disables)
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+recent_traces: Deque[Dict[str, Any]] = deque(maxlen=int(os.getenv("TRACE_RECENT_MAX", "100")))
+
+def start_trace() -> Tuple[Trace, contextvars.Token]:
+    trace = Trace(sampled=SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE)
+    return trace, _current_trace.set(trace)
+
+def end_trace(token: contextvars.Token, **attributes):
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    if trace is not None and trace.sampled:
+        recent_traces.append({**attributes, **trace.breakdown()})
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+@contextmanager
+def span(name: str, agent: str = "", model: str = "") -> Iterator[None]:
+    """
+    Times a phase. Always feeds the aggregate histogram (two perf_counter calls and a dict
+    update); the span is also added to the request's trace when one is active.
+    Works around awaits, since it only measures wall time between enter and exit.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        SPAN_ERRORS.inc(span=name, agent=agent, model=model)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        SPAN_SECONDS.observe(duration, span=name, agent=agent, model=model)
+        trace = _current_trace.get()
+        if trace is not None:
+            labels = {}
+            if agent:
+                labels["agent"] = agent
+            if model:
+                labels["model"] = model
+            trace.spans.append((name, labels, started - trace.started, duration))
+
+def timing_breakdown() -> Optional[Dict[str, Any]]:
+    trace = _current_trace.get()
+    return trace.breakdown() if trace is not None else None
+
+def _route_template(scope) -> str:
+    """
+    Full path template of the matched route (e.g. /api/sessions/{session_id}/messages).
+    scope["route"] of an included router only carries the path relative to its prefix,
+    so the prefix is taken back from the request path.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if not template:
+        return "unmatched"
+    segments = template.rstrip("/").count("/")
+    prefix = scope.get("path", "").rstrip("/").rsplit("/", segments)[0] if segments else ""
+    return prefix + template
+
+class TracingMiddleware:
+    """
+    ASGI middleware that opens a trace for every HTTP request and records request
+    counts/latency by route template. Plain ASGI (no BaseHTTPMiddleware) so the trace
+    context also covers streamed response bodies.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace, token = start_trace()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Route template (e.g. /api/sessions/{session_id}/messages) keeps label cardinality bounded
+            route = _route_template(scope)
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status["code"]))
+            HTTP_SECONDS.observe(time.perf_counter() - trace.started, method=method, route=route)
+            end_trace(token, method=method, route=route, status=status["code"])
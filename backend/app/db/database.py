@@ -1,8 +1,15 @@
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 import os
+import hashlib
+import tempfile
 
 # Ensure data directory exists
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -11,11 +18,151 @@ os.makedirs(msg_dir, exist_ok=True)
 
 SQLITE_URL = f"sqlite:///{os.path.join(msg_dir, 'app.db')}"
 
-engine = create_engine(
-    SQLITE_URL, connect_args={"check_same_thread": False}
-)
+def to_async_url(url: str) -> str:
+    """
+    Async driver URL for a sync one: sqlite -> aiosqlite, postgresql -> asyncpg.
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    elif backend == "postgresql":
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+    return parsed.render_as_string(hide_password=False)
+
+def _normalize_url(url: str) -> str:
+    # Hosted Postgres often hands out postgres:// URLs, which SQLAlchemy doesn't accept
+    return "postgresql://" + url[len("postgres://"):] if url.startswith("postgres://") else url
+
+# DATABASE_URL may point at Postgres (needs psycopg2 and asyncpg installed); the async
+# URL is derived from it unless ASYNC_DATABASE_URL is set. DATABASE_READ_URL (e.g. a
+# replica) or DATABASE_READ_ENGINE=true adds a separate read-only engine, see below.
+DATABASE_URL = _normalize_url(os.getenv("DATABASE_URL", SQLITE_URL))
+ASYNC_DATABASE_URL = _normalize_url(os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL))
+DATABASE_READ_URL = _normalize_url(os.getenv("DATABASE_READ_URL", ""))
+if not DATABASE_READ_URL and os.getenv("DATABASE_READ_ENGINE", "false").lower() in ("1", "true", "yes"):
+    DATABASE_READ_URL = DATABASE_URL
+
+@dataclass
+class EngineProfile:
+    """
+    Connection pool sizing plus the per-connection SQLite pragmas.
+
+    WAL lets readers run alongside the single writer instead of blocking on it,
+    synchronous=NORMAL only fsyncs at checkpoints (safe with WAL: a power cut may lose the
+    latest commits, never corrupt the file), and busy_timeout makes a writer wait for the
+    lock rather than fail with "database is locked". mmap and a larger page cache cut
+    read syscalls. Pragmas are ignored for other databases.
+    """
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: float = 30
+    pool_recycle: int = 1800 # Seconds; also keeps server-side idle timeouts from killing connections
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    busy_timeout_ms: int = 5000
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size_kb: int = 64 * 1024
+
+    @classmethod
+    def from_env(cls) -> "EngineProfile":
+        return cls(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            journal_mode=os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+            synchronous=os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+            busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+            mmap_size=int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+            cache_size_kb=int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+        )
+
+    def sqlite_pragmas(self, read_only: bool = False) -> List[str]:
+        pragmas = [
+            f"PRAGMA journal_mode={self.journal_mode}",
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA busy_timeout={self.busy_timeout_ms}",
+            f"PRAGMA mmap_size={self.mmap_size}",
+            f"PRAGMA cache_size=-{self.cache_size_kb}" # Negative: size in KiB rather than pages
+        ]
+        if read_only:
+            pragmas.append("PRAGMA query_only=ON")
+        return pragmas
+
+    def engine_kwargs(self, url: URL) -> Dict[str, Any]:
+        if url.get_backend_name() == "sqlite":
+            kwargs: Dict[str, Any] = {}
+            if url.get_driver_name() == "pysqlite":
+                kwargs["connect_args"] = {"check_same_thread": False}
+            if url.database in (None, "", ":memory:"):
+                # In-memory databases use a single-connection pool that takes no sizing
+                return kwargs
+        else:
+            kwargs = {"pool_pre_ping": True}
+        kwargs.update(
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            pool_recycle=self.pool_recycle
+        )
+        return kwargs
+
+def _install_sqlite_pragmas(sync_engine, pragmas: List[str]):
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+def create_db_engine(url: str, profile: Optional[EngineProfile] = None, read_only: bool = False):
+    profile = profile or EngineProfile.from_env()
+    parsed = make_url(url)
+    db_engine = create_engine(parsed, **profile.engine_kwargs(parsed))
+    if parsed.get_backend_name() == "sqlite":
+        _install_sqlite_pragmas(db_engine, profile.sqlite_pragmas(read_only))
+    return db_engine
+
+def create_async_db_engine(url: str, profile: Optional[EngineProfile] = None, read_only: bool = False):
+    profile = profile or EngineProfile.from_env()
+    parsed = make_url(url)
+    db_engine = create_async_engine(parsed, **profile.engine_kwargs(parsed))
+    if parsed.get_backend_name() == "sqlite":
+        # aiosqlite connections are wrapped in a DBAPI-style adapter, so the same hook works
+        _install_sqlite_pragmas(db_engine.sync_engine, profile.sqlite_pragmas(read_only))
+    return db_engine
+
+engine_profile = EngineProfile.from_env()
+
+engine = create_db_engine(DATABASE_URL, engine_profile)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for request handlers running on the event loop.
+# The sync engine above stays available for scripts and sync (threadpool) handlers.
+# Chat writes go through the single write-behind worker (services/persistence_queue.py),
+# so request sessions are mostly readers and can use a normal pool.
+async_engine = create_async_db_engine(ASYNC_DATABASE_URL, engine_profile)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# Read-only engines for endpoints that only read (history pages, profile). With SQLite
+# they are a separate pool of query_only connections on the same file, so reads never
+# wait for a pool slot held by writers; with a replica URL they may lag the primary,
+# which is why the chat turn itself keeps reading from the primary.
+# Without a read URL these are the primary engines.
+if DATABASE_READ_URL:
+    read_engine = create_db_engine(DATABASE_READ_URL, engine_profile, read_only=True)
+    async_read_engine = create_async_db_engine(to_async_url(DATABASE_READ_URL), engine_profile, read_only=True)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+    AsyncReadSessionLocal = async_sessionmaker(
+        bind=async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+else:
+    read_engine, async_read_engine = engine, async_engine
+    ReadSessionLocal, AsyncReadSessionLocal = SessionLocal, AsyncSessionLocal
+
 Base = declarative_base()
 
 def get_db():
@@ -24,3 +171,75 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+def schema_lock_path(url: str) -> str:
+    """
+    Lock file next to a SQLite database (app.db -> app.db.schema.lock), so every process
+    using the same file shares the lock and a test or load-test database in another
+    directory gets its own. Other databases lock a file in the temp dir named after the URL.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:"):
+        return os.path.abspath(parsed.database) + ".schema.lock"
+    digest = hashlib.sha256(parsed.render_as_string(hide_password=False).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"schema-{digest}.lock")
+
+SCHEMA_LOCK_PATH = schema_lock_path(DATABASE_URL)
+
+@contextmanager
+def schema_lock(path: str = SCHEMA_LOCK_PATH):
+    """
+    Exclusive lock across the processes of this host (e.g. uvicorn workers starting
+    together), held while creating tables so two workers never race on the same DDL.
+    """
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    # Retries for about 10s itself before raising
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def init_db():
+    """
+    Creates missing tables, plus indexes added to models after their table already existed
+    (create_all only creates indexes together with a new table).
+    """
+    from app.db import models  # noqa: F401 - registers the models on Base
+
+    with schema_lock():
+        Base.metadata.create_all(bind=engine)
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, JSON, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, JSON, DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.database import Base
@@ -16,8 +16,9 @@ class User(Base):
     # JSON field for user preferences (selected model, research mode, etc.)
     preferences = Column(JSON, default={})
     
-    # JSON field for long-term memory (learning stats, weak areas)
-    memory_profile = Column(JSON, default={"topics_learned": [], "weak_areas": [], "progress": {}})
+    # Legacy JSON blob for long-term memory. Superseded by the learner_* tables below;
+    # scripts/migrate_memory_profiles.py moves existing blobs over.
+    memory_profile = Column(JSON, default={})
 
     sessions = relationship("ChatSession", back_populates="user")
 
@@ -47,3 +48,120 @@ class ChatMessage(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
 
     session = relationship("ChatSession", back_populates="messages")
+
+    # Serves "most recent N messages of a session" (keyset pagination) straight from the index
+    __table_args__ = (
+        Index("ix_chat_messages_session_timestamp", "session_id", "timestamp"),
+    )
+
+# Long-term learner memory, one row per item so updates are upserts of just the items
+# that changed. MemoryService renders them back into the old memory_profile shape.
+
+class LearnerTopic(Base):
+    __tablename__ = "learner_topics"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    topic = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Also serves "all topics of a user" (leading column)
+    __table_args__ = (
+        UniqueConstraint("user_id", "topic", name="uq_learner_topics_user_topic"),
+    )
+
+class LearnerWeakArea(Base):
+    __tablename__ = "learner_weak_areas"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    topic = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "topic", name="uq_learner_weak_areas_user_topic"),
+    )
+
+class LearnerProgress(Base):
+    __tablename__ = "learner_progress"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    topic = Column(String, nullable=False)
+    value = Column(JSON) # Usually a 0..1 mastery score
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "topic", name="uq_learner_progress_user_topic"),
+    )
+
+class LearnerAttribute(Base):
+    """
+    Any other top-level memory profile key (e.g. learning style), replaced as a whole.
+    """
+    __tablename__ = "learner_attributes"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String, nullable=False)
+    value = Column(JSON)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_learner_attributes_user_key"),
+    )
+
+class SessionSummary(Base):
+    """
+    Rolling summary of a chat session's older messages, maintained by the compaction worker
+    (services/session_compactor.py). Messages up to covered_until_id are represented by the
+    summary; chat context only loads the messages after it.
+    """
+    __tablename__ = "session_summaries"
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(Integer, ForeignKey("chat_sessions.id"), unique=True, nullable=False)
+    summary = Column(String, default="")
+    covered_until_id = Column(Integer, default=0)
+    messages_covered = Column(Integer, default=0)
+
+    # Extracted from the covered messages (also merged into the learner memory)
+    topics = Column(JSON, default=[])
+    weak_areas = Column(JSON, default=[])
+
+    model_id = Column(String, nullable=True) # None when the extractive fallback produced it
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+# Directory for sharded storage (app/db/sharding.py). Kept in the main database with the
+# users: which shard holds a user's sessions, and globally unique chat session ids.
+
+class UserShard(Base):
+    __tablename__ = "user_shards"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    shard = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ChatSessionDirectory(Base):
+    """
+    One row per sharded chat session. Its id is the session's id in the shard, so ids
+    stay unique across shards and a user's sessions can move without renumbering.
+    """
+    __tablename__ = "chat_session_directory"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class BenchmarkRun(Base):
+    __tablename__ = "benchmark_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    finished_at = Column(DateTime, nullable=True)
+    status = Column(String, default="running") # running, completed, failed
+
+    # Models, prompt set and concurrency the run used
+    config = Column(JSON, default={})
+    # Per model and per (model, agent) latency/throughput/error summaries
+    results = Column(JSON, default={})
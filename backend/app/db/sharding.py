@@ -0,0 +1,226 @@
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from app.db import models
+from app.db.database import (
+    AsyncSessionLocal, Base, EngineProfile, create_async_db_engine, create_db_engine, msg_dir, schema_lock, schema_lock_path, to_async_url
+)
+
+# Tables that live in the shards; everything else (users, learner memory, research data,
+# the shard directory itself) stays in the main database.
+SHARDED_MODELS = (models.ChatSession, models.ChatMessage, models.SessionSummary)
+
+def shard_urls_from_env() -> List[str]:
+    """
+    DATABASE_SHARD_URLS (comma separated) or DATABASE_SHARDS=N SQLite files in
+    DATABASE_SHARD_DIR (default data/shards). No shards means sharding is off.
+    """
+    urls = [url.strip() for url in os.getenv("DATABASE_SHARD_URLS", "").split(",") if url.strip()]
+    if urls:
+        return urls
+    shard_dir = os.getenv("DATABASE_SHARD_DIR", os.path.join(msg_dir, "shards"))
+    count = int(os.getenv("DATABASE_SHARDS", "0"))
+    return [f"sqlite:///{os.path.join(shard_dir, f'shard_{i}.db')}" for i in range(count)]
+
+class ShardRouter:
+    """
+    Optional sharded storage for chat data: sessions, messages and session summaries of a
+    user live in one of N shard databases, so each SQLite file only serializes the writes
+    of its own users and write throughput grows with the shard count.
+
+    The main database is the directory. user_shards says which shard a user is on (new
+    users are placed by user_id % N and keep that shard until moved with
+    scripts/shard_tool.py); chat_session_directory hands out session ids, so ids are
+    unique across shards and a session id alone resolves to its shard. Both lookups are
+    cached per process and only change when the tool moves a user, which is done with
+    the app stopped. Sessions created before sharding was turned on keep their ids in
+    the main database, so the directory hands out ids above the highest of them.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        directory_factory=AsyncSessionLocal,
+        profile: Optional[EngineProfile] = None,
+        max_cached: int = 100000
+    ):
+        self.urls = urls
+        self.directory_factory = directory_factory
+        self.max_cached = max_cached
+
+        for url in urls:
+            if url.startswith("sqlite:///"):
+                os.makedirs(os.path.dirname(os.path.abspath(url[len("sqlite:///"):])), exist_ok=True)
+        self.engines = [create_db_engine(url, profile) for url in urls]
+        self.async_engines = [create_async_db_engine(to_async_url(url), profile) for url in urls]
+        self.session_factories = [
+            sessionmaker(autocommit=False, autoflush=False, bind=engine) for engine in self.engines
+        ]
+        self.async_session_factories = [
+            async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+            for engine in self.async_engines
+        ]
+
+        self._user_shards: "OrderedDict[int, int]" = OrderedDict()
+        self._session_shards: "OrderedDict[int, int]" = OrderedDict()
+        # Highest session id in the main database; read once, it doesn't grow while sharded
+        self._unsharded_max_id: Optional[int] = None
+
+        self.directory_lookups = 0
+        self.sessions_allocated = 0
+
+    @classmethod
+    def from_env(cls) -> "ShardRouter":
+        return cls(shard_urls_from_env())
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.urls)
+
+    @property
+    def count(self) -> int:
+        return len(self.urls)
+
+    def default_shard(self, user_id: int) -> int:
+        return user_id % self.count
+
+    def init_shards(self):
+        """
+        Creates the sharded tables (and their indexes) in every shard.
+        """
+        tables = [model.__table__ for model in SHARDED_MODELS]
+        for url, engine in zip(self.urls, self.engines):
+            with schema_lock(schema_lock_path(url)):
+                Base.metadata.create_all(bind=engine, tables=tables)
+                for table in tables:
+                    for index in table.indexes:
+                        index.create(bind=engine, checkfirst=True)
+
+    def async_session(self, shard: int) -> AsyncSession:
+        return self.async_session_factories[shard]()
+
+    async def shard_for_user(self, user_id: int) -> int:
+        shard = self._user_shards.get(user_id)
+        if shard is not None:
+            return shard
+
+        self.directory_lookups += 1
+        async with self.directory_factory() as db:
+            shard = await self._read_user_shard(db, user_id)
+            if shard is None:
+                db.add(models.UserShard(user_id=user_id, shard=self.default_shard(user_id)))
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    # Placed concurrently by another request or worker; use theirs
+                    await db.rollback()
+                shard = await self._read_user_shard(db, user_id)
+        self._remember(self._user_shards, user_id, shard)
+        return shard
+
+    async def shard_for_session(self, session_id: int) -> Optional[int]:
+        """
+        The shard holding a session, or None for sessions that aren't sharded (created
+        before sharding was turned on and not migrated yet; they stay in the main database).
+        """
+        shard = self._session_shards.get(session_id)
+        if shard is not None:
+            return shard
+
+        self.directory_lookups += 1
+        async with self.directory_factory() as db:
+            result = await db.execute(
+                select(models.ChatSessionDirectory.user_id).where(models.ChatSessionDirectory.id == session_id)
+            )
+            user_id = result.scalar()
+        if user_id is None:
+            return None
+        shard = await self.shard_for_user(user_id)
+        self.remember_session(session_id, shard)
+        return shard
+
+    async def session_factory_for(self, session_id: int, default):
+        """
+        Session factory for the database holding session_id (`default` when not sharded).
+        """
+        if not self.enabled:
+            return default
+        shard = await self.shard_for_session(session_id)
+        return default if shard is None else self.async_session_factories[shard]
+
+    async def allocate_session(self, user_id: int) -> Tuple[int, int]:
+        """
+        Registers a new chat session in the directory; returns (session_id, shard).
+        """
+        shard = await self.shard_for_user(user_id)
+        async with self.directory_factory() as db:
+            if self._unsharded_max_id is None:
+                result = await db.execute(select(func.max(models.ChatSession.id)))
+                self._unsharded_max_id = result.scalar() or 0
+            while True:
+                # Explicit ids rather than the table's own sequence, which starts at 1 and
+                # would reuse the ids of sessions still in the main database
+                result = await db.execute(select(func.max(models.ChatSessionDirectory.id)))
+                entry = models.ChatSessionDirectory(
+                    id=max(result.scalar() or 0, self._unsharded_max_id) + 1, user_id=user_id
+                )
+                db.add(entry)
+                try:
+                    await db.commit()
+                    break
+                except IntegrityError:
+                    # Another worker took the id first
+                    await db.rollback()
+        self.remember_session(entry.id, shard)
+        self.sessions_allocated += 1
+        return entry.id, shard
+
+    async def group_by_shard(self, items: Iterable[Any]) -> Dict[Optional[int], List[Any]]:
+        """
+        Groups objects with a session_id attribute by shard (None: the main database).
+        """
+        groups: Dict[Optional[int], List[Any]] = {}
+        for item in items:
+            shard = await self.shard_for_session(item.session_id) if self.enabled else None
+            groups.setdefault(shard, []).append(item)
+        return groups
+
+    def remember_session(self, session_id: int, shard: int):
+        self._remember(self._session_shards, session_id, shard)
+
+    def forget(self):
+        self._user_shards.clear()
+        self._session_shards.clear()
+
+    async def dispose(self):
+        for engine in self.async_engines:
+            await engine.dispose()
+        for engine in self.engines:
+            engine.dispose()
+
+    @staticmethod
+    async def _read_user_shard(db: AsyncSession, user_id: int) -> Optional[int]:
+        result = await db.execute(select(models.UserShard.shard).where(models.UserShard.user_id == user_id))
+        return result.scalar()
+
+    def _remember(self, cache: "OrderedDict[int, int]", key: int, shard: int):
+        cache[key] = shard
+        cache.move_to_end(key)
+        while len(cache) > self.max_cached:
+            cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "shards": self.count,
+            "cached_users": len(self._user_shards),
+            "cached_sessions": len(self._session_shards),
+            "directory_lookups": self.directory_lookups,
+            "sessions_allocated": self.sessions_allocated
+        }
+
+shard_router = ShardRouter.from_env()
@@ -1,14 +1,24 @@
 import os
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 
 from app.api import chat, models, memory, research, auth, profile
-from app.db.database import engine, Base
-
-# Create tables on startup (for MVP)
-Base.metadata.create_all(bind=engine)
+from app.db.database import SessionLocal, async_engine, async_read_engine, init_db
+from app.db.sharding import shard_router
+from app.services.persistence_queue import persistence_queue
+from app.services.research_log import research_log
+from app.services.session_compactor import session_compactor
+from app.services.user_cache import user_cache
+from app.services.runtime_state import runtime_state
+from app.core.model_router import get_model_router
+from app.core.app_state import AppState
+from app.core.tracing import TracingMiddleware, registry, recent_traces
+from app.core.security import password_hasher
+from app.core.token_cache import token_cache
 
 # Load environment variables
 load_dotenv()
@@ -17,8 +27,36 @@ load_dotenv()
 async def lifespan(app: FastAPI):
     # Startup: Initialize resources (db, etc. if needed)
     print("Starting up Agentic AI Backend...")
+    # Create tables on startup (for MVP). Serialized by a file lock so workers starting together
+    # don't race; the multi-worker launcher (app/server.py) runs it once before the workers.
+    if os.getenv("APP_SCHEMA_READY") != "1":
+        await asyncio.to_thread(init_db)
+        await asyncio.to_thread(shard_router.init_shards)
+    # Built here rather than at import, so importing the app stays cheap
+    services = app.state.services = AppState()
+    persistence_queue.start()
+    research_log.start()
+    session_compactor.start()
+    runtime_state.start()
+    user_cache.start()
+    if os.getenv("INTENT_TRAIN_FROM_LOGS", "true").lower() not in ("0", "false", "no"):
+        # Refit the intent classifier on logged turns without delaying startup
+        asyncio.get_running_loop().run_in_executor(
+            None, services.orchestrator.intent_router.fit_from_logs, [SessionLocal] + shard_router.session_factories
+        )
     yield
     # Shutdown: Clean up resources
+    services.orchestrator.speculation.cancel_all()
+    await session_compactor.stop() # Before the queue, it may still queue memory updates
+    await persistence_queue.stop() # Flushes pending writes
+    await research_log.stop()
+    await runtime_state.stop()
+    await user_cache.stop() # After the queue, whose flushes invalidate cached profiles
+    await services.model_router.aclose()
+    await shard_router.dispose()
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
     print("Shutting down...")
 
 app = FastAPI(
@@ -43,6 +81,101 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(TracingMiddleware)
+
+def runtime_metrics():
+    """
+    Gauges/counters for state that already lives in other components, read at scrape time.
+    """
+    model_router = get_model_router()
+    metrics = []
+
+    scheduler = model_router.get_scheduler_stats()
+    for field, metric_type in (("in_flight", "gauge"), ("queue_depth", "gauge"), ("admitted", "counter"), ("shed", "counter"), ("timed_out", "counter")):
+        metrics.append((
+            f"llm_scheduler_{field}" + ("_total" if metric_type == "counter" else ""),
+            metric_type,
+            f"Scheduler {field.replace('_', ' ')} per limit group",
+            [({"group": group}, stats[field]) for group, stats in scheduler.items()]
+        ))
+
+    cache = model_router.get_cache_stats()
+    if cache.get("enabled"):
+        metrics.append(("llm_cache_lookups_total", "counter", "Response cache lookups", [
+            ({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])
+        ]))
+        metrics.append(("llm_cache_entries", "gauge", "Response cache entries in memory", [({}, cache["entries"])]))
+
+    coalescing = model_router.get_coalescing_stats()
+    metrics.append(("llm_coalesced_calls_total", "counter", "Calls served by another in-flight call", [({}, coalescing["coalesced_calls"])]))
+
+    queue = persistence_queue.stats()
+    metrics.append(("persistence_pending_writes", "gauge", "Writes waiting for the write-behind flush", [
+        ({"kind": "message"}, queue["pending_messages"]), ({"kind": "memory"}, queue["pending_memory_updates"])
+    ]))
+    # Alert on a rising failed/dead-letter count: writes are being retried or dropped
+    metrics.append(("persistence_failed_flushes_total", "counter", "Grouped write-behind flushes that failed", [({}, queue["failed_flushes"])]))
+    metrics.append(("persistence_consecutive_failures", "gauge", "Flushes in a row that left writes pending", [({}, queue["consecutive_failures"])]))
+    metrics.append(("persistence_dead_letters_total", "counter", "Writes dropped to the dead-letter log", [({}, queue["dead_letters"])]))
+    metrics.append(("persistence_shed_total", "counter", "Writes rejected because the queue was full", [({}, queue["shed"])]))
+    users = user_cache.stats()
+    metrics.append(("user_cache_lookups_total", "counter", "User/memory profile cache lookups", [
+        ({"kind": kind, "result": result}, counts[kind])
+        for result, counts in (("hit", users["hits"]), ("miss", users["misses"]))
+        for kind in counts
+    ]))
+    # Not there before the lifespan has run
+    services = getattr(app.state, "services", None)
+    if services is not None:
+        intents = services.orchestrator.intent_router.stats()
+        metrics.append(("intent_classifications_total", "counter", "Messages routed without an explicit target_agent", [({}, intents["classified"])]))
+        metrics.append(("intent_llm_fallbacks_total", "counter", "Low-confidence intents sent to the fallback model", [({}, intents["llm_fallbacks"])]))
+        metrics.append(("intent_llm_ignored_total", "counter", "Fallback model answers discarded as unusable", [({}, intents["llm_ignored"])]))
+
+    hashing = password_hasher.stats()
+    metrics.append(("auth_hash_operations_total", "counter", "bcrypt hashes/verifications completed", [
+        ({"op": op}, count) for op, count in hashing["completed"].items()
+    ]))
+    metrics.append(("auth_hash_rejected_total", "counter", "Logins/registrations shed by the hashing limits", [
+        ({"reason": reason}, count) for reason, count in hashing["rejected"].items()
+    ]))
+    metrics.append(("auth_hash_waiting", "gauge", "Requests waiting for a hashing slot", [({}, hashing["waiting"])]))
+    tokens = token_cache.stats()
+    metrics.append(("auth_token_cache_lookups_total", "counter", "Verified-token cache lookups", [
+        ({"result": "hit"}, tokens["hits"]), ({"result": "miss"}, tokens["misses"])
+    ]))
+
+    if services is not None:
+        speculation = services.orchestrator.speculation.stats()
+        metrics.append(("speculative_steps_total", "counter", "Speculatively precomputed agent steps by outcome", [
+            ({"outcome": outcome}, speculation[outcome])
+            for outcome in ("launched", "hits", "hits_in_flight", "discarded", "skipped_budget", "failed")
+        ]))
+        metrics.append(("speculative_steps_in_flight", "gauge", "Speculative steps still running", [({}, speculation["in_flight"])]))
+
+    compactor = session_compactor.stats()
+    metrics.append(("session_compactions_total", "counter", "Session summary updates", [
+        ({"source": "model"}, compactor["compactions"] - compactor["fallback_summaries"]),
+        ({"source": "extractive"}, compactor["fallback_summaries"])
+    ]))
+    metrics.append(("session_messages_compacted_total", "counter", "Chat messages folded into session summaries", [({}, compactor["messages_compacted"])]))
+    metrics.append(("research_log_buffered_events", "gauge", "Research events not yet flushed to disk", [({}, research_log.buffered)]))
+    return metrics
+
+registry.register_collector(runtime_metrics)
+
+def fleet_metrics():
+    """
+    Fleet-wide totals from the shared runtime state (the metrics above are per worker).
+    These are SQLite queries, so /metrics runs this in a thread instead of as a collector.
+    """
+    return [
+        ("app_events_total", "counter", "Events counted across all workers", [
+            ({"name": name}, value) for name, value in sorted(runtime_state.counters().items())
+        ]),
+        ("app_workers", "gauge", "Worker processes with a recent heartbeat", [({}, len(runtime_state.workers()))])
+    ]
+
 app.include_router(chat.router, prefix="/api", tags=["Chat"])
 app.include_router(models.router, prefix="/api", tags=["Models"])
 app.include_router(memory.router, prefix="/api", tags=["Memory"])
@@ -58,6 +191,21 @@ async def health_check():
         "research_mode": os.getenv("RESEARCH_MODE_ENABLED", "false")
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus text exposition format.
+    """
+    fleet = await asyncio.to_thread(fleet_metrics)
+    return PlainTextResponse(registry.render(fleet), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/metrics/traces", include_in_schema=False)
+async def sampled_traces():
+    """
+    Most recent sampled request traces (TRACE_SAMPLE_RATE).
+    """
+    return {"traces": list(recent_traces)}
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    from app.server import main as serve
+    serve()
@@ -26,3 +26,8 @@ class ModelMetadata(BaseModel):
     name: str
     description: str
     context_window: int
+
+class StreamEvent(BaseModel):
+    type: Literal["token", "done", "error"]
+    content: Optional[str] = None # Text chunk for "token", error detail for "error"
+    output: Optional[AgentOutput] = None # Final assembled output, only on "done"
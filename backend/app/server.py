@@ -0,0 +1,57 @@
+"""
+Launches the API with uvicorn, in one or several worker processes.
+
+One worker (the default) reloads on code changes, as `python -m app.main` always did.
+With several workers the schema is created once here before they start, and the user
+cache gets a shared invalidation stamp so a profile change in one worker reaches the
+caches of the others. Flags and counters that must agree across workers live in the
+shared runtime state (services/runtime_state.py).
+
+Chat messages and memory updates are still written behind per worker, so read-your-writes
+only holds within one process: a request routed to another worker sees a write once the
+writing worker has flushed it (normally within PERSIST_FLUSH_INTERVAL_MS). Clients that read back
+right after writing should stick to one worker, e.g. by keeping their connection open.
+
+Usage: python -m app.server [--workers 4] [--host 0.0.0.0] [--port 8000] [--no-reload]
+"""
+import argparse
+import os
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--reload", action=argparse.BooleanOptionalAction, default=None,
+                        help="Restart on code changes (default: on with a single worker)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    reload = args.workers == 1 if args.reload is None else args.reload
+    if reload and args.workers > 1:
+        parser.error("--reload only works with a single worker")
+
+    if args.workers > 1:
+        os.environ.setdefault("USER_CACHE_STAMP_PATH", os.path.join(DATA_DIR, "user_cache_stamp.db"))
+
+        # Once, before any worker imports the app
+        from app.db.database import init_db
+        from app.db.sharding import shard_router
+        init_db()
+        shard_router.init_shards()
+        os.environ["APP_SCHEMA_READY"] = "1"
+
+    import uvicorn
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        reload=reload,
+        log_level=args.log_level
+    )
+
+if __name__ == "__main__":
+    main()
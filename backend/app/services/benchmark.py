@@ -0,0 +1,257 @@
+import json
+import time
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import models
+from app.schemas.base import AgentInput
+from app.agents.base import BaseAgent
+from app.core.model_router import ModelRouter
+from app.core.scheduler import PRIORITY_BATCH, estimate_tokens
+
+# Prompts per agent type. Entries are a message, or {"message": ..., "context": {...}}
+# for agents whose prompt depends on context.
+DEFAULT_PROMPT_SET: Dict[str, List[Any]] = {
+    "diagnosis": [
+        "I think entropy is just how messy a room is.",
+        "Can you explain why gradient descent needs a learning rate?",
+        "I know recursion means a function calls itself, but I get lost with the call stack."
+    ],
+    "explanation": [
+        {"message": "What is a hash table?", "context": {"user_level": "Beginner"}},
+        {"message": "How does backpropagation work?", "context": {"user_level": "Intermediate"}},
+        {"message": "Why is quicksort O(n log n) on average?", "context": {"user_level": "Advanced"}}
+    ],
+    "socratic": [
+        "I think photosynthesis turns sunlight directly into sugar.",
+        "Big O tells you how fast a program runs."
+    ],
+    "adaptation": [
+        {"message": "Analyze my progress", "context": {"progress": {"algorithms": 0.4, "recursion": 0.8}}},
+        {"message": "Analyze my progress", "context": {"progress": {"calculus": 0.9}}}
+    ]
+}
+
+# A model counts as a candidate default for an agent only below this error rate
+MAX_RECOMMENDED_ERROR_RATE = 0.05
+
+def load_prompt_set(path: str) -> Dict[str, List[Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 2)
+
+def summarize(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [s for s in samples if not s["error"]]
+    latencies = [s["total_ms"] for s in ok]
+    ttfts = [s["ttft_ms"] for s in ok if s["ttft_ms"] is not None]
+    throughputs = [s["output_tokens"] / (s["total_ms"] / 1000) for s in ok if s["total_ms"] > 0]
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "error_rate": round((len(samples) - len(ok)) / len(samples), 4) if samples else 0.0,
+        "ttft_ms_p50": percentile(ttfts, 50),
+        "ttft_ms_p95": percentile(ttfts, 95),
+        "latency_ms_p50": percentile(latencies, 50),
+        "latency_ms_p95": percentile(latencies, 95),
+        "latency_ms_p99": percentile(latencies, 99),
+        "output_tokens_per_s": round(sum(throughputs) / len(throughputs), 2) if throughputs else None
+    }
+
+class BenchmarkRunner:
+    """
+    Runs a prompt set against a list of models and measures time-to-first-token,
+    total latency, output tokens/s and errors.
+
+    Prompts come from the agents' own build_prompt(), so the numbers reflect the prompts
+    production actually sends. Calls bypass the response cache, run at batch priority
+    (behind live chat traffic) and are capped at `concurrency` in flight. A call that was
+    answered by a fallback model counts as an error for the model under test.
+    """
+
+    def __init__(self, model_router: ModelRouter, agents: Mapping[str, BaseAgent], concurrency: int = 4, repeats: int = 1):
+        self.model_router = model_router
+        self.agents = agents
+        self.concurrency = concurrency
+        self.repeats = repeats
+
+    def default_models(self) -> List[str]:
+        """
+        Every available model that can be called (hosted ones need their API key).
+        """
+        return [m.id for m in self.model_router.get_available_models() if self.model_router.is_configured(m.id)]
+
+    def build_cases(self, prompt_set: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+        cases = []
+        for agent_name, entries in prompt_set.items():
+            agent = self.agents.get(agent_name)
+            if agent is None:
+                raise ValueError(f"Unknown agent in prompt set: {agent_name}")
+            for entry in entries:
+                if isinstance(entry, str):
+                    entry = {"message": entry}
+                input_data = AgentInput(
+                    user_id="benchmark",
+                    session_id="benchmark",
+                    message=entry["message"],
+                    context=dict(entry.get("context", {}))
+                )
+                prompt = agent.build_prompt(input_data)
+                if prompt is None:
+                    # Agents that don't call a model have nothing to benchmark
+                    continue
+                cases.append({"agent": agent_name, "system_prompt": prompt[0], "user_message": prompt[1]})
+        return cases
+
+    async def run(self, model_ids: Optional[List[str]] = None, prompt_set: Optional[Dict[str, List[Any]]] = None) -> Dict[str, Any]:
+        model_ids = model_ids or self.default_models()
+        cases = self.build_cases(prompt_set or DEFAULT_PROMPT_SET)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(model_id: str, case: Dict[str, Any]):
+            async with semaphore:
+                return await self.measure(model_id, case)
+
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(
+            bounded(model_id, case)
+            for model_id in model_ids
+            for case in cases
+            for _ in range(self.repeats)
+        ))
+
+        models_summary = {}
+        agents_summary: Dict[str, Dict[str, Any]] = {}
+        for model_id in model_ids:
+            model_samples = [s for s in samples if s["model_id"] == model_id]
+            models_summary[model_id] = summarize(model_samples)
+            for agent_name in sorted({c["agent"] for c in cases}):
+                agents_summary.setdefault(agent_name, {})[model_id] = summarize(
+                    [s for s in model_samples if s["agent"] == agent_name]
+                )
+
+        return {
+            "models": models_summary,
+            "agents": agents_summary,
+            "recommended": self.recommend(agents_summary),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "errors": [
+                {"model_id": s["model_id"], "agent": s["agent"], "error": s["error"]}
+                for s in samples if s["error"]
+            ][:50]
+        }
+
+    async def measure(self, model_id: str, case: Dict[str, Any]) -> Dict[str, Any]:
+        route: Dict[str, Any] = {}
+        chunks = []
+        ttft = None
+        error = None
+        started = time.perf_counter()
+        try:
+            async for chunk in self.model_router.stream_response(
+                model_id,
+                case["system_prompt"],
+                case["user_message"],
+                use_cache=False,
+                priority=PRIORITY_BATCH,
+                route=route
+            ):
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                chunks.append(chunk)
+            if route.get("model_id") != model_id:
+                error = f"answered by fallback model {route.get('model_id')}"
+        except Exception as e:
+            error = str(e)
+        total = time.perf_counter() - started
+
+        text = "".join(chunks)
+        return {
+            "model_id": model_id,
+            "agent": case["agent"],
+            "ttft_ms": round(ttft * 1000, 2) if ttft is not None else None,
+            "total_ms": round(total * 1000, 2),
+            "output_tokens": estimate_tokens(text) if text else 0,
+            "error": error
+        }
+
+    @staticmethod
+    def recommend(agents_summary: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        """
+        Fastest model (p95 latency) per agent among those that were reliable enough.
+        """
+        recommended = {}
+        for agent_name, per_model in agents_summary.items():
+            eligible = [
+                (summary["latency_ms_p95"], model_id) for model_id, summary in per_model.items()
+                if summary["requests"] and summary["error_rate"] <= MAX_RECOMMENDED_ERROR_RATE
+                and summary["latency_ms_p95"] is not None
+            ]
+            recommended[agent_name] = min(eligible)[1] if eligible else None
+        return recommended
+
+async def create_benchmark_run(db: AsyncSession, config: Dict[str, Any]) -> models.BenchmarkRun:
+    run = models.BenchmarkRun(config=config, status="running")
+    db.add(run)
+    await db.commit()
+    await db.refresh(run)
+    return run
+
+async def finish_benchmark_run(db: AsyncSession, run_id: int, results: Dict[str, Any], status: str = "completed"):
+    run = await db.get(models.BenchmarkRun, run_id)
+    if run:
+        run.results = results
+        run.status = status
+        run.finished_at = datetime.utcnow()
+        await db.commit()
+
+async def get_latest_benchmark_run(db: AsyncSession) -> Optional[models.BenchmarkRun]:
+    result = await db.execute(
+        select(models.BenchmarkRun)
+        .where(models.BenchmarkRun.status == "completed")
+        .order_by(models.BenchmarkRun.created_at.desc(), models.BenchmarkRun.id.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+def benchmark_config(runner: BenchmarkRunner, model_ids: List[str], prompt_set: Optional[Dict[str, List[Any]]]) -> Dict[str, Any]:
+    return {
+        "models": model_ids,
+        "concurrency": runner.concurrency,
+        "repeats": runner.repeats,
+        "prompt_set": prompt_set or DEFAULT_PROMPT_SET
+    }
+
+async def run_benchmark(
+    runner: BenchmarkRunner,
+    session_factory,
+    model_ids: Optional[List[str]] = None,
+    prompt_set: Optional[Dict[str, List[Any]]] = None,
+    run_id: Optional[int] = None
+) -> int:
+    """
+    Runs the benchmark and stores it as a BenchmarkRun; returns the run id.
+    Pass run_id to fill in a run row created beforehand (e.g. by the API).
+    """
+    model_ids = model_ids or runner.default_models()
+    if run_id is None:
+        async with session_factory() as db:
+            run = await create_benchmark_run(db, benchmark_config(runner, model_ids, prompt_set))
+            run_id = run.id
+
+    try:
+        results = await runner.run(model_ids, prompt_set)
+    except Exception as e:
+        async with session_factory() as db:
+            await finish_benchmark_run(db, run_id, {"error": str(e)}, status="failed")
+        raise
+
+    async with session_factory() as db:
+        await finish_benchmark_run(db, run_id, results)
+    return run_id
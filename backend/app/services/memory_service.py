@@ -1,14 +1,179 @@
+import base64
+from contextlib import asynccontextmanager
+from datetime import datetime
+from sqlalchemy import select, or_, and_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from app.db import models
-from app.db.database import get_db
+from app.db.database import engine, get_db
+from app.db.sharding import shard_router
+from app.services.user_cache import user_cache
+
+def encode_history_cursor(row) -> str:
+    """
+    Opaque keyset cursor pointing at a message; pages continue with strictly older messages.
+    """
+    # Pending (write-behind) messages have no id yet. They keep their timestamp when flushed,
+    # so the next page starts strictly before that timestamp; pointing past the eventual row
+    # id would repeat the message once it is committed.
+    message_id = row.id if row.id is not None else 0
+    raw = f"{row.timestamp.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_history_cursor(cursor: str):
+    """
+    Raises ValueError for malformed cursors.
+    """
+    try:
+        timestamp, message_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except Exception:
+        raise ValueError("Invalid history cursor")
+
+def _history_sort_key(row):
+    # Not-yet-flushed messages have no id; they sort after committed rows with the same timestamp
+    return (row.timestamp, row.id if row.id is not None else float("inf"))
+
+def chat_history_query(session_id: int, limit: int, before: Optional[str] = None, after_id: Optional[int] = None):
+    """
+    Most recent `limit` messages of a session, newest first, older than the `before` cursor
+    and, with after_id, newer than that message (e.g. the end of the session summary).
+    Only the columns needed for context/pagination are selected, and the
+    (session_id, timestamp) index serves both the filter and the ordering.
+    """
+    query = select(
+        models.ChatMessage.id,
+        models.ChatMessage.role,
+        models.ChatMessage.content,
+        models.ChatMessage.timestamp
+    ).where(models.ChatMessage.session_id == session_id)
+
+    if before:
+        timestamp, message_id = decode_history_cursor(before)
+        query = query.where(or_(
+            models.ChatMessage.timestamp < timestamp,
+            and_(models.ChatMessage.timestamp == timestamp, models.ChatMessage.id < message_id)
+        ))
+
+    if after_id:
+        query = query.where(models.ChatMessage.id > after_id)
+
+    return query.order_by(models.ChatMessage.timestamp.desc(), models.ChatMessage.id.desc()).limit(limit)
+
+# Memory profile keys kept as ordered, de-duplicated topic lists
+LIST_MEMORY_FIELDS = {
+    "topics_learned": models.LearnerTopic,
+    "weak_areas": models.LearnerWeakArea
+}
+
+def _as_topics(value) -> List[str]:
+    values = value if isinstance(value, list) else [value]
+    return list(dict.fromkeys(str(v) for v in values))
+
+def merge_memory_profile(current_profile: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merges an update into a rendered memory profile (used to overlay still-pending writes).
+    Mirrors what memory_update_statements() does to the tables.
+    """
+    current_profile = dict(current_profile or {})
+    for k, v in data.items():
+        if k in LIST_MEMORY_FIELDS:
+            # Dedup append, keeping first-learned order
+            current_profile[k] = list(dict.fromkeys(current_profile.get(k, []) + _as_topics(v)))
+        elif k == "progress":
+            if isinstance(v, dict):
+                current_profile["progress"] = {**current_profile.get("progress", {}), **v}
+        else:
+            current_profile[k] = v
+    return current_profile
+
+def _insert(model):
+    # Both dialects provide ON CONFLICT upserts with the same API
+    return postgresql_insert(model) if engine.dialect.name == "postgresql" else sqlite_insert(model)
+
+def memory_update_statements(user_id: int, data: Dict[str, Any]) -> list:
+    """
+    Upserts applying a memory update: topics are inserted if new, progress and other keys
+    are replaced per topic/key. Each statement touches only the rows named in the update,
+    so a write costs the same however much the learner has accumulated, and concurrent
+    updates to different items no longer overwrite each other.
+    Works with both the sync and the async session.
+    """
+    now = datetime.utcnow()
+    statements = []
+    for key, value in data.items():
+        if key in LIST_MEMORY_FIELDS:
+            topics = _as_topics(value)
+            if topics:
+                statements.append(
+                    _insert(LIST_MEMORY_FIELDS[key])
+                    .values([{"user_id": user_id, "topic": t, "created_at": now} for t in topics])
+                    .on_conflict_do_nothing(index_elements=["user_id", "topic"])
+                )
+        elif key == "progress":
+            if isinstance(value, dict) and value:
+                stmt = _insert(models.LearnerProgress).values([
+                    {"user_id": user_id, "topic": str(topic), "value": v, "updated_at": now}
+                    for topic, v in value.items()
+                ])
+                statements.append(stmt.on_conflict_do_update(
+                    index_elements=["user_id", "topic"],
+                    set_={"value": stmt.excluded.value, "updated_at": stmt.excluded.updated_at}
+                ))
+        else:
+            stmt = _insert(models.LearnerAttribute).values(user_id=user_id, key=key, value=value, updated_at=now)
+            statements.append(stmt.on_conflict_do_update(
+                index_elements=["user_id", "key"],
+                set_={"value": stmt.excluded.value, "updated_at": stmt.excluded.updated_at}
+            ))
+    return statements
+
+def memory_profile_queries(user_id: int) -> list:
+    """
+    Queries for the rows rendered by build_memory_profile(), in its argument order.
+    All four are served by the (user_id, ...) unique indexes.
+    """
+    return [
+        select(models.LearnerTopic.topic)
+        .where(models.LearnerTopic.user_id == user_id)
+        .order_by(models.LearnerTopic.id),
+        select(models.LearnerWeakArea.topic)
+        .where(models.LearnerWeakArea.user_id == user_id)
+        .order_by(models.LearnerWeakArea.id),
+        select(models.LearnerProgress.topic, models.LearnerProgress.value)
+        .where(models.LearnerProgress.user_id == user_id)
+        .order_by(models.LearnerProgress.id),
+        select(models.LearnerAttribute.key, models.LearnerAttribute.value)
+        .where(models.LearnerAttribute.user_id == user_id)
+        .order_by(models.LearnerAttribute.id)
+    ]
+
+def build_memory_profile(topics: List[Row], weak_areas: List[Row], progress: List[Row], attributes: List[Row]) -> Dict[str, Any]:
+    """
+    Renders the learner tables in the legacy memory_profile shape
+    ({"topics_learned": [...], "weak_areas": [...], "progress": {...}, ...}).
+    """
+    profile = {
+        "topics_learned": [r.topic for r in topics],
+        "weak_areas": [r.topic for r in weak_areas],
+        "progress": {r.topic: r.value for r in progress}
+    }
+    for r in attributes:
+        profile.setdefault(r.key, r.value)
+    return profile
 
 class MemoryService:
     """
     Persistence for memory using Database (SQLAlchemy).
+    With a write_queue, memory reads merge in the still-pending updates, like AsyncMemoryService.
     """
-    def __init__(self, db: Session = None):
+    def __init__(self, db: Session = None, write_queue=None):
         self.db = db
+        self.write_queue = write_queue
 
     def get_user_memory(self, user_id: int) -> Dict[str, Any]:
         """
@@ -16,11 +181,16 @@ class MemoryService:
         """
         if not self.db:
             return {}
-        
-        user = self.db.query(models.User).filter(models.User.id == user_id).first()
-        if user:
-            return user.memory_profile or {}
-        return {}
+
+        profile = user_cache.get_memory(user_id)
+        if profile is None:
+            load_token = user_cache.load_token()
+            profile = build_memory_profile(*[self.db.execute(q).all() for q in memory_profile_queries(user_id)])
+            user_cache.put_memory(user_id, profile, load_token)
+        if self.write_queue:
+            for data in self.write_queue.pending_memory_updates(user_id):
+                profile = merge_memory_profile(profile, data)
+        return profile
 
     def update_user_memory(self, user_id: int, data: Dict[str, Any]):
         """
@@ -29,29 +199,15 @@ class MemoryService:
         if not self.db:
             return
 
-        user = self.db.query(models.User).filter(models.User.id == user_id).first()
-        if user:
-            current_profile = dict(user.memory_profile or {})
-            
-            # Merge logic
-            for k, v in data.items():
-                if k == "topics_learned" and isinstance(v, list):
-                    # Dedup append
-                    current_set = set(current_profile.get("topics_learned", []))
-                    current_set.update(v)
-                    current_profile["topics_learned"] = list(current_set)
-                elif k == "weak_areas" and isinstance(v, list):
-                    current_set = set(current_profile.get("weak_areas", []))
-                    current_set.update(v)
-                    current_profile["weak_areas"] = list(current_set)
-                elif isinstance(v, dict) and k == "progress":
-                     current_profile.setdefault("progress", {}).update(v)
-                else:
-                    current_profile[k] = v
-            
-            user.memory_profile = current_profile
-            self.db.add(user)
-            self.db.commit()
+        for statement in memory_update_statements(user_id, data):
+            self.db.execute(statement)
+        self.db.commit()
+        user_cache.invalidate_memory(user_id)
+
+    def get_chat_session(self, session_id: int, user_id: int) -> Optional[models.ChatSession]:
+        return self.db.query(models.ChatSession)\
+            .filter(models.ChatSession.id == session_id, models.ChatSession.user_id == user_id)\
+            .first()
 
     def create_chat_session(self, user_id: int, title: str = "New Chat") -> models.ChatSession:
         session = models.ChatSession(user_id=user_id, title=title)
@@ -72,8 +228,137 @@ class MemoryService:
         self.db.refresh(msg)
         return msg
     
-    def get_chat_history(self, session_id: int, limit: int = 10) -> List[models.ChatMessage]:
-        return self.db.query(models.ChatMessage)\
-            .filter(models.ChatMessage.session_id == session_id)\
-            .order_by(models.ChatMessage.timestamp.asc())\
-            .all() # In real app, might limit recent k
+    def get_chat_history(self, session_id: int, limit: int = 10, before: Optional[str] = None) -> List[Row]:
+        """
+        Returns up to `limit` most recent messages (id, role, content, timestamp) in chronological order.
+        Pass `before` (see encode_history_cursor) to page further back.
+        """
+        rows = self.db.execute(chat_history_query(session_id, limit, before)).all()
+        return list(reversed(rows))
+
+class AsyncMemoryService:
+    """
+    Async counterpart of MemoryService for handlers running on the event loop.
+    Same methods, backed by an AsyncSession so commits don't block other requests.
+
+    With a write_queue (see persistence_queue.py), chat messages and memory updates
+    are written behind and reads merge in the still-pending writes (read-your-writes).
+
+    With sharded storage (db/sharding.py) sessions, messages and summaries are read from
+    and written to the shard the router resolves, on a short-lived session of their own;
+    `db` is then only used for the main database (memory).
+    """
+    def __init__(self, db: AsyncSession = None, write_queue=None):
+        self.db = db
+        self.write_queue = write_queue
+
+    @asynccontextmanager
+    async def _chat_db(self, shard: Optional[int]):
+        if shard is None:
+            yield self.db
+        else:
+            async with shard_router.async_session(shard) as db:
+                yield db
+
+    async def _session_shard(self, session_id: int) -> Optional[int]:
+        return await shard_router.shard_for_session(session_id) if shard_router.enabled else None
+
+    async def get_user_memory(self, user_id: int) -> Dict[str, Any]:
+        if not self.db:
+            return {}
+
+        profile = user_cache.get_memory(user_id)
+        if profile is None:
+            load_token = user_cache.load_token()
+            rows = []
+            for query in memory_profile_queries(user_id):
+                rows.append((await self.db.execute(query)).all())
+            profile = build_memory_profile(*rows)
+            user_cache.put_memory(user_id, profile, load_token)
+        if self.write_queue:
+            for data in self.write_queue.pending_memory_updates(user_id):
+                profile = merge_memory_profile(profile, data)
+        return profile
+
+    async def update_user_memory(self, user_id: int, data: Dict[str, Any]):
+        if self.write_queue:
+            self.write_queue.update_user_memory(user_id, data)
+            return
+
+        if not self.db:
+            return
+
+        for statement in memory_update_statements(user_id, data):
+            await self.db.execute(statement)
+        await self.db.commit()
+        user_cache.invalidate_memory(user_id)
+
+    async def get_chat_session(self, session_id: int, user_id: int) -> Optional[models.ChatSession]:
+        # Resolved through the directory: sessions not in it are still in the main database
+        async with self._chat_db(await self._session_shard(session_id)) as db:
+            result = await db.execute(
+                select(models.ChatSession)
+                .where(models.ChatSession.id == session_id, models.ChatSession.user_id == user_id)
+            )
+            return result.scalars().first()
+
+    async def create_chat_session(self, user_id: int, title: str = "New Chat") -> models.ChatSession:
+        if shard_router.enabled:
+            # The id comes from the directory so it is unique across shards
+            session_id, shard = await shard_router.allocate_session(user_id)
+            session = models.ChatSession(id=session_id, user_id=user_id, title=title)
+            async with shard_router.async_session(shard) as db:
+                db.add(session)
+                await db.commit()
+            return session
+
+        session = models.ChatSession(user_id=user_id, title=title)
+        self.db.add(session)
+        # expire_on_commit is off, so only the generated id needs fetching (no refresh round trip)
+        await self.db.commit()
+        return session
+
+    async def add_chat_message(self, session_id: int, role: str, content: str, metadata: Dict = {}):
+        if self.write_queue:
+            return self.write_queue.add_chat_message(session_id, role, content, metadata)
+
+        msg = models.ChatMessage(
+            session_id=session_id,
+            role=role,
+            content=content,
+            metadata_json=metadata
+        )
+        async with self._chat_db(await self._session_shard(session_id)) as db:
+            db.add(msg)
+            await db.commit()
+        return msg
+
+    async def get_session_summary(self, session_id: int) -> Optional[models.SessionSummary]:
+        async with self._chat_db(await self._session_shard(session_id)) as db:
+            result = await db.execute(
+                select(models.SessionSummary).where(models.SessionSummary.session_id == session_id)
+            )
+            return result.scalars().first()
+
+    async def get_chat_history(
+        self, session_id: int, limit: int = 10, before: Optional[str] = None, after_id: Optional[int] = None
+    ) -> List[Row]:
+        async with self._chat_db(await self._session_shard(session_id)) as db:
+            result = await db.execute(chat_history_query(session_id, limit, before, after_id))
+        rows = list(reversed(result.all()))
+        if not self.write_queue:
+            return rows
+
+        pending = self.write_queue.pending_messages(session_id)
+        if not pending:
+            return rows
+
+        # A flush may have committed some pending messages already; those carry their row id
+        committed_ids = {r.id for r in rows}
+        pending = [m for m in pending if m.id is None or (m.id not in committed_ids and m.id > (after_id or 0))]
+        if before:
+            timestamp, message_id = decode_history_cursor(before)
+            pending = [m for m in pending if _history_sort_key(m) < (timestamp, message_id)]
+
+        merged = sorted(rows + pending, key=_history_sort_key)
+        return merged[-limit:]
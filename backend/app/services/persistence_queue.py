@@ -0,0 +1,313 @@
+import os
+import json
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from app.db import models
+from app.db.database import AsyncSessionLocal
+from app.db.sharding import shard_router
+from app.core.scheduler import SchedulerOverloaded
+from app.core.tracing import span
+from app.services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_DEAD_LETTER_PATH = os.path.join(BASE_DIR, "data", "persistence_dead_letter.jsonl")
+
+@dataclass
+class PendingMessage:
+    session_id: int
+    role: str
+    content: str
+    metadata_json: Dict[str, Any] = field(default_factory=dict)
+    # Stamped at enqueue time so ordering matches the request, not the flush
+    timestamp: datetime = field(default_factory=datetime.utcnow)
+    # Filled in once the row has been flushed to the database
+    id: Optional[int] = None
+    # Failed commits of this entry on its own (see PersistenceQueue.flush)
+    attempts: int = 0
+
+@dataclass
+class PendingMemoryUpdate:
+    user_id: int
+    data: Dict[str, Any]
+    attempts: int = 0
+
+class PersistenceQueue:
+    """
+    Write-behind buffer for chat messages and memory profile updates.
+
+    Writes are queued in memory and a background worker commits them in grouped
+    transactions every `flush_interval` seconds, or as soon as `max_batch` writes are pending.
+    Pending writes stay visible through pending_messages()/pending_memory_updates()
+    until they are committed, which AsyncMemoryService uses for read-your-writes.
+    With sharded storage, messages are committed per shard (one transaction each)
+    and memory updates in the main database.
+
+    The queue holds at most `max_pending` writes; beyond that new writes are shed with
+    SchedulerOverloaded (503 + Retry-After). When a grouped flush fails, the batch is
+    retried entry by entry, so one bad write can't hold back the others; an entry that
+    failed `max_attempts` times on its own is appended to the dead-letter log (JSONL)
+    and dropped. Retries back off exponentially up to `max_backoff` seconds.
+
+    Read-your-writes only holds within one process: with several workers, a read served
+    by another worker sees a write once it has been flushed (normally within
+    flush_interval).
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        flush_interval: float = 0.05,
+        max_batch: int = 200,
+        max_pending: int = 10000,
+        max_attempts: int = 5,
+        max_backoff: float = 5.0,
+        dead_letter_path: str = DEFAULT_DEAD_LETTER_PATH
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.dead_letter_path = dead_letter_path
+
+        self._messages: List[PendingMessage] = []
+        self._memory_updates: List[PendingMemoryUpdate] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._consecutive_failures = 0
+
+        self.flushes = 0
+        self.flushed_writes = 0
+        self.failed_flushes = 0
+        self.dead_letters = 0
+        self.shed = 0
+
+    @classmethod
+    def from_env(cls) -> "PersistenceQueue":
+        return cls(
+            flush_interval=float(os.getenv("PERSIST_FLUSH_INTERVAL_MS", "50")) / 1000,
+            max_batch=int(os.getenv("PERSIST_MAX_BATCH", "200")),
+            max_pending=int(os.getenv("PERSIST_MAX_PENDING", "10000")),
+            max_attempts=int(os.getenv("PERSIST_MAX_ATTEMPTS", "5")),
+            max_backoff=float(os.getenv("PERSIST_MAX_BACKOFF_MS", "5000")) / 1000,
+            dead_letter_path=os.getenv("PERSIST_DEAD_LETTER_PATH", DEFAULT_DEAD_LETTER_PATH)
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the worker and flushes everything still pending.
+        """
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    @property
+    def pending(self) -> int:
+        return len(self._messages) + len(self._memory_updates)
+
+    def ensure_capacity(self):
+        """
+        Raises SchedulerOverloaded if the queue is full, so a request can be shed before doing any work.
+        """
+        if self.pending >= self.max_pending:
+            self.shed += 1
+            raise SchedulerOverloaded("persistence", "write queue full", retry_after=1)
+
+    def add_chat_message(self, session_id: int, role: str, content: str, metadata: Dict = None) -> PendingMessage:
+        self.ensure_capacity()
+        msg = PendingMessage(session_id=session_id, role=role, content=content, metadata_json=metadata or {})
+        self._messages.append(msg)
+        self._maybe_wake()
+        return msg
+
+    def update_user_memory(self, user_id: int, data: Dict[str, Any]):
+        self.ensure_capacity()
+        self._memory_updates.append(PendingMemoryUpdate(user_id, data))
+        self._maybe_wake()
+
+    def pending_messages(self, session_id: int) -> List[PendingMessage]:
+        return [m for m in self._messages if m.session_id == session_id]
+
+    def pending_memory_updates(self, user_id: int) -> List[Dict[str, Any]]:
+        return [u.data for u in self._memory_updates if u.user_id == user_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "pending_messages": len(self._messages),
+            "pending_memory_updates": len(self._memory_updates),
+            "max_pending": self.max_pending,
+            "flushes": self.flushes,
+            "flushed_writes": self.flushed_writes,
+            "failed_flushes": self.failed_flushes,
+            "consecutive_failures": self._consecutive_failures,
+            "dead_letters": self.dead_letters,
+            "shed": self.shed
+        }
+
+    def _maybe_wake(self):
+        if self.pending >= self.max_batch:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            # Backs off while flushes keep failing
+            interval = min(self.max_backoff, self.flush_interval * 2 ** self._consecutive_failures)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed")
+
+    async def flush(self):
+        """
+        Commits all currently pending writes in a single transaction. If that fails, commits
+        them one by one; entries that still fail stay queued (or are dead-lettered).
+        """
+        async with self._flush_lock:
+            messages = list(self._messages)
+            memory_updates = list(self._memory_updates)
+            if not messages and not memory_updates:
+                return
+
+            try:
+                with span("persist.flush"):
+                    await self._commit(messages, memory_updates)
+            except Exception:
+                self.failed_flushes += 1
+                logger.exception("Write-behind flush of %d writes failed, retrying them one by one", len(messages) + len(memory_updates))
+                failed = await self._commit_individually(messages, memory_updates)
+            else:
+                failed = 0
+            self._consecutive_failures = self._consecutive_failures + 1 if failed else 0
+            self.flushes += 1
+
+    async def _commit(self, messages: List[PendingMessage], memory_updates: List[PendingMemoryUpdate]):
+        # Imported here to avoid a circular import (memory_service reads from this queue)
+        from app.services.memory_service import memory_update_statements
+
+        by_shard = await shard_router.group_by_shard(messages)
+        main_messages = by_shard.pop(None, [])
+        for shard, shard_messages in by_shard.items():
+            async with shard_router.async_session(shard) as db:
+                await self._commit_messages(db, shard_messages)
+            # Committed: a later failure must not write them a second time
+            self._forget_messages(shard_messages)
+            self.flushed_writes += len(shard_messages)
+
+        if main_messages or memory_updates:
+            async with self.session_factory() as db:
+                # Row-level upserts, applied in the order the updates were queued
+                for update in memory_updates:
+                    for statement in memory_update_statements(update.user_id, update.data):
+                        await db.execute(statement)
+                await self._commit_messages(db, main_messages)
+
+        # Before the updates leave the pending list, so readers never miss them
+        for user_id in {update.user_id for update in memory_updates}:
+            user_cache.invalidate_memory(user_id)
+
+        self._forget_messages(main_messages)
+        self._forget_memory_updates(memory_updates)
+        self.flushed_writes += len(main_messages) + len(memory_updates)
+
+    async def _commit_individually(self, messages: List[PendingMessage], memory_updates: List[PendingMemoryUpdate]) -> int:
+        """
+        Commits each entry in its own transaction. Returns how many are still failing.
+        """
+        failed = 0
+        # Shards the grouped attempt committed before failing are no longer pending
+        pending = {id(m) for m in self._messages}
+        entries = [([m], []) for m in messages if id(m) in pending] + [([], [u]) for u in memory_updates]
+        for entry_messages, entry_updates in entries:
+            try:
+                await self._commit(entry_messages, entry_updates)
+            except Exception as e:
+                failed += 1
+                entry = (entry_messages or entry_updates)[0]
+                entry.attempts += 1
+                if entry.attempts >= self.max_attempts:
+                    await asyncio.to_thread(self._dead_letter, entry, e)
+                    self._forget_messages(entry_messages)
+                    self._forget_memory_updates(entry_updates)
+        return failed
+
+    def _dead_letter(self, entry, error: Exception):
+        """
+        Appends an entry that can't be written to the dead-letter log, for inspection or replay.
+        """
+        if isinstance(entry, PendingMessage):
+            record = {
+                "kind": "message",
+                "session_id": entry.session_id,
+                "role": entry.role,
+                "content": entry.content,
+                "metadata": entry.metadata_json,
+                "timestamp": entry.timestamp.isoformat()
+            }
+        else:
+            record = {"kind": "memory", "user_id": entry.user_id, "data": entry.data}
+        record.update({"attempts": entry.attempts, "error": str(error), "dead_lettered_at": datetime.utcnow().isoformat()})
+        os.makedirs(os.path.dirname(os.path.abspath(self.dead_letter_path)), exist_ok=True)
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+        self.dead_letters += 1
+        logger.error("Dropped a %s write after %d failed attempts (see %s): %s", record["kind"], entry.attempts, self.dead_letter_path, error)
+
+    @staticmethod
+    async def _commit_messages(db, messages: List[PendingMessage]):
+        rows = [
+            models.ChatMessage(
+                session_id=m.session_id,
+                role=m.role,
+                content=m.content,
+                metadata_json=m.metadata_json,
+                timestamp=m.timestamp
+            )
+            for m in messages
+        ]
+        db.add_all(rows)
+        await db.flush()
+        # Ids are known before commit so readers can de-duplicate pending vs committed rows
+        for pending, row in zip(messages, rows):
+            pending.id = row.id
+        try:
+            await db.commit()
+        except Exception:
+            for pending in messages:
+                pending.id = None
+            raise
+
+    def _forget_messages(self, messages: List[PendingMessage]):
+        done = {id(m) for m in messages}
+        self._messages = [m for m in self._messages if id(m) not in done]
+
+    def _forget_memory_updates(self, updates: List[PendingMemoryUpdate]):
+        done = {id(u) for u in updates}
+        self._memory_updates = [u for u in self._memory_updates if id(u) not in done]
+
+persistence_queue = PersistenceQueue.from_env()
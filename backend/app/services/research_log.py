@@ -0,0 +1,297 @@
+import os
+import json
+import time
+import heapq
+import base64
+import asyncio
+import logging
+import socket
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_LOG_DIR = os.path.join(BASE_DIR, "data", "research_logs")
+
+SEGMENT_PREFIX = "research-"
+SEGMENT_SUFFIX = ".jsonl"
+
+def encode_log_cursor(event: Dict[str, Any]) -> str:
+    raw = json.dumps([event["ts"], event["writer"], event["seq"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_log_cursor(cursor: str) -> Tuple[float, str, int]:
+    try:
+        ts, writer, seq = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return float(ts), str(writer), int(seq)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _sort_key(event: Dict[str, Any]) -> Tuple[float, str, int]:
+    return event["ts"], event["writer"], event["seq"]
+
+class ResearchLog:
+    """
+    Bounded, durable log of research events.
+
+    append() only puts the event in an in-memory ring buffer, so logging costs nothing
+    measurable on the request path. A background task flushes the buffer to append-only
+    JSONL segment files, rotating them by size/age and enforcing size and age retention.
+    If events arrive faster than they can be flushed, the oldest unflushed ones are dropped
+    (and counted) rather than growing memory.
+
+    Every process writes its own segments (named with a writer id) into the shared directory,
+    so queries see events from all workers. Events are ordered by (ts, writer, seq).
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_LOG_DIR,
+        buffer_size: int = 10000,
+        flush_interval: float = 1.0,
+        segment_max_bytes: int = 8 * 1024 * 1024,
+        segment_max_age: float = 3600,
+        retention_bytes: int = 256 * 1024 * 1024,
+        retention_seconds: float = 7 * 24 * 3600
+    ):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age = segment_max_age
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+
+        self.writer = f"{socket.gethostname()}-{os.getpid()}"
+        self._seq = 0
+        self._pending: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self._segment_path: Optional[str] = None
+        self._segment_opened = 0.0
+        self._segment_count = 0
+        self._io_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.appended = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.segments_deleted = 0
+
+    @classmethod
+    def from_env(cls) -> "ResearchLog":
+        return cls(
+            directory=os.getenv("RESEARCH_LOG_DIR", DEFAULT_LOG_DIR),
+            buffer_size=int(os.getenv("RESEARCH_LOG_BUFFER_SIZE", "10000")),
+            flush_interval=float(os.getenv("RESEARCH_LOG_FLUSH_INTERVAL_MS", "1000")) / 1000,
+            segment_max_bytes=int(os.getenv("RESEARCH_LOG_SEGMENT_MAX_BYTES", str(8 * 1024 * 1024))),
+            segment_max_age=float(os.getenv("RESEARCH_LOG_SEGMENT_MAX_AGE_SECONDS", "3600")),
+            retention_bytes=int(os.getenv("RESEARCH_LOG_RETENTION_BYTES", str(256 * 1024 * 1024))),
+            retention_seconds=float(os.getenv("RESEARCH_LOG_RETENTION_HOURS", "168")) * 3600
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def buffered(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the flusher and writes out whatever is still buffered.
+        """
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def append(self, event_type: str, data: Dict[str, Any], user_id: Optional[str] = None) -> Dict[str, Any]:
+        now = time.time()
+        self._seq += 1
+        event = {
+            "seq": self._seq,
+            "writer": self.writer,
+            "ts": now,
+            "timestamp": datetime.fromtimestamp(now, tz=timezone.utc).isoformat(),
+            "type": event_type,
+            "user_id": str(user_id) if user_id is not None else None,
+            "data": data
+        }
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+        self._pending.append(event)
+        self.appended += 1
+        return event
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                # Events stay buffered (up to the ring size) and are retried next tick
+                logger.exception("Research log flush failed")
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch = list(self._pending)
+        await asyncio.to_thread(self._write_batch, batch)
+        # Only drop what was written; newer events may have arrived meanwhile
+        for _ in range(len(batch)):
+            if self._pending and self._pending[0]["seq"] <= batch[-1]["seq"]:
+                self._pending.popleft()
+        self.flushed += len(batch)
+
+    def _write_batch(self, batch: List[Dict[str, Any]]):
+        with self._io_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._current_segment(batch[0]["ts"])
+            payload = "".join(json.dumps(event, default=str) + "\n" for event in batch)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(payload)
+            self._apply_retention()
+
+    def _current_segment(self, first_ts: float) -> str:
+        now = time.time()
+        if self._segment_path and os.path.exists(self._segment_path):
+            too_big = os.path.getsize(self._segment_path) >= self.segment_max_bytes
+            too_old = now - self._segment_opened >= self.segment_max_age
+            if not (too_big or too_old):
+                return self._segment_path
+
+        # Name starts with the first event's time (ms) so segments sort chronologically;
+        # the counter keeps segments rotated within the same millisecond apart
+        self._segment_count += 1
+        name = f"{SEGMENT_PREFIX}{int(first_ts * 1000):015d}-{self.writer}-{self._segment_count:06d}{SEGMENT_SUFFIX}"
+        self._segment_path = os.path.join(self.directory, name)
+        self._segment_opened = now
+        return self._segment_path
+
+    def _segments(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(
+            n for n in os.listdir(self.directory)
+            if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX)
+        )
+        return [os.path.join(self.directory, n) for n in names]
+
+    def _apply_retention(self):
+        now = time.time()
+        segments = []
+        for path in self._segments():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            segments.append((path, stat.st_size, stat.st_mtime))
+
+        total = sum(size for _, size, _ in segments)
+        for path, size, mtime in segments: # oldest first
+            over_size = total > self.retention_bytes
+            expired = now - mtime > self.retention_seconds
+            if path == self._segment_path or not (over_size or expired):
+                continue
+            try:
+                os.remove(path)
+                self.segments_deleted += 1
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def query(
+        self,
+        event_type: Optional[str] = None,
+        user_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        cursor: Optional[str] = None,
+        limit: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yields matching events in order, oldest first, starting after `cursor`.
+        Segment files are read lazily and merged, so a page only reads as far as it needs;
+        segments last modified before the lower time bound are skipped without opening them.
+        Blocking file I/O: call from a thread (StreamingResponse does this for sync iterators).
+        """
+        after = decode_log_cursor(cursor) if cursor else None
+        lower = max(since or 0.0, after[0] if after else 0.0)
+
+        sources = []
+        for path in self._segments():
+            try:
+                if os.path.getmtime(path) < lower:
+                    continue
+            except FileNotFoundError:
+                continue
+            sources.append(self._read_segment(path))
+        # Events not flushed yet by this process
+        pending = sorted(list(self._pending), key=_sort_key)
+        sources.append(iter(pending))
+
+        # While a flush completes an event can be both on disk and still pending
+        pending_keys = {_sort_key(e) for e in pending}
+        seen_pending = set()
+        emitted = 0
+        for event in heapq.merge(*sources, key=_sort_key):
+            key = _sort_key(event)
+            if key in pending_keys:
+                if key in seen_pending:
+                    continue
+                seen_pending.add(key)
+            if after and key <= after:
+                continue
+            if since is not None and event["ts"] < since:
+                continue
+            if until is not None and event["ts"] > until:
+                break
+            if event_type and event["type"] != event_type:
+                continue
+            if user_id and event.get("user_id") != str(user_id):
+                continue
+            yield event
+            emitted += 1
+            if emitted >= limit:
+                return
+
+    @staticmethod
+    def _read_segment(path: str) -> Iterator[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn last line from a crash mid-write
+                        continue
+        except FileNotFoundError:
+            # Removed by retention while we were reading
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        segments = self._segments()
+        return {
+            "running": self.running,
+            "buffered": self.buffered,
+            "buffer_size": self._pending.maxlen,
+            "appended": self.appended,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "segments": len(segments),
+            "segment_bytes": sum(os.path.getsize(p) for p in segments if os.path.exists(p)),
+            "segments_deleted": self.segments_deleted,
+            "directory": self.directory
+        }
+
+research_log = ResearchLog.from_env()
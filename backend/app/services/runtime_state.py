@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_STATE_PATH = os.path.join(BASE_DIR, "data", "runtime_state.db")
+
+class RuntimeState:
+    """
+    Runtime flags and counters shared by every worker process on the host, kept in a small
+    SQLite file (stdlib driver, WAL, like the user cache invalidation stamp).
+
+    Flags (e.g. research mode) are cached in memory. Reads check `PRAGMA data_version`
+    at most every `check_interval` seconds; it changes whenever another connection
+    committed, so a toggle in one worker reaches the others within that interval at the
+    cost of one cheap pragma. Counters are added up in memory and written as one row per
+    worker every `flush_interval` seconds; totals sum the rows of all workers. Each worker
+    also heartbeats, so workers() lists the live processes.
+
+    incr() and get_flag() run on the event loop, so they never wait for a write: the
+    counters buffer has its own lock, held only to add to it or swap it out, and flag
+    refreshes read through a separate connection (WAL readers don't wait for writers)
+    and skip the check if that connection is busy. The write connection and its lock are
+    only used from threads (flush, set_flag, counters, workers), where a commit may wait
+    up to the busy timeout while other workers write.
+    """
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH, check_interval: float = 0.2, flush_interval: float = 1.0, worker_ttl: float = 15):
+        self.path = path
+        self.check_interval = check_interval
+        self.flush_interval = flush_interval
+        self.worker_ttl = worker_ttl
+        self.writer = f"{socket.gethostname()}-{os.getpid()}"
+
+        self._pending_lock = threading.Lock()
+        self._conn_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._read_pid = None
+        self._data_version = None
+        self._next_check = 0.0
+        self._flags: Dict[str, Any] = {}
+        self._pending: Dict[str, float] = defaultdict(float)
+        self._started_at = time.time()
+        self._task: Optional[asyncio.Task] = None
+
+        self.reloads = 0
+
+    @classmethod
+    def from_env(cls) -> "RuntimeState":
+        return cls(
+            path=os.getenv("RUNTIME_STATE_PATH", DEFAULT_STATE_PATH),
+            check_interval=float(os.getenv("RUNTIME_STATE_CHECK_MS", "200")) / 1000,
+            flush_interval=float(os.getenv("RUNTIME_STATE_FLUSH_MS", "1000")) / 1000
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily and again after a fork, so each worker has its own connection
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS runtime_flags ("
+                "name TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL, updated_by TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS runtime_counters ("
+                "name TEXT NOT NULL, writer TEXT NOT NULL, value REAL NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (name, writer))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS runtime_workers ("
+                "writer TEXT PRIMARY KEY, pid INTEGER NOT NULL, started_at REAL NOT NULL, heartbeat_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+            self.writer = f"{socket.gethostname()}-{os.getpid()}"
+            self._data_version = None
+            self._next_check = 0.0
+        return self._conn
+
+    def _read_connection(self) -> Optional[sqlite3.Connection]:
+        """
+        Connection for flag refreshes, or None until the write connection created the
+        tables. Fails fast rather than waiting out a lock on the event loop.
+        """
+        if self._pid != os.getpid():
+            return None
+        if self._read_conn is None or self._read_pid != os.getpid():
+            self._read_conn = sqlite3.connect(self.path, check_same_thread=False, timeout=0.05)
+            self._read_pid = os.getpid()
+        return self._read_conn
+
+    def get_flag(self, name: str, default: Any = None) -> Any:
+        self._refresh()
+        return self._flags.get(name, default)
+
+    def flags(self) -> Dict[str, Any]:
+        self._refresh()
+        return dict(self._flags)
+
+    def set_flag(self, name: str, value: Any):
+        """
+        Blocking; call it from a thread.
+        """
+        with self._conn_lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO runtime_flags (name, value, updated_at, updated_by) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at, "
+                "updated_by = excluded.updated_by",
+                (name, json.dumps(value), time.time(), self.writer)
+            )
+            conn.commit()
+            # data_version only reflects other connections' commits
+            self._flags[name] = value
+
+    def incr(self, name: str, amount: float = 1):
+        with self._pending_lock:
+            self._pending[name] += amount
+
+    def counters(self) -> Dict[str, float]:
+        """
+        Totals across all workers (including this one's unflushed increments). Blocking.
+        """
+        with self._conn_lock:
+            rows = self._connection().execute(
+                "SELECT name, SUM(value) FROM runtime_counters GROUP BY name"
+            ).fetchall()
+            totals = {name: value for name, value in rows}
+            with self._pending_lock:
+                pending = dict(self._pending)
+        for name, value in pending.items():
+            totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def workers(self) -> List[Dict[str, Any]]:
+        with self._conn_lock:
+            rows = self._connection().execute(
+                "SELECT writer, pid, started_at, heartbeat_at FROM runtime_workers WHERE heartbeat_at >= ? ORDER BY started_at",
+                (time.time() - self.worker_ttl,)
+            ).fetchall()
+        return [{"writer": w, "pid": pid, "started_at": started, "heartbeat_at": beat} for w, pid, started, beat in rows]
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        # Another thread is refreshing; serve the flags we have
+        if not self._read_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = now + self.check_interval
+            conn = self._read_connection()
+            if conn is None:
+                return
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return
+            self._flags = {name: json.loads(value) for name, value in conn.execute("SELECT name, value FROM runtime_flags")}
+            self._data_version = version
+            self.reloads += 1
+        except sqlite3.Error:
+            # Keep serving the last known flags
+            logger.exception("Failed to read shared runtime state")
+        finally:
+            self._read_lock.release()
+
+    def flush(self):
+        """
+        Writes this worker's counter increments and heartbeat. Blocking; the background
+        task runs it in a thread.
+        """
+        now = time.time()
+        with self._pending_lock:
+            pending, self._pending = self._pending, defaultdict(float)
+        with self._conn_lock:
+            conn = self._connection()
+            try:
+                conn.executemany(
+                    "INSERT INTO runtime_counters (name, writer, value, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(name, writer) DO UPDATE SET value = value + excluded.value, updated_at = excluded.updated_at",
+                    [(name, self.writer, value, now) for name, value in pending.items()]
+                )
+                conn.execute(
+                    "INSERT INTO runtime_workers (writer, pid, started_at, heartbeat_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(writer) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                    (self.writer, os.getpid(), self._started_at, now)
+                )
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                # Put the increments back for the next attempt
+                with self._pending_lock:
+                    for name, value in pending.items():
+                        self._pending[name] += value
+                raise
+
+    def _unregister(self):
+        with self._conn_lock:
+            self._connection().execute("DELETE FROM runtime_workers WHERE writer = ?", (self.writer,))
+            self._connection().commit()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await asyncio.to_thread(self.flush)
+            await asyncio.to_thread(self._unregister)
+        except sqlite3.Error:
+            logger.exception("Failed to write shared runtime state on shutdown")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.flush)
+            except sqlite3.Error:
+                logger.exception("Failed to write shared runtime state")
+            await asyncio.sleep(self.flush_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "writer": self.writer,
+            "flags": self.flags(),
+            "counters": self.counters(),
+            "workers": self.workers(),
+            "reloads": self.reloads
+        }
+
+runtime_state = RuntimeState.from_env()
@@ -0,0 +1,261 @@
+import os
+import json
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+from sqlalchemy import select, update
+from app.db import models
+from app.db.database import AsyncSessionLocal
+from app.db.sharding import shard_router
+from app.core.context_builder import CHARS_PER_TOKEN, summarize_turns, truncate_to_tokens
+from app.core.scheduler import PRIORITY_BATCH, estimate_tokens
+from app.services.persistence_queue import persistence_queue
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a tutoring conversation between a learner and a tutor. "
+    "Update the current summary with the new turns, keeping what still matters for continuing "
+    "the conversation (goals, explanations given, misconceptions, open questions). "
+    "Reply with JSON only: {\"summary\": \"...\", \"topics\": [\"...\"], \"weak_areas\": [\"...\"]} "
+    "where summary is at most 150 words, topics are concepts the learner covered and "
+    "weak_areas are concepts they struggled with."
+)
+
+def _keep_tail(text: str, max_tokens: int) -> str:
+    # A rolling summary should lose its oldest part first
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return "… " + text[-(max_tokens - 1) * CHARS_PER_TOKEN + 2:].lstrip()
+
+def parse_summary_response(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Parses the model's JSON answer; None if it isn't the expected shape
+    (e.g. a mock/local model that doesn't follow instructions).
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("{"):]
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("summary"), str) or not data["summary"].strip():
+        return None
+    return {
+        "summary": data["summary"].strip(),
+        "topics": [str(t) for t in data.get("topics") or [] if t],
+        "weak_areas": [str(t) for t in data.get("weak_areas") or [] if t]
+    }
+
+class SessionCompactor:
+    """
+    Background worker that folds the older messages of long chat sessions into a stored
+    rolling summary (SessionSummary), so chat context is "summary + recent turns" and
+    neither history reads nor prompts grow with session length.
+
+    The chat endpoints call notify() after each turn. Every `interval` seconds the worker
+    looks at the notified sessions: once more than `threshold` messages are not covered by
+    the summary, all but the newest `keep_recent` of them (at most `max_batch` per pass) are
+    summarized together with the previous summary by a cheap model at batch priority.
+    Topics and weak areas the model extracts are merged into the learner memory. If the
+    model's answer isn't usable JSON, an extractive summary is stored instead.
+    """
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        model_router=None,
+        model_id: str = "gemini-pro",
+        threshold: int = 30,
+        keep_recent: int = 10,
+        max_batch: int = 60,
+        summary_max_tokens: int = 400,
+        interval: float = 2.0,
+        enabled: bool = True
+    ):
+        self.session_factory = session_factory
+        self._model_router = model_router
+        self.model_id = model_id
+        self.threshold = threshold
+        self.keep_recent = keep_recent
+        self.max_batch = max_batch
+        self.summary_max_tokens = summary_max_tokens
+        self.interval = interval
+        self.enabled = enabled
+
+        self._dirty: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+        self.compactions = 0
+        self.messages_compacted = 0
+        self.fallback_summaries = 0
+        self.failures = 0
+
+    @classmethod
+    def from_env(cls) -> "SessionCompactor":
+        return cls(
+            model_id=os.getenv("SESSION_SUMMARY_MODEL", "gemini-pro"),
+            threshold=int(os.getenv("SESSION_COMPACT_THRESHOLD", "30")),
+            keep_recent=int(os.getenv("SESSION_COMPACT_KEEP_RECENT", "10")),
+            max_batch=int(os.getenv("SESSION_COMPACT_MAX_BATCH", "60")),
+            summary_max_tokens=int(os.getenv("SESSION_SUMMARY_MAX_TOKENS", "400")),
+            interval=float(os.getenv("SESSION_COMPACT_INTERVAL_MS", "2000")) / 1000,
+            enabled=os.getenv("SESSION_COMPACT_ENABLED", "true").lower() not in ("0", "false", "no")
+        )
+
+    @property
+    def model_router(self):
+        if self._model_router is None:
+            # Imported lazily: the router is a process-wide singleton built on first use
+            from app.core.model_router import get_model_router
+            self._model_router = get_model_router()
+        return self._model_router
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.enabled and not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self, session_id: int):
+        if self.enabled:
+            self._dirty.add(session_id)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            sessions, self._dirty = self._dirty, set()
+            for session_id in sessions:
+                try:
+                    # Keep going while a backlog remains (e.g. a session older than this feature)
+                    while await self.compact(session_id):
+                        pass
+                except Exception:
+                    self.failures += 1
+                    logger.exception("Compaction of session %s failed", session_id)
+
+    async def compact(self, session_id: int) -> bool:
+        """
+        Runs one compaction pass for a session. Returns True if it summarized anything.
+        """
+        # The session's shard when storage is sharded
+        session_factory = await shard_router.session_factory_for(session_id, self.session_factory)
+        async with session_factory() as db:
+            chat_session = await db.get(models.ChatSession, session_id)
+            if chat_session is None:
+                return False
+            result = await db.execute(
+                select(models.SessionSummary).where(models.SessionSummary.session_id == session_id)
+            )
+            current = result.scalars().first()
+            covered_until = current.covered_until_id if current else 0
+
+            # Only the uncovered tail is read, so this stays bounded too
+            result = await db.execute(
+                select(models.ChatMessage.id, models.ChatMessage.role, models.ChatMessage.content)
+                .where(models.ChatMessage.session_id == session_id, models.ChatMessage.id > covered_until)
+                .order_by(models.ChatMessage.id)
+                .limit(self.max_batch + self.keep_recent + 1)
+            )
+            uncovered = result.all()
+
+        if len(uncovered) <= self.threshold:
+            return False
+        batch = uncovered[:-self.keep_recent][:self.max_batch] if self.keep_recent else uncovered[:self.max_batch]
+        if not batch:
+            return False
+
+        previous = current.summary if current else ""
+        turns = [{"role": m.role, "content": m.content} for m in batch]
+        extracted = await self._summarize(previous, turns)
+
+        async with session_factory() as db:
+            values = {
+                "summary": extracted["summary"],
+                "covered_until_id": batch[-1].id,
+                "messages_covered": (current.messages_covered if current else 0) + len(batch),
+                "topics": list(dict.fromkeys((current.topics if current else []) + extracted["topics"])),
+                "weak_areas": list(dict.fromkeys((current.weak_areas if current else []) + extracted["weak_areas"])),
+                "model_id": extracted["model_id"],
+                "updated_at": datetime.utcnow()
+            }
+            if current:
+                # Conditional on the coverage we read, so a concurrent pass (another worker) wins cleanly
+                result = await db.execute(
+                    update(models.SessionSummary)
+                    .where(
+                        models.SessionSummary.session_id == session_id,
+                        models.SessionSummary.covered_until_id == covered_until
+                    )
+                    .values(**values)
+                )
+                if result.rowcount == 0:
+                    return False
+            else:
+                db.add(models.SessionSummary(session_id=session_id, **values))
+            await db.commit()
+
+        if extracted["topics"] or extracted["weak_areas"]:
+            persistence_queue.update_user_memory(
+                chat_session.user_id,
+                {"topics_learned": extracted["topics"], "weak_areas": extracted["weak_areas"]}
+            )
+        self.compactions += 1
+        self.messages_compacted += len(batch)
+        return True
+
+    async def _summarize(self, previous: str, turns: List[Dict[str, str]]) -> Dict[str, Any]:
+        transcript = "\n".join(
+            f"{'User' if t['role'] == 'user' else 'Tutor'}: {truncate_to_tokens(t['content'], 400)}" for t in turns
+        )
+        user_message = f"Current summary:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"
+        try:
+            result = await self.model_router.generate(
+                self.model_id, SUMMARY_SYSTEM_PROMPT, user_message,
+                temperature=0.2, use_cache=False, priority=PRIORITY_BATCH
+            )
+            parsed = parse_summary_response(result.text)
+            if parsed:
+                parsed["summary"] = _keep_tail(parsed["summary"], self.summary_max_tokens)
+                return {**parsed, "model_id": result.model_id}
+        except Exception:
+            logger.warning("Summary model call failed, using extractive summary", exc_info=True)
+
+        self.fallback_summaries += 1
+        combined = "\n".join(part for part in (previous, summarize_turns(turns, self.summary_max_tokens)) if part)
+        return {
+            "summary": _keep_tail(combined, self.summary_max_tokens),
+            "topics": [],
+            "weak_areas": [],
+            "model_id": None
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "pending_sessions": len(self._dirty),
+            "compactions": self.compactions,
+            "messages_compacted": self.messages_compacted,
+            "fallback_summaries": self.fallback_summaries,
+            "failures": self.failures
+        }
+
+session_compactor = SessionCompactor.from_env()
@@ -0,0 +1,359 @@
+import os
+import copy
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from app.db import models
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CurrentUser:
+    """
+    Snapshot of a users row as request handlers see it. Shared across requests through the
+    cache, so treat it as read-only: writes load the row by id and invalidate the cache.
+    """
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    is_active: bool = True
+    preferences: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_row(cls, user: models.User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            is_active=user.is_active,
+            preferences=dict(user.preferences or {})
+        )
+
+class InvalidationStamp:
+    """
+    Cross-worker invalidation log in a small local SQLite file.
+
+    Every worker appends the user ids it invalidates and polls for rows other workers
+    added since its last check, so a write in one worker reaches the others' caches
+    within one flush plus one poll interval. Uses the stdlib driver, like SQLiteCacheTier.
+
+    publish() only buffers: invalidations come from the event loop (write-behind flushes,
+    registration), and a commit can wait up to the busy timeout while other workers
+    write. A background task writes the buffer every `flush_interval` seconds in a
+    thread, like RuntimeState does for counters. Writes and polls use separate
+    connections and locks, so a poll never waits behind a contended write.
+    """
+
+    def __init__(self, path: str, retention_seconds: float = 3600, flush_interval: float = 0.1):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self.flush_interval = flush_interval
+        self.writer = os.getpid()
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending: List[Tuple[int, str, float]] = []
+        self._task: Optional[asyncio.Task] = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS user_cache_invalidations ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+            "kind TEXT NOT NULL, writer INTEGER NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._read_conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        # Only invalidations from now on matter to this process
+        self.last_seq = self._read_conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM user_cache_invalidations"
+        ).fetchone()[0]
+
+    def publish(self, user_id: int, kind: str):
+        """
+        Queues an invalidation for the next flush. Never touches the database.
+        """
+        with self._pending_lock:
+            self._pending.append((user_id, kind, time.time()))
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self):
+        """
+        Writes the queued invalidations. Blocking; the background task runs it in a thread.
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        now = time.time()
+        with self._write_lock:
+            try:
+                self._conn.executemany(
+                    "INSERT INTO user_cache_invalidations (user_id, kind, writer, created_at) VALUES (?, ?, ?, ?)",
+                    [(user_id, kind, self.writer, created_at) for user_id, kind, created_at in pending]
+                )
+                self._conn.execute(
+                    "DELETE FROM user_cache_invalidations WHERE created_at < ?", (now - self.retention_seconds,)
+                )
+                self._conn.commit()
+            except sqlite3.Error:
+                self._conn.rollback()
+                # Put them back (ahead of newer ones) for the next attempt
+                with self._pending_lock:
+                    self._pending[:0] = pending
+                raise
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await asyncio.to_thread(self.flush)
+        except sqlite3.Error:
+            logger.exception("Failed to publish user cache invalidations on shutdown")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.flush)
+            except sqlite3.Error:
+                logger.exception("Failed to publish user cache invalidations")
+            await asyncio.sleep(self.flush_interval)
+
+    def poll(self) -> List[Tuple[int, str]]:
+        """
+        (user_id, kind) pairs invalidated by other workers since the last poll.
+        """
+        with self._read_lock:
+            rows = self._read_conn.execute(
+                "SELECT seq, user_id, kind, writer FROM user_cache_invalidations WHERE seq > ? ORDER BY seq",
+                (self.last_seq,)
+            ).fetchall()
+        if rows:
+            self.last_seq = rows[-1][0]
+        return [(user_id, kind) for _, user_id, kind, writer in rows if writer != self.writer]
+
+    def close(self):
+        self.flush()
+        with self._write_lock:
+            self._conn.close()
+        with self._read_lock:
+            self._read_conn.close()
+
+class UserCache:
+    """
+    Bounded LRU+TTL cache of user snapshots (by id and email) and rendered memory profiles.
+
+    Writers call invalidate_user()/invalidate_memory() after committing. A load that raced
+    with an invalidation must not put its (possibly stale) result back, so loaders take a
+    load_token() before querying and pass it to put_*(); the put is dropped if the user was
+    invalidated after the token was taken. Methods never await and take a thread lock, so
+    they are safe from coroutines and from sync handlers in the threadpool.
+    """
+
+    USER = "user"
+    MEMORY = "memory"
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: float = 60,
+        stamp: Optional[InvalidationStamp] = None,
+        stamp_check_interval: float = 1.0,
+        enabled: bool = True
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stamp = stamp
+        self.stamp_check_interval = stamp_check_interval
+        self.enabled = enabled
+
+        # (kind, user_id) -> (expires_at, value)
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, Any]]" = OrderedDict()
+        self._ids_by_email: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        # Invalidation sequence numbers; tombstones remember the last one per key
+        self._seq = 0
+        self._tombstones: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+        self._forgotten_seq = 0 # Highest seq of a tombstone dropped to keep the map bounded
+        self._next_stamp_check = 0.0
+
+        self.hits = {self.USER: 0, self.MEMORY: 0}
+        self.misses = {self.USER: 0, self.MEMORY: 0}
+        self.invalidations = 0
+        self.remote_invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "UserCache":
+        stamp_path = os.getenv("USER_CACHE_STAMP_PATH")
+        stamp = None
+        if stamp_path:
+            try:
+                stamp = InvalidationStamp(
+                    stamp_path, flush_interval=float(os.getenv("USER_CACHE_STAMP_FLUSH_MS", "100")) / 1000
+                )
+            except sqlite3.Error:
+                logger.exception("User cache invalidation stamp unavailable; caching per worker only")
+        return cls(
+            max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000")),
+            ttl_seconds=float(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+            stamp=stamp,
+            stamp_check_interval=float(os.getenv("USER_CACHE_STAMP_CHECK_MS", "1000")) / 1000,
+            enabled=os.getenv("USER_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+        )
+
+    def start(self):
+        """
+        Starts publishing invalidations to the shared stamp, if there is one.
+        """
+        if self.stamp is not None:
+            self.stamp.start()
+
+    async def stop(self):
+        if self.stamp is not None:
+            await self.stamp.stop()
+
+    def load_token(self) -> int:
+        return self._seq
+
+    def get_user(self, email: str) -> Optional[CurrentUser]:
+        self._check_stamp()
+        with self._lock:
+            user_id = self._ids_by_email.get(email)
+            user = self._get((self.USER, user_id)) if user_id is not None else None
+        self._count(self.USER, user is not None)
+        return user
+
+    def put_user(self, user: CurrentUser, token: int):
+        with self._lock:
+            if self._put((self.USER, user.id), user, token):
+                self._ids_by_email[user.email] = user.id
+
+    def get_memory(self, user_id: int) -> Optional[Dict[str, Any]]:
+        self._check_stamp()
+        with self._lock:
+            profile = self._get((self.MEMORY, user_id))
+        self._count(self.MEMORY, profile is not None)
+        # Callers merge pending writes into (and hand out) the profile, so give them a copy
+        return copy.deepcopy(profile) if profile is not None else None
+
+    def put_memory(self, user_id: int, profile: Dict[str, Any], token: int):
+        with self._lock:
+            self._put((self.MEMORY, user_id), copy.deepcopy(profile), token)
+
+    def invalidate_user(self, user_id: int, email: Optional[str] = None):
+        self._invalidate(self.USER, user_id, email=email)
+
+    def invalidate_memory(self, user_id: int):
+        self._invalidate(self.MEMORY, user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._ids_by_email.clear()
+
+    def _get(self, key: Tuple[str, int]) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key: Tuple[str, int], value: Any, token: int) -> bool:
+        if not self.enabled:
+            return False
+        if token < self._forgotten_seq or self._tombstones.get(key, 0) > token:
+            # Invalidated while the caller was loading it
+            return False
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            (kind, user_id), (_, evicted) = self._entries.popitem(last=False)
+            if kind == self.USER:
+                self._ids_by_email.pop(evicted.email, None)
+        return True
+
+    def _invalidate(self, kind: str, user_id: int, email: Optional[str] = None, publish: bool = True):
+        key = (kind, user_id)
+        with self._lock:
+            self._seq += 1
+            self._tombstones[key] = self._seq
+            self._tombstones.move_to_end(key)
+            while len(self._tombstones) > self.max_entries:
+                _, seq = self._tombstones.popitem(last=False)
+                self._forgotten_seq = max(self._forgotten_seq, seq)
+
+            entry = self._entries.pop(key, None)
+            if kind == self.USER:
+                if entry is not None:
+                    self._ids_by_email.pop(entry[1].email, None)
+                if email is not None:
+                    self._ids_by_email.pop(email, None)
+            self.invalidations += 1
+
+        if publish and self.stamp is not None:
+            self.stamp.publish(user_id, kind)
+
+    def _check_stamp(self):
+        if self.stamp is None:
+            return
+        now = time.monotonic()
+        if now < self._next_stamp_check:
+            return
+        self._next_stamp_check = now + self.stamp_check_interval
+        try:
+            invalidated = self.stamp.poll()
+        except sqlite3.Error:
+            logger.exception("Failed to read user cache invalidations")
+            return
+        for user_id, kind in invalidated:
+            self._invalidate(kind, user_id, publish=False)
+            self.remote_invalidations += 1
+
+    def _count(self, kind: str, hit: bool):
+        if hit:
+            self.hits[kind] += 1
+        else:
+            self.misses[kind] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "invalidations": self.invalidations,
+            "remote_invalidations": self.remote_invalidations,
+            "shared_stamp": self.stamp.path if self.stamp else None,
+            "unpublished_invalidations": self.stamp.pending if self.stamp else 0
+        }
+
+user_cache = UserCache.from_env()
@@ -0,0 +1,129 @@
+"""
+Compares the old blocking chat persistence path with the async one under concurrent load.
+
+Each simulated request mirrors chat_endpoint: create a session, save the user message,
+await a fake LLM call, save the assistant message. With the sync Session every commit
+blocks the event loop, so in-flight "LLM" awaits queue up behind disk writes.
+A probe coroutine measures how late the loop wakes it up (loop lag), which is
+what unrelated requests (health checks, streaming tokens) experience.
+
+Usage: python scripts/bench_async_db.py --requests 400 --concurrency 50 --llm-ms 50
+"""
+import asyncio
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Allow running as `python scripts/bench_async_db.py` from the backend folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.db import models
+from app.services.memory_service import MemoryService, AsyncMemoryService
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def run_sync(db_path, args, user_id):
+    # Pools are sized to the concurrency so both runs measure commits, not pool checkout waits
+    engine = create_engine(
+        f"sqlite:///{db_path}", connect_args={"check_same_thread": False}, pool_size=args.concurrency
+    )
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_request(i):
+        async with semaphore:
+            start = time.perf_counter()
+            db = SessionLocal()
+            try:
+                service = MemoryService(db)
+                session = service.create_chat_session(user_id, title=f"bench {i}")
+                service.add_chat_message(session.id, "user", "What is entropy?")
+                await asyncio.sleep(args.llm_ms / 1000)
+                service.add_chat_message(session.id, "assistant", "Entropy measures disorder.")
+            finally:
+                db.close()
+            return time.perf_counter() - start
+
+    latencies = await asyncio.gather(*(one_request(i) for i in range(args.requests)))
+    engine.dispose()
+    return latencies
+
+async def run_async(db_path, args, user_id):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", pool_size=1, max_overflow=0)
+    AsyncSessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_request(i):
+        async with semaphore:
+            start = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                service = AsyncMemoryService(db)
+                session = await service.create_chat_session(user_id, title=f"bench {i}")
+                await service.add_chat_message(session.id, "user", "What is entropy?")
+                await asyncio.sleep(args.llm_ms / 1000)
+                await service.add_chat_message(session.id, "assistant", "Entropy measures disorder.")
+            return time.perf_counter() - start
+
+    latencies = await asyncio.gather(*(one_request(i) for i in range(args.requests)))
+    await engine.dispose()
+    return latencies
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.005):
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+    return lags
+
+def prepare_db(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        user = models.User(email="bench@example.com", hashed_password="x", full_name="Bench")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    engine.dispose()
+    return user_id
+
+def report(name, latencies, lags, elapsed):
+    ms = [l * 1000 for l in latencies]
+    lag_ms = [l * 1000 for l in lags] or [0.0]
+    print(
+        f"{name:<6} rps={len(ms) / elapsed:8.1f}  "
+        f"p50={percentile(ms, 50):7.1f}ms  p95={percentile(ms, 95):7.1f}ms  p99={percentile(ms, 99):7.1f}ms  "
+        f"loop-lag p99={percentile(lag_ms, 99):6.1f}ms max={max(lag_ms):6.1f}ms"
+    )
+
+async def main():
+    parser = argparse.ArgumentParser(description="Sync vs async DB path under concurrent chat load")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-ms", type=float, default=50, help="Simulated LLM latency per request")
+    args = parser.parse_args()
+
+    print(f"Requests: {args.requests}, concurrency: {args.concurrency}, simulated LLM: {args.llm_ms}ms")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, runner in (("sync", run_sync), ("async", run_async)):
+            db_path = os.path.join(tmp, f"{name}.db")
+            user_id = prepare_db(db_path)
+            stop = asyncio.Event()
+            probe = asyncio.create_task(measure_loop_lag(stop))
+            start = time.perf_counter()
+            latencies = await runner(db_path, args, user_id)
+            elapsed = time.perf_counter() - start
+            stop.set()
+            report(name, latencies, await probe, elapsed)
+
+if __name__ == "__main__":
+    asyncio.run(main())
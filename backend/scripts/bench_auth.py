@@ -0,0 +1,112 @@
+"""
+Measures the auth hot path: login throughput during a login storm, the latency chat
+traffic sees meanwhile, and the per-request cost of validating a bearer token.
+
+Login storm: `--logins` concurrent password checks while chat requests keep arriving.
+Each simulated chat request takes a default-threadpool slot for a short sync call
+(a sync dependency/DB query, --db-ms) and then awaits a fake LLM call (--llm-ms).
+  inline: logins verify bcrypt in the default threadpool, as the old sync handlers did
+  pool:   logins go through PasswordHasher (app/core/password_hasher.py)
+
+Token check: decode_access_token() with the verified-token cache off and on.
+
+Usage: python scripts/bench_auth.py --logins 200 --chat-rps 100 --rounds 12 [--workers 4]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Allow running as `python scripts/bench_auth.py` from the backend folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import anyio.to_thread
+from app.core.password_hasher import PasswordHasher
+from app.core.scheduler import SchedulerOverloaded
+from app.core.security import create_access_token, decode_access_token, pwd_context
+from app.core.token_cache import token_cache
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def login_storm(mode, context, hashed, args):
+    hasher = PasswordHasher(context, max_workers=args.workers, max_waiting=args.logins, max_wait=600)
+    chat_latencies = []
+    rejected = 0
+
+    async def login():
+        nonlocal rejected
+        if mode == "inline":
+            return await anyio.to_thread.run_sync(context.verify, "secret", hashed)
+        try:
+            return await hasher.verify("secret", hashed)
+        except SchedulerOverloaded:
+            rejected += 1
+
+    async def chat():
+        started = time.perf_counter()
+        await anyio.to_thread.run_sync(time.sleep, args.db_ms / 1000)
+        await asyncio.sleep(args.llm_ms / 1000)
+        chat_latencies.append((time.perf_counter() - started) * 1000)
+
+    async def chat_traffic(stop):
+        tasks = []
+        while not stop.is_set():
+            tasks.append(asyncio.create_task(chat()))
+            await asyncio.sleep(1 / args.chat_rps)
+        await asyncio.gather(*tasks)
+
+    stop = asyncio.Event()
+    traffic = asyncio.create_task(chat_traffic(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(args.logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await traffic
+    return elapsed, chat_latencies, rejected
+
+def token_overhead(args):
+    token = create_access_token({"sub": "bench@example.com"})
+    results = {}
+    for enabled in (False, True):
+        token_cache.enabled = enabled
+        token_cache.clear()
+        decode_access_token(token)
+        started = time.perf_counter()
+        for _ in range(args.token_runs):
+            decode_access_token(token)
+        results[enabled] = (time.perf_counter() - started) / args.token_runs * 1e6
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--chat-rps", type=float, default=100, help="Chat requests started per second during the storm")
+    parser.add_argument("--db-ms", type=float, default=5, help="Sync work per chat request in the default threadpool")
+    parser.add_argument("--llm-ms", type=float, default=50)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor (the app uses passlib's default, 12)")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="PasswordHasher threads")
+    parser.add_argument("--token-runs", type=int, default=20000)
+    args = parser.parse_args()
+
+    context = pwd_context.copy(bcrypt__rounds=args.rounds)
+    hashed = context.hash("secret")
+
+    print(f"Login storm: {args.logins} logins, bcrypt cost {args.rounds}, chat {args.chat_rps:.0f} req/s")
+    print(f"{'mode':<8}{'logins/s':>10}{'chat p50':>12}{'chat p99':>12}{'chat max':>12}{'shed':>6}")
+    for mode in ("inline", "pool"):
+        elapsed, chat_latencies, rejected = asyncio.run(login_storm(mode, context, hashed, args))
+        print(
+            f"{mode:<8}{args.logins / elapsed:>10.1f}"
+            f"{percentile(chat_latencies, 50):>10.1f}ms{percentile(chat_latencies, 99):>10.1f}ms"
+            f"{max(chat_latencies):>10.1f}ms{rejected:>6}"
+        )
+
+    overhead = token_overhead(args)
+    print(f"\nToken check per request: {overhead[False]:.1f}us uncached, {overhead[True]:.1f}us cached")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Measures accuracy and latency of the local intent router (app/core/intent_router.py).
+
+Accuracy is k-fold cross-validated over the labelled examples: the seed set, plus a JSON
+file of [message, intent] pairs (--examples) and explicitly routed turns from the chat
+history (--from-logs). Each fold trains on the rest, so no message is scored by a model
+that saw it. Also reports how often confidence falls below the threshold (the share of
+messages that would pay for an LLM fallback call) and the accuracy of the rest.
+
+Usage: python scripts/bench_intent_router.py --folds 5 --min-confidence 0.5 [--examples labelled.json] [--from-logs]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+# Allow running as `python scripts/bench_intent_router.py` from the backend folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.intent_router import DEFAULT_EXAMPLES, INTENTS, IntentRouter, load_logged_examples
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--min-confidence", type=float, default=0.5)
+    parser.add_argument("--examples", help="JSON file with [message, intent] pairs")
+    parser.add_argument("--from-logs", action="store_true", help="Add explicitly routed turns from the database")
+    parser.add_argument("--latency-runs", type=int, default=20000, help="Classifications timed for latency")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    examples = list(DEFAULT_EXAMPLES)
+    if args.examples:
+        with open(args.examples, "r", encoding="utf-8") as f:
+            examples += [tuple(e) for e in json.load(f)]
+    if args.from_logs:
+        from app.db.database import SessionLocal
+        examples += load_logged_examples(SessionLocal)
+    random.Random(args.seed).shuffle(examples)
+
+    results = [] # (expected, predicted, confidence)
+    for fold in range(args.folds):
+        test = examples[fold::args.folds]
+        train = [e for i, e in enumerate(examples) if i % args.folds != fold]
+        router = IntentRouter(examples=train, min_confidence=args.min_confidence)
+        for message, expected in test:
+            decision = router.classify(message)
+            results.append((expected, decision.intent, decision.confidence))
+
+    correct = sum(1 for e, p, _ in results if e == p)
+    confident = [(e, p) for e, p, c in results if c >= args.min_confidence]
+    print(f"Examples: {len(examples)} ({args.folds}-fold cross-validation)")
+    print(f"Accuracy: {correct / len(results):.1%}")
+    print(
+        f"Confident (>= {args.min_confidence}): {len(confident) / len(results):.1%} of messages, "
+        f"accuracy {sum(1 for e, p in confident if e == p) / max(1, len(confident)):.1%}"
+    )
+    print(f"LLM fallback rate: {1 - len(confident) / len(results):.1%}")
+
+    print("\nPer intent (recall):")
+    for intent in INTENTS:
+        rows = [(e, p) for e, p, _ in results if e == intent]
+        if rows:
+            print(f"  {intent:<12} {sum(1 for e, p in rows if e == p) / len(rows):.1%}  ({len(rows)} examples)")
+
+    print("\nConfusion (rows: expected, columns: predicted):")
+    print(" " * 14 + "".join(f"{i[:10]:>12}" for i in INTENTS))
+    for expected in INTENTS:
+        counts = [sum(1 for e, p, _ in results if e == expected and p == predicted) for predicted in INTENTS]
+        print(f"  {expected:<12}" + "".join(f"{c:>12}" for c in counts))
+
+    router = IntentRouter(examples=examples, min_confidence=args.min_confidence)
+    messages = [m for m, _ in examples]
+    latencies = []
+    for i in range(args.latency_runs):
+        started = time.perf_counter()
+        router.classify(messages[i % len(messages)])
+        latencies.append((time.perf_counter() - started) * 1000)
+    print(
+        f"\nLatency per message: p50 {percentile(latencies, 50) * 1000:.1f}us, "
+        f"p99 {percentile(latencies, 99) * 1000:.1f}us, max {max(latencies) * 1000:.1f}us"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Measures chat write throughput against the number of shards (app/db/sharding.py).
+
+Writer processes (like several app workers) commit one message per transaction for a
+random user, into the shard that user lives on (user_id % N). With one shard every
+commit takes the same file lock; with N shards up to N commits proceed at once.
+Each shard count runs on fresh temporary SQLite files with the app's engine profile.
+
+Usage: python scripts/bench_sharding.py --shards 1,2,4,8 --writers 8 --seconds 5 [--synchronous FULL]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Allow running as `python scripts/bench_sharding.py` from the backend folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from app.db.database import Base, EngineProfile, create_db_engine
+from app.db import models
+from app.db.sharding import SHARDED_MODELS
+
+def writer(urls, users, deadline, synchronous, seed):
+    profile = EngineProfile(synchronous=synchronous)
+    engines = [create_db_engine(url, profile) for url in urls]
+    rng = random.Random(seed)
+    commits = failures = 0
+    while time.time() < deadline:
+        user_id = rng.randrange(1, users + 1)
+        try:
+            with engines[user_id % len(engines)].begin() as conn:
+                conn.execute(insert(models.ChatMessage).values(
+                    session_id=user_id, role="user", content="What is entropy? " * 8
+                ))
+            commits += 1
+        except OperationalError:
+            failures += 1
+    for engine in engines:
+        engine.dispose()
+    return commits, failures
+
+def run(shards, args, tmp):
+    urls = [f"sqlite:///{os.path.join(tmp, f'shards{shards}_{i}.db')}" for i in range(shards)]
+    tables = [model.__table__ for model in SHARDED_MODELS]
+    for url in urls:
+        engine = create_db_engine(url, EngineProfile(synchronous=args.synchronous))
+        Base.metadata.create_all(bind=engine, tables=tables)
+        engine.dispose()
+
+    # Start together, after every process has imported and connected
+    deadline = time.time() + 1 + args.seconds
+    with multiprocessing.Pool(args.writers) as pool:
+        results = pool.starmap(
+            writer, [(urls, args.users, deadline, args.synchronous, seed) for seed in range(args.writers)]
+        )
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", default="1,2,4,8", help="Comma separated shard counts to compare")
+    parser.add_argument("--writers", type=int, default=8, help="Writer processes")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--synchronous", default="NORMAL", help="SQLite synchronous level (FULL fsyncs every commit)")
+    args = parser.parse_args()
+
+    print(f"{args.writers} writer processes, {args.seconds:.0f}s per run, synchronous={args.synchronous}")
+    print(f"{'shards':<8}{'commits/s':>11}{'speedup':>9}{'failed':>8}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for shards in [int(s) for s in args.shards.split(",")]:
+            commits, failures = run(shards, args, tmp)
+            rate = commits / args.seconds
+            baseline = baseline or rate
+            print(f"{shards:<8}{rate:>11.0f}{rate / baseline:>8.2f}x{failures:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Compares write throughput of the old default SQLite engine with the tuned engine profile
+(app/db/database.py: WAL, synchronous=NORMAL, busy_timeout, mmap/cache size, pool sizing).
+
+Writer threads each run short transactions shaped like the persistence flush: read the
+session, insert a message, commit. Reader threads page through history meanwhile.
+Reported: committed writes per second, write latency, failed transactions ("database is
+locked") and read latency. Runs on a temporary database file, or on --url (a Postgres
+URL works too, the pragmas are then skipped).
+
+Usage: python scripts/bench_sqlite_engine.py --writers 8 --readers 4 --seconds 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Allow running as `python scripts/bench_sqlite_engine.py` from the backend folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base, EngineProfile, create_db_engine
+from app.db import models
+from app.services.memory_service import chat_history_query
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def setup(engine, sessions):
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        user = models.User(email=f"bench-{time.time()}@example.com", hashed_password="x", full_name="Bench")
+        db.add(user)
+        db.flush()
+        ids = []
+        for i in range(sessions):
+            chat_session = models.ChatSession(user_id=user.id, title=f"bench {i}")
+            db.add(chat_session)
+            db.flush()
+            ids.append(chat_session.id)
+        db.commit()
+    return ids
+
+def run(engine, session_ids, args):
+    Session = sessionmaker(bind=engine)
+    stop = threading.Event()
+    lock = threading.Lock()
+    write_latencies, read_latencies = [], []
+    failures = {"write": 0, "read": 0}
+
+    def writer(n):
+        i = 0
+        while not stop.is_set():
+            session_id = session_ids[(n + i) % len(session_ids)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                with Session() as db:
+                    db.get(models.ChatSession, session_id)
+                    db.add(models.ChatMessage(session_id=session_id, role="user", content="What is entropy? " * 8))
+                    db.commit()
+            except OperationalError:
+                with lock:
+                    failures["write"] += 1
+                continue
+            with lock:
+                write_latencies.append((time.perf_counter() - started) * 1000)
+
+    def reader(n):
+        i = 0
+        while not stop.is_set():
+            session_id = session_ids[(n + i) % len(session_ids)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                with Session() as db:
+                    db.execute(chat_history_query(session_id, limit=20)).all()
+            except OperationalError:
+                with lock:
+                    failures["read"] += 1
+                continue
+            with lock:
+                read_latencies.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(n,)) for n in range(args.readers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started, write_latencies, read_latencies, failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--url", help="Database URL to run against instead of a temporary SQLite file")
+    args = parser.parse_args()
+
+    # Old engine: pysqlite defaults (rollback journal, synchronous=FULL, 5s busy handler, pool 5+10)
+    profiles = [
+        ("default", lambda url: create_engine(url, connect_args={"check_same_thread": False}) if url.startswith("sqlite") else create_engine(url)),
+        ("tuned", lambda url: create_db_engine(url, EngineProfile()))
+    ]
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:.0f}s per run")
+    print(f"{'engine':<9}{'writes/s':>10}{'write p50':>12}{'write p99':>12}{'failed':>8}{'read p50':>11}{'read p99':>11}")
+    for name, make_engine in profiles:
+        with tempfile.TemporaryDirectory() as tmp:
+            url = args.url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            engine = make_engine(url)
+            session_ids = setup(engine, args.sessions)
+            elapsed, writes, reads, failures = run(engine, session_ids, args)
+            engine.dispose()
+        print(
+            f"{name:<9}{len(writes) / elapsed:>10.0f}"
+            f"{percentile(writes, 50):>10.2f}ms{percentile(writes, 99):>10.2f}ms{failures['write']:>8}"
+            f"{percentile(reads, 50):>9.2f}ms{percentile(reads, 99):>9.2f}ms"
+        )
+
+if __name__ == "__main__":
+    main()
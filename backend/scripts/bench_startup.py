@@ -0,0 +1,138 @@
+"""
+Measures cold start: how long `import app.main` takes, and how long a freshly spawned
+server takes until GET /health first answers 200 (process start, imports, lifespan with
+schema creation on an empty database).
+
+Every run is appended to a JSONL history file together with the git commit, and compared
+with the previous entry, so startup time can be tracked over time. Exits non-zero when a
+metric got slower than the previous run by more than --tolerance.
+
+Usage: python scripts/bench_startup.py [--runs 5] [--history data/startup_history.jsonl] [--tolerance 0.25]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_HISTORY = os.path.join(BACKEND_DIR, "data", "startup_history.jsonl")
+
+# Heavy modules that should only be imported once a model of their provider is used
+PROVIDER_SDKS = ["google.generativeai", "openai"]
+
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "sdks": [m for m in {PROVIDER_SDKS!r} if m in sys.modules]}}))
+"""
+
+def fresh_env(tmp):
+    """
+    Environment for a cold start against an empty database.
+    """
+    env = dict(os.environ)
+    env.pop("APP_SCHEMA_READY", None)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'app.db')}"
+    env["RUNTIME_STATE_PATH"] = os.path.join(tmp, "runtime_state.db")
+    env["PYTHONWARNINGS"] = "ignore"
+    return env
+
+def measure_import():
+    with tempfile.TemporaryDirectory() as tmp:
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR, env=fresh_env(tmp),
+            capture_output=True, text=True, check=True
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def measure_healthy(port, timeout):
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port), "--no-reload", "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=fresh_env(tmp), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            with httpx.Client(timeout=1) as client:
+                while time.perf_counter() - started < timeout:
+                    try:
+                        if client.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                            return time.perf_counter() - started
+                    except httpx.TransportError:
+                        pass
+                    if server.poll() is not None:
+                        raise RuntimeError(f"server exited with code {server.returncode}")
+                    time.sleep(0.01)
+            raise RuntimeError(f"server not healthy after {timeout}s")
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def last_entry(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for /health")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSONL file the results are appended to")
+    parser.add_argument("--no-record", action="store_true", help="Compare with the history without appending")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    healthy = [measure_healthy(args.port, args.timeout) for _ in range(args.runs)]
+    entry = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "runs": args.runs,
+        "import_ms_median": round(statistics.median(r["seconds"] for r in imports) * 1000, 1),
+        "import_ms_min": round(min(r["seconds"] for r in imports) * 1000, 1),
+        "healthy_ms_median": round(statistics.median(healthy) * 1000, 1),
+        "healthy_ms_min": round(min(healthy) * 1000, 1),
+        "sdks_imported_at_startup": sorted({m for r in imports for m in r["sdks"]})
+    }
+
+    print(f"import app.main   median {entry['import_ms_median']:>8.1f}ms  min {entry['import_ms_min']:>8.1f}ms")
+    print(f"first healthy     median {entry['healthy_ms_median']:>8.1f}ms  min {entry['healthy_ms_min']:>8.1f}ms")
+    print(f"provider SDKs imported at startup: {', '.join(entry['sdks_imported_at_startup']) or 'none'}")
+
+    previous = last_entry(args.history)
+    regressed = False
+    if previous:
+        print(f"\n{'metric':<20}{'previous':>10}{'current':>10}{'change':>10}   (previous: {previous.get('commit')} {previous['timestamp']})")
+        for metric in ("import_ms_median", "healthy_ms_median"):
+            change = (entry[metric] - previous[metric]) / previous[metric]
+            worse = change > args.tolerance
+            regressed = regressed or worse
+            print(f"{metric:<20}{previous[metric]:>10}{entry[metric]:>10}{change:>+10.1%}{'  REGRESSION' if worse else ''}")
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
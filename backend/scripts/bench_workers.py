@@ -0,0 +1,59 @@
+"""
+Measures how chat throughput scales with the number of uvicorn workers.
+
+For each worker count, starts the API through the multi-worker launcher (app/server.py)
+with the stub model provider and drives POST /api/chat with scripts/load_test.py
+(closed loop). The stub answers after --stub-latency-ms, so with a low latency the
+request path itself (auth, context packing, routing, persistence) is what saturates
+and extra workers add CPU cores to it. Scaling can only be near-linear up to the number
+of cores, minus what the load generator itself uses.
+
+Usage: python scripts/bench_workers.py --workers 1,2,4 --duration 20 --concurrency 64
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="Comma separated worker counts to compare")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--stub-latency-ms", type=float, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.concurrency} concurrent clients, stub latency {args.stub_latency_ms:.0f}ms")
+    print(f"{'workers':<9}{'req/s':>9}{'scaling':>9}{'p50':>10}{'p99':>10}{'errors':>8}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            output = os.path.join(tmp, f"workers{workers}.json")
+            subprocess.run(
+                [
+                    sys.executable, os.path.join(BACKEND_DIR, "scripts", "load_test.py"),
+                    "--spawn-server", "--workers", str(workers), "--port", str(args.port),
+                    "--model", "local-stub", "--stub-latency-ms", str(args.stub_latency_ms),
+                    "--users", str(args.users), "--concurrency", str(args.concurrency),
+                    "--duration", str(args.duration), "--output", output
+                ],
+                cwd=BACKEND_DIR,
+                check=True,
+                stdout=subprocess.DEVNULL
+            )
+            with open(output, "r", encoding="utf-8") as f:
+                summary = json.load(f)["summary"]
+            baseline = baseline or summary["rps"]
+            print(
+                f"{workers:<9}{summary['rps']:>9.1f}{summary['rps'] / baseline:>8.2f}x"
+                f"{summary['latency_ms_p50']:>8.1f}ms{summary['latency_ms_p99']:>8.1f}ms{summary['error_rate']:>8.1%}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+Load harness for the chat pipeline.
+
+Registers and logs in N synthetic users, then drives POST /api/chat at a fixed concurrency
+(closed loop) or at a fixed arrival rate (open loop, Poisson arrivals) against `local-research`
+or the latency-injecting `local-stub` model. Reports RPS, latency percentiles, error rates and
+database growth, writes a JSON results file and compares it with a stored baseline.
+
+Usage:
+  # Start a server with the stub provider and load it
+  python scripts/load_test.py --spawn-server --model local-stub --stub-latency-ms 300 \
+      --users 50 --requests 2000 --concurrency 50 --output load.json
+
+  # Against a running server, open loop at 40 req/s, failing on a >10% regression
+  python scripts/load_test.py --rate 40 --duration 60 --baseline baseline.json --tolerance 0.10
+
+  # Record the current numbers as the baseline
+  python scripts/load_test.py --spawn-server --save-baseline baseline.json
+"""
+import asyncio
+import argparse
+import itertools
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB_PATH = os.path.join(BACKEND_DIR, "data", "app.db")
+
+# (metric, direction): +1 means higher is better
+BASELINE_METRICS = [
+    ("rps", +1),
+    ("latency_ms_p50", -1),
+    ("latency_ms_p95", -1),
+    ("latency_ms_p99", -1),
+    ("error_rate", -1)
+]
+
+MESSAGES = [
+    "Can you explain what a linked list is?",
+    "Why does the derivative of x^2 equal 2x?",
+    "I don't understand how recursion ends.",
+    "What's the difference between TCP and UDP?",
+    "How do neural networks learn?"
+]
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 2)
+
+def db_snapshot(path):
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(path)
+    try:
+        counts = {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("users", "chat_sessions", "chat_messages")
+        }
+    finally:
+        conn.close()
+    size = os.path.getsize(path)
+    wal = path + "-wal"
+    if os.path.exists(wal):
+        size += os.path.getsize(wal)
+    return {"bytes": size, "rows": counts}
+
+def db_growth(before, after, completed):
+    if not before or not after:
+        return None
+    grown = after["bytes"] - before["bytes"]
+    return {
+        "bytes": grown,
+        "bytes_per_request": round(grown / completed, 1) if completed else None,
+        "rows": {table: after["rows"][table] - before["rows"][table] for table in after["rows"]}
+    }
+
+async def wait_for_server(client, attempts=50):
+    for _ in range(attempts):
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    return False
+
+async def create_user(client, run_tag, index):
+    email = f"load-{run_tag}-{index}@example.com"
+    password = "load-test-password"
+    response = await client.post(
+        "/api/auth/register",
+        json={"email": email, "password": password, "full_name": f"Load User {index}"}
+    )
+    response.raise_for_status()
+    # Log in as well, so the login path is part of the setup cost
+    response = await client.post("/api/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"token": response.json()["access_token"], "session_id": None}
+
+class LoadRun:
+    def __init__(self, client, users, args):
+        self.client = client
+        self.users = users
+        self.args = args
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.sent = 0
+
+    def next_message(self):
+        self.sent += 1
+        message = random.choice(MESSAGES)
+        # Unique by default so the response cache doesn't hide the model/pipeline cost
+        return message if self.args.cacheable else f"{message} (#{self.sent})"
+
+    async def one_request(self, user):
+        payload = {
+            "user_id": "load",
+            "session_id": user["session_id"] or "new",
+            "message": self.next_message(),
+            "context": {"target_agent": self.args.target_agent},
+            "selected_model": self.args.model
+        }
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(
+                "/api/chat",
+                json=payload,
+                headers={"Authorization": f"Bearer {user['token']}"}
+            )
+            self.statuses[response.status_code] += 1
+            if response.status_code == 200:
+                self.latencies.append((time.perf_counter() - started) * 1000)
+                # Keep chatting in the same session, like a real learner
+                user["session_id"] = user["session_id"] or response.headers.get("X-Session-Id")
+            else:
+                self.errors[f"http_{response.status_code}"] += 1
+        except httpx.HTTPError as e:
+            self.statuses["exception"] += 1
+            self.errors[type(e).__name__] += 1
+
+    async def closed_loop(self):
+        """
+        `concurrency` workers, each sending its next request as soon as the previous one returns.
+        Runs for `duration` seconds when given, otherwise until `requests` have been sent.
+        """
+        remaining = itertools.count() if self.args.duration else iter(range(self.args.requests))
+        deadline = time.perf_counter() + self.args.duration if self.args.duration else None
+
+        async def worker(worker_id):
+            user = self.users[worker_id % len(self.users)]
+            for _ in remaining:
+                if deadline and time.perf_counter() > deadline:
+                    return
+                await self.one_request(user)
+
+        await asyncio.gather(*(worker(i) for i in range(self.args.concurrency)))
+
+    async def open_loop(self):
+        """
+        Requests arrive at `rate`/s regardless of how fast earlier ones finish, capped at
+        `concurrency` in flight (excess arrivals are counted as dropped by the client).
+        """
+        in_flight = set()
+        total = self.args.requests if not self.args.duration else int(self.args.rate * self.args.duration)
+        for i in range(total):
+            await asyncio.sleep(random.expovariate(self.args.rate))
+            if len(in_flight) >= self.args.concurrency:
+                self.statuses["client_dropped"] += 1
+                self.errors["client_dropped"] += 1
+                continue
+            task = asyncio.create_task(self.one_request(self.users[i % len(self.users)]))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+def compare_with_baseline(summary, baseline, tolerance):
+    """
+    Returns (rows, regressed) comparing each tracked metric against the baseline summary.
+    """
+    rows, regressed = [], False
+    for metric, direction in BASELINE_METRICS:
+        current, previous = summary.get(metric), baseline.get(metric)
+        if current is None or previous is None:
+            continue
+        if previous == 0:
+            change = 0.0 if current == 0 else float("inf")
+        else:
+            change = (current - previous) / previous
+        # For error_rate an absolute increase is more meaningful than a relative one
+        if metric == "error_rate":
+            worse = current - previous > tolerance * 0.1
+        else:
+            worse = change * direction < -tolerance
+        regressed = regressed or worse
+        rows.append((metric, previous, current, change, worse))
+    return rows, regressed
+
+def server_env(args, data_dir):
+    """
+    Environment for a spawned server. The database and runtime files go to data_dir, so a
+    load run neither fills nor measures the development database.
+    """
+    env = dict(os.environ)
+    env.pop("APP_SCHEMA_READY", None)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(data_dir, 'app.db')}"
+    env.pop("ASYNC_DATABASE_URL", None)
+    env["DATABASE_SHARD_DIR"] = os.path.join(data_dir, "shards")
+    env["RUNTIME_STATE_PATH"] = os.path.join(data_dir, "runtime_state.db")
+    env["USER_CACHE_STAMP_PATH"] = os.path.join(data_dir, "user_cache_stamp.db")
+    env["RESEARCH_LOG_DIR"] = os.path.join(data_dir, "research_logs")
+    env["PERSIST_DEAD_LETTER_PATH"] = os.path.join(data_dir, "persistence_dead_letter.jsonl")
+    env["MODEL_STUB_ENABLED"] = "true"
+    env["MODEL_STUB_LATENCY_MS"] = str(args.stub_latency_ms)
+    env["MODEL_STUB_ERROR_RATE"] = str(args.stub_error_rate)
+    return env
+
+def spawn_server(args, data_dir):
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(args.port),
+            "--workers", str(args.workers), "--no-reload", "--log-level", "warning"
+        ],
+        cwd=BACKEND_DIR,
+        env=server_env(args, data_dir)
+    )
+
+async def main(args):
+    base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+    server, data_dir = None, None
+    if args.spawn_server:
+        data_dir = tempfile.TemporaryDirectory()
+        server = spawn_server(args, data_dir.name)
+    db_path = args.db_path or (os.path.join(data_dir.name, "app.db") if data_dir else DEFAULT_DB_PATH)
+    limits = httpx.Limits(max_connections=args.concurrency + 10, max_keepalive_connections=args.concurrency + 10)
+
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            if not await wait_for_server(client):
+                print(f"Server not reachable at {base_url}")
+                return 2
+
+            run_tag = f"{int(time.time())}-{random.randint(0, 9999)}"
+            setup_started = time.perf_counter()
+            semaphore = asyncio.Semaphore(20)
+
+            async def bounded_user(i):
+                async with semaphore:
+                    return await create_user(client, run_tag, i)
+
+            users = await asyncio.gather(*(bounded_user(i) for i in range(args.users)))
+            setup_s = time.perf_counter() - setup_started
+
+            db_before = db_snapshot(db_path)
+            run = LoadRun(client, users, args)
+            started = time.perf_counter()
+            if args.rate:
+                await run.open_loop()
+            else:
+                await run.closed_loop()
+            elapsed = time.perf_counter() - started
+
+            # Give the write-behind queue time to flush before measuring the database
+            await asyncio.sleep(args.flush_wait)
+            db_after = db_snapshot(db_path)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+        if data_dir:
+            data_dir.cleanup()
+
+    attempted = sum(run.statuses.values())
+    completed = len(run.latencies)
+    summary = {
+        "requests": attempted,
+        "completed": completed,
+        "duration_s": round(elapsed, 2),
+        "rps": round(completed / elapsed, 2) if elapsed else 0.0,
+        "latency_ms_p50": percentile(run.latencies, 50),
+        "latency_ms_p95": percentile(run.latencies, 95),
+        "latency_ms_p99": percentile(run.latencies, 99),
+        "latency_ms_max": round(max(run.latencies), 2) if run.latencies else None,
+        "error_rate": round((attempted - completed) / attempted, 4) if attempted else 0.0,
+        "statuses": {str(k): v for k, v in run.statuses.items()},
+        "errors": dict(run.errors),
+        "user_setup_s": round(setup_s, 2)
+    }
+    results = {
+        "config": {
+            "base_url": base_url,
+            "model": args.model,
+            "target_agent": args.target_agent,
+            "cacheable": args.cacheable,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "requests": args.requests,
+            "duration": args.duration,
+            "stub_latency_ms": args.stub_latency_ms if args.spawn_server else None,
+            "workers": args.workers if args.spawn_server else None
+        },
+        "summary": summary,
+        "db_growth": db_growth(db_before, db_after, completed),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    }
+
+    print(f"requests={attempted} completed={completed} in {elapsed:.1f}s  rps={summary['rps']}")
+    print(f"latency ms p50={summary['latency_ms_p50']} p95={summary['latency_ms_p95']} p99={summary['latency_ms_p99']} max={summary['latency_ms_max']}")
+    print(f"error rate={summary['error_rate']:.2%} statuses={summary['statuses']}")
+    if results["db_growth"]:
+        print(f"db growth={results['db_growth']['bytes']} bytes rows={results['db_growth']['rows']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows, regressed = compare_with_baseline(summary, baseline["summary"], args.tolerance)
+        print(f"\n{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+        for metric, previous, current, change, worse in rows:
+            flag = "  REGRESSION" if worse else ""
+            print(f"{metric:<16}{previous:>12}{current:>12}{change:>+10.1%}{flag}")
+        if regressed:
+            print("FAIL: regression beyond tolerance")
+            return 1
+        print("OK: within tolerance of baseline")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", help="Defaults to http://127.0.0.1:<port>")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--spawn-server", action="store_true", help="Start uvicorn with the stub provider enabled and a temporary database")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for --spawn-server")
+    parser.add_argument("--stub-latency-ms", type=float, default=200)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--model", default="local-research", help="local-research or local-stub (needs MODEL_STUB_ENABLED)")
+    parser.add_argument("--target-agent", default="explanation")
+    parser.add_argument("--cacheable", action="store_true", help="Repeat identical messages so the response cache can serve them")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--duration", type=float, help="Seconds to run (overrides --requests)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rate", type=float, help="Open loop arrival rate (req/s); closed loop when omitted")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--db-path", help="SQLite file to measure (defaults to the spawned server's temporary database, or data/app.db)")
+    parser.add_argument("--flush-wait", type=float, default=0.5)
+    parser.add_argument("--output", help="Write the results JSON here")
+    parser.add_argument("--baseline", help="Compare against this results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--save-baseline", help="Write the results JSON as the new baseline")
+    sys.exit(asyncio.run(main(parser.parse_args())))
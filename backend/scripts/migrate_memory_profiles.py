@@ -0,0 +1,67 @@
+"""
+Moves legacy User.memory_profile JSON blobs into the learner_* tables.
+
+Each blob is applied with the same upserts live memory updates use, merged into whatever
+rows the user already has, and then cleared in the same transaction, so the script can be
+re-run safely (e.g. after a partial run) without replaying old values over newer ones.
+
+Usage: python scripts/migrate_memory_profiles.py [--batch-size 500] [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+# Allow running as `python scripts/migrate_memory_profiles.py` from the backend folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import models
+from app.db.database import SessionLocal, init_db
+from app.services.memory_service import memory_update_statements
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500, help="Users per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the profiles that would be migrated")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    migrated = 0
+    items = 0
+    last_id = 0
+    try:
+        while True:
+            users = db.query(models.User)\
+                .filter(models.User.id > last_id)\
+                .order_by(models.User.id)\
+                .limit(args.batch_size)\
+                .all()
+            if not users:
+                break
+            last_id = users[-1].id
+
+            for user in users:
+                profile = user.memory_profile or {}
+                if not any(profile.values()):
+                    continue
+                migrated += 1
+                items += sum(len(v) if isinstance(v, (list, dict)) else 1 for v in profile.values())
+                if args.dry_run:
+                    continue
+                for statement in memory_update_statements(user.id, profile):
+                    db.execute(statement)
+                user.memory_profile = {}
+
+            if args.dry_run:
+                db.rollback()
+            else:
+                db.commit()
+            print(f"... users up to id {last_id}: {migrated} profiles")
+    finally:
+        db.close()
+
+    action = "Would migrate" if args.dry_run else "Migrated"
+    print(f"{action} {migrated} memory profiles ({items} items)")
+
+if __name__ == "__main__":
+    main()
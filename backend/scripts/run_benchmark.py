@@ -0,0 +1,70 @@
+"""
+Runs the model comparison benchmark and stores the results for /api/research/compare.
+
+Works offline: by default it enables the latency-injecting stub provider and benchmarks
+`local-research` and `local-stub` only, so it can run in CI without API keys.
+Pass --models to benchmark hosted models (needs GEMINI_API_KEY / OPENAI_API_KEY).
+
+Usage: python scripts/run_benchmark.py --models local-research,local-stub --concurrency 4 --repeats 3
+       python scripts/run_benchmark.py --prompt-set prompts.json --no-save --output results.json
+"""
+import asyncio
+import argparse
+import json
+import os
+import sys
+
+# Allow running as `python scripts/run_benchmark.py` from the backend folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MODEL_STUB_ENABLED", "true")
+
+from app.core.model_router import get_model_router
+from app.core.orchestrator import AgentOrchestrator
+from app.db.database import AsyncSessionLocal, init_db
+from app.services.benchmark import BenchmarkRunner, load_prompt_set, run_benchmark
+
+def print_table(results):
+    print(f"{'model':<16}{'req':>5}{'err%':>7}{'ttft p50':>10}{'ttft p95':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'tok/s':>8}")
+    for model_id, s in results["models"].items():
+        def fmt(v):
+            return "-" if v is None else f"{v:.0f}"
+        print(f"{model_id:<16}{s['requests']:>5}{s['error_rate'] * 100:>6.1f}%{fmt(s['ttft_ms_p50']):>10}{fmt(s['ttft_ms_p95']):>10}"
+              f"{fmt(s['latency_ms_p50']):>9}{fmt(s['latency_ms_p95']):>9}{fmt(s['latency_ms_p99']):>9}{fmt(s['output_tokens_per_s']):>8}")
+    print("recommended per agent:", json.dumps(results["recommended"]))
+
+async def main(args):
+    model_router = get_model_router()
+    runner = BenchmarkRunner(
+        model_router,
+        AgentOrchestrator(model_router).agents,
+        concurrency=args.concurrency,
+        repeats=args.repeats
+    )
+    model_ids = [m.strip() for m in args.models.split(",") if m.strip()]
+    prompt_set = load_prompt_set(args.prompt_set) if args.prompt_set else None
+
+    if args.no_save:
+        results = await runner.run(model_ids, prompt_set)
+    else:
+        init_db()
+        run_id = await run_benchmark(runner, AsyncSessionLocal, model_ids, prompt_set)
+        async with AsyncSessionLocal() as db:
+            from app.db import models
+            results = (await db.get(models.BenchmarkRun, run_id)).results
+        print(f"stored benchmark run {run_id}")
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    await model_router.aclose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", default="local-research,local-stub")
+    parser.add_argument("--prompt-set", help="JSON file: {agent: [message | {message, context}]}")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--no-save", action="store_true", help="Don't store the run in the database")
+    parser.add_argument("--output", help="Also write the results JSON here")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,225 @@
+"""
+Maintenance for sharded chat storage (app/db/sharding.py). Run with the app stopped:
+workers cache which shard a user is on.
+
+  status     users, sessions and messages per shard, and unsharded sessions left in the main database
+  migrate    moves chat sessions from the main database into the shards (turning sharding on
+             for existing data); session ids are kept unless the directory already gave them out
+  rebalance  after changing DATABASE_SHARDS, moves every user whose shard differs from
+             user_id % N to that shard
+  move       moves one user to a given shard
+
+A user is copied to the target (messages get new ids there; summaries are remapped to
+them), the directory is switched, and only then are the source rows deleted. A re-run
+after an interruption first clears what a previous run left in the target, so every
+command can simply be repeated.
+
+Usage: DATABASE_SHARDS=4 python scripts/shard_tool.py status|migrate|rebalance [--dry-run]
+       DATABASE_SHARDS=4 python scripts/shard_tool.py move --user 42 --shard 3
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# Allow running as `python scripts/shard_tool.py` from the backend folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, func, select
+from app.db import models
+from app.db.database import SessionLocal, init_db
+from app.db.sharding import shard_router
+
+def copy_sessions(src, dst, sessions, session_ids):
+    """
+    Copies sessions (with their messages and summaries) from src to dst under the given
+    ids (old id -> id in dst). Returns the number of messages copied.
+    """
+    new_ids = list(session_ids.values())
+    # Leftovers of an interrupted run
+    dst.execute(delete(models.SessionSummary).where(models.SessionSummary.session_id.in_(new_ids)))
+    dst.execute(delete(models.ChatMessage).where(models.ChatMessage.session_id.in_(new_ids)))
+    dst.execute(delete(models.ChatSession).where(models.ChatSession.id.in_(new_ids)))
+
+    copied = 0
+    for session in sessions:
+        new_id = session_ids[session.id]
+        dst.add(models.ChatSession(id=new_id, user_id=session.user_id, created_at=session.created_at, title=session.title))
+        messages = src.execute(
+            select(models.ChatMessage).where(models.ChatMessage.session_id == session.id).order_by(models.ChatMessage.id)
+        ).scalars().all()
+        rows = [
+            models.ChatMessage(
+                session_id=new_id,
+                role=m.role,
+                content=m.content,
+                metadata_json=m.metadata_json,
+                timestamp=m.timestamp
+            )
+            for m in messages
+        ]
+        dst.add_all(rows)
+        dst.flush()
+        copied += len(rows)
+
+        summary = src.execute(
+            select(models.SessionSummary).where(models.SessionSummary.session_id == session.id)
+        ).scalars().first()
+        if summary:
+            # Message ids change, so point at the new id of the last covered message
+            covered = [row.id for m, row in zip(messages, rows) if m.id <= summary.covered_until_id]
+            dst.add(models.SessionSummary(
+                session_id=new_id,
+                summary=summary.summary,
+                covered_until_id=covered[-1] if covered else 0,
+                messages_covered=summary.messages_covered,
+                topics=summary.topics,
+                weak_areas=summary.weak_areas,
+                model_id=summary.model_id,
+                updated_at=summary.updated_at
+            ))
+    return copied
+
+def delete_sessions(db, session_ids):
+    db.execute(delete(models.SessionSummary).where(models.SessionSummary.session_id.in_(session_ids)))
+    db.execute(delete(models.ChatMessage).where(models.ChatMessage.session_id.in_(session_ids)))
+    db.execute(delete(models.ChatSession).where(models.ChatSession.id.in_(session_ids)))
+
+def user_shard(directory, user_id):
+    """
+    The user's shard, placing them by the default rule if they have none yet.
+    """
+    entry = directory.get(models.UserShard, user_id)
+    if entry is None:
+        entry = models.UserShard(user_id=user_id, shard=shard_router.default_shard(user_id))
+        directory.add(entry)
+    return entry.shard
+
+def status(args):
+    with SessionLocal() as directory:
+        users = dict(directory.execute(
+            select(models.UserShard.shard, func.count()).group_by(models.UserShard.shard)
+        ).all())
+        unsharded = directory.execute(select(func.count()).select_from(models.ChatSession)).scalar()
+        misplaced = sum(
+            1 for user_id, shard in directory.execute(select(models.UserShard.user_id, models.UserShard.shard)).all()
+            if shard != shard_router.default_shard(user_id)
+        )
+    print(f"{'shard':<7}{'users':>8}{'sessions':>10}{'messages':>10}  url")
+    for shard, factory in enumerate(shard_router.session_factories):
+        with factory() as db:
+            sessions = db.execute(select(func.count()).select_from(models.ChatSession)).scalar()
+            messages = db.execute(select(func.count()).select_from(models.ChatMessage)).scalar()
+        print(f"{shard:<7}{users.get(shard, 0):>8}{sessions:>10}{messages:>10}  {shard_router.urls[shard]}")
+    print(f"Unsharded sessions in the main database: {unsharded}")
+    print(f"Users not on their default shard (moved by rebalance): {misplaced}")
+
+def migrate(args):
+    moved_sessions = moved_messages = 0
+    with SessionLocal() as main_db:
+        user_ids = main_db.execute(select(models.ChatSession.user_id).distinct().order_by(models.ChatSession.user_id)).scalars().all()
+        for user_id in user_ids:
+            sessions = main_db.execute(
+                select(models.ChatSession).where(models.ChatSession.user_id == user_id).order_by(models.ChatSession.id)
+            ).scalars().all()
+            shard = user_shard(main_db, user_id)
+            session_ids = {}
+            for session in sessions:
+                entry = main_db.get(models.ChatSessionDirectory, session.id)
+                if entry is None:
+                    entry = models.ChatSessionDirectory(id=session.id, user_id=user_id, created_at=session.created_at)
+                    main_db.add(entry)
+                elif entry.user_id != user_id:
+                    # Id already handed out to a sharded session of someone else: renumber
+                    entry = models.ChatSessionDirectory(user_id=user_id, created_at=session.created_at)
+                    main_db.add(entry)
+                main_db.flush()
+                session_ids[session.id] = entry.id
+
+            if args.dry_run:
+                main_db.rollback()
+                moved_sessions += len(sessions)
+                print(f"user {user_id}: would move {len(sessions)} sessions to shard {shard}")
+                continue
+            main_db.commit()
+
+            with shard_router.session_factories[shard]() as dst:
+                moved_messages += copy_sessions(main_db, dst, sessions, session_ids)
+                dst.commit()
+            delete_sessions(main_db, list(session_ids))
+            main_db.commit()
+            moved_sessions += len(sessions)
+            print(f"user {user_id}: moved {len(sessions)} sessions to shard {shard}")
+
+    action = "Would migrate" if args.dry_run else "Migrated"
+    print(f"{action} {moved_sessions} sessions ({moved_messages} messages)")
+
+def move_user(user_id, target, dry_run=False):
+    with SessionLocal() as directory:
+        source = user_shard(directory, user_id)
+        if source == target:
+            directory.commit()
+            return 0, 0
+        session_ids = directory.execute(
+            select(models.ChatSessionDirectory.id).where(models.ChatSessionDirectory.user_id == user_id)
+        ).scalars().all()
+        if dry_run:
+            print(f"user {user_id}: would move {len(session_ids)} sessions from shard {source} to {target}")
+            return len(session_ids), 0
+
+        with shard_router.session_factories[source]() as src, shard_router.session_factories[target]() as dst:
+            sessions = src.execute(
+                select(models.ChatSession).where(models.ChatSession.id.in_(session_ids)).order_by(models.ChatSession.id)
+            ).scalars().all()
+            messages = copy_sessions(src, dst, sessions, {s.id: s.id for s in sessions})
+            dst.commit()
+
+            entry = directory.get(models.UserShard, user_id)
+            entry.shard = target
+            entry.updated_at = datetime.utcnow()
+            directory.commit()
+
+            delete_sessions(src, [s.id for s in sessions])
+            src.commit()
+        print(f"user {user_id}: moved {len(sessions)} sessions ({messages} messages) from shard {source} to {target}")
+        return len(sessions), messages
+
+def rebalance(args):
+    with SessionLocal() as directory:
+        placements = directory.execute(select(models.UserShard.user_id, models.UserShard.shard)).all()
+    moves = [
+        (user_id, shard_router.default_shard(user_id))
+        for user_id, shard in placements if shard != shard_router.default_shard(user_id)
+    ]
+    sessions = messages = 0
+    for user_id, target in moves:
+        moved = move_user(user_id, target, args.dry_run)
+        sessions += moved[0]
+        messages += moved[1]
+    action = "Would move" if args.dry_run else "Moved"
+    print(f"{action} {len(moves)} users ({sessions} sessions, {messages} messages)")
+
+def move(args):
+    if not 0 <= args.shard < shard_router.count:
+        sys.exit(f"--shard must be between 0 and {shard_router.count - 1}")
+    move_user(args.user, args.shard, args.dry_run)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["status", "migrate", "rebalance", "move"])
+    parser.add_argument("--user", type=int, help="User to move (move)")
+    parser.add_argument("--shard", type=int, help="Target shard (move)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be moved")
+    args = parser.parse_args()
+
+    if not shard_router.enabled:
+        sys.exit("Sharding is off: set DATABASE_SHARDS or DATABASE_SHARD_URLS")
+    if args.command == "move" and (args.user is None or args.shard is None):
+        sys.exit("move needs --user and --shard")
+
+    init_db()
+    shard_router.init_shards()
+    {"status": status, "migrate": migrate, "rebalance": rebalance, "move": move}[args.command](args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Checks the pooled OpenAI client in ModelRouter against a local stand-in server.
+
+Starts a minimal OpenAI-compatible /v1/chat/completions endpoint (plain JSON and SSE
+streaming), points the router at it through OPENAI_BASE_URL and fires concurrent calls.
+Reports how many TCP connections the server saw: with keep-alive pooling this stays at or
+below the concurrency level instead of growing with the number of requests.
+
+Usage: python scripts/verify_openai_client.py --requests 200 --concurrency 10
+"""
+import asyncio
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Allow running as `python scripts/verify_openai_client.py` from the backend folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive
+    connections = set()
+    requests_seen = []
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        with self.lock:
+            self.connections.add(self.client_address)
+            self.requests_seen.append(body)
+
+        user = next(m["content"] for m in body["messages"] if m["role"] == "user")
+        reply = f"echo: {user}"
+        time.sleep(0.01) # simulated model latency
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for word in reply.split(" "):
+                self._write_chunk(self._sse({"choices": [{"index": 0, "delta": {"content": word + " "}}]}))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        else:
+            payload = json.dumps({
+                "id": "chatcmpl-local",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}]
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    @staticmethod
+    def _sse(chunk: dict) -> bytes:
+        chunk.update({"id": "chatcmpl-local", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4"})
+        return f"data: {json.dumps(chunk)}\n\n".encode()
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+async def main(args):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ["OPENAI_API_KEY"] = "local-test-key"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ["OPENAI_MAX_RETRIES"] = "0"
+
+    from app.core.model_router import ModelRouter
+    router = ModelRouter(cache=None)
+    router.coalesce = False
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i):
+        async with semaphore:
+            return await router.generate_response("gpt-4", "You are a tutor.", f"question {i}", use_cache=False)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    streamed = "".join([c async for c in router.stream_response("gpt-4", "You are a tutor.", "stream me", use_cache=False)])
+    await router.aclose()
+    server.shutdown()
+
+    ok = all(r == f"echo: question {i}" for i, r in enumerate(results))
+    system_sent = all(
+        body["messages"][0] == {"role": "system", "content": "You are a tutor."}
+        for body in StandInHandler.requests_seen
+    )
+    connections = len(StandInHandler.connections)
+
+    print(f"requests:          {args.requests} in {elapsed:.2f}s")
+    print(f"responses correct: {ok}")
+    print(f"system role sent:  {system_sent}")
+    print(f"stream result:     {streamed.strip()!r}")
+    print(f"tcp connections:   {connections} (concurrency {args.concurrency})")
+
+    passed = ok and system_sent and streamed.strip() == "echo: stream me" and connections <= args.concurrency + 1
+    print("PASS" if passed else "FAIL")
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    sys.exit(asyncio.run(main(parser.parse_args())))
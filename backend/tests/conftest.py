@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import uuid
+
+# Everything the app writes goes to a throwaway directory. Set before any app module is
+# imported: engines, caches and workers read their configuration at import time.
+TEST_DIR = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(TEST_DIR, 'app.db')}",
+    "RUNTIME_STATE_PATH": os.path.join(TEST_DIR, "runtime_state.db"),
+    "RESEARCH_LOG_DIR": os.path.join(TEST_DIR, "research_logs"),
+    "PERSIST_DEAD_LETTER_PATH": os.path.join(TEST_DIR, "dead_letter.jsonl"),
+    "MODEL_STUB_ENABLED": "true",
+    "MODEL_STUB_LATENCY_MS": "1",
+    "MODEL_STUB_JITTER_MS": "0",
+    "MODEL_STUB_TTFT_MS": "0",
+    "INTENT_TRAIN_FROM_LOGS": "false",
+    "SESSION_COMPACT_ENABLED": "false",
+    "GEMINI_API_KEY": "",
+    "OPENAI_API_KEY": ""
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    from app.db.database import init_db
+    init_db()
+
+@pytest.fixture
+def user_id():
+    """
+    A new user row, for tests that work below the HTTP layer.
+    """
+    from app.db import models
+    from app.db.database import SessionLocal
+    with SessionLocal() as db:
+        user = models.User(email=f"{uuid.uuid4().hex}@example.com", hashed_password="x", full_name="Test User")
+        db.add(user)
+        db.commit()
+        return user.id
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as c:
+        yield c
+
+def register(client) -> dict:
+    """
+    Registers a fresh user and returns its Authorization header.
+    """
+    email = f"{uuid.uuid4().hex}@example.com"
+    response = client.post("/api/auth/register", json={"email": email, "password": "password123", "full_name": "Test User"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def auth_headers(client):
+    return register(client)
+
+def chat_payload(message: str, **context) -> dict:
+    return {"user_id": "test", "session_id": context.pop("session_id", ""), "message": message, "selected_model": "local-stub", "context": context}
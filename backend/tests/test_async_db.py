@@ -0,0 +1,45 @@
+import pytest
+from conftest import chat_payload, register
+from app.db.database import AsyncSessionLocal
+from app.services.memory_service import AsyncMemoryService
+
+@pytest.mark.anyio
+async def test_async_service_round_trip(user_id):
+    async with AsyncSessionLocal() as db:
+        service = AsyncMemoryService(db)
+        session = await service.create_chat_session(user_id, title="Async")
+        await service.add_chat_message(session.id, "user", "first")
+        await service.add_chat_message(session.id, "assistant", "second")
+
+    async with AsyncSessionLocal() as db:
+        service = AsyncMemoryService(db)
+        assert (await service.get_chat_session(session.id, user_id)).title == "Async"
+        # Sessions are scoped to their owner
+        assert await service.get_chat_session(session.id, user_id + 1000) is None
+        history = await service.get_chat_history(session.id, limit=10)
+        assert [m.content for m in history] == ["first", "second"]
+
+def test_chat_requires_a_valid_token(client):
+    assert client.post("/api/chat", json=chat_payload("hi")).status_code == 401
+    response = client.post("/api/chat", headers={"Authorization": "Bearer not-a-token"}, json=chat_payload("hi"))
+    assert response.status_code == 401
+
+def test_chat_continues_the_returned_session(client, auth_headers):
+    first = client.post("/api/chat", headers=auth_headers, json=chat_payload("What is a graph?", target_agent="explanation"))
+    assert first.status_code == 200
+    session_id = first.headers["X-Session-Id"]
+
+    second = client.post("/api/chat", headers=auth_headers, json=chat_payload("And a tree?", target_agent="explanation", session_id=session_id))
+    assert second.headers["X-Session-Id"] == session_id
+    history = client.get(f"/api/sessions/{session_id}/messages", headers=auth_headers).json()
+    assert [m["role"] for m in history["messages"]] == ["user", "assistant", "user", "assistant"]
+
+def test_other_users_session_is_not_reused(client, auth_headers):
+    first = client.post("/api/chat", headers=auth_headers, json=chat_payload("Mine", target_agent="explanation"))
+    session_id = first.headers["X-Session-Id"]
+
+    other = register(client)
+    assert client.get(f"/api/sessions/{session_id}/messages", headers=other).status_code == 404
+    # Chatting with someone else's session id starts a new session instead
+    response = client.post("/api/chat", headers=other, json=chat_payload("Theirs", target_agent="explanation", session_id=session_id))
+    assert response.headers["X-Session-Id"] != session_id
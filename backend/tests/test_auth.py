@@ -0,0 +1,102 @@
+import asyncio
+import time
+import pytest
+from conftest import register
+from app.core.password_hasher import PasswordHasher
+from app.core.scheduler import SchedulerOverloaded
+from app.core.security import create_access_token, decode_access_token
+from app.core.token_cache import VerifiedTokenCache, token_cache
+
+class SlowContext:
+    """
+    Stands in for passlib's CryptContext; each hash holds a worker for `seconds`.
+    """
+
+    def __init__(self, seconds=0.0):
+        self.seconds = seconds
+
+    def hash(self, password):
+        time.sleep(self.seconds)
+        return "hashed:" + password
+
+    def verify(self, password, hashed_password):
+        time.sleep(self.seconds)
+        return hashed_password == "hashed:" + password
+
+@pytest.mark.anyio
+async def test_hasher_hashes_and_verifies_off_the_loop():
+    hasher = PasswordHasher(SlowContext())
+    hashed = await hasher.hash("secret")
+    assert await hasher.verify("secret", hashed)
+    assert not await hasher.verify("wrong", hashed)
+    assert not await hasher.verify("secret", None)
+    assert hasher.stats()["completed"] == {"hash": 1, "verify": 2}
+
+@pytest.mark.anyio
+async def test_hasher_sheds_when_the_queue_is_full():
+    hasher = PasswordHasher(SlowContext(0.2), max_workers=1, max_waiting=0)
+    running = asyncio.ensure_future(hasher.hash("a"))
+    await asyncio.sleep(0.01)
+    with pytest.raises(SchedulerOverloaded) as excinfo:
+        await hasher.hash("b")
+    assert excinfo.value.reason == "queue full"
+    assert excinfo.value.retry_after >= 1.0
+    await running
+    assert hasher.stats()["rejected"]["queue_full"] == 1
+
+@pytest.mark.anyio
+async def test_hasher_gives_up_after_max_wait():
+    hasher = PasswordHasher(SlowContext(0.2), max_workers=1, max_waiting=4, max_wait=0.01)
+    running = asyncio.ensure_future(hasher.hash("a"))
+    await asyncio.sleep(0.01)
+    with pytest.raises(SchedulerOverloaded) as excinfo:
+        await hasher.hash("b")
+    assert excinfo.value.reason == "wait timeout"
+    await running
+    assert hasher.stats()["waiting"] == 0
+
+def test_token_cache_honors_exp_and_ttl():
+    cache = VerifiedTokenCache(ttl_seconds=60)
+    cache.put("fresh", "a@example.com", time.time() + 30)
+    assert cache.get("fresh") == "a@example.com"
+    # Already expired tokens are never stored
+    cache.put("expired", "a@example.com", time.time() - 1)
+    assert cache.get("expired") is None
+
+    short = VerifiedTokenCache(ttl_seconds=0.05)
+    short.put("token", "a@example.com", time.time() + 3600)
+    time.sleep(0.06)
+    assert short.get("token") is None
+
+def test_token_cache_is_bounded_and_keeps_digests_only():
+    cache = VerifiedTokenCache(max_entries=2)
+    for token in ("t1", "t2", "t3"):
+        cache.put(token, token + "@example.com", None)
+    assert cache.get("t1") is None
+    assert cache.get("t3") == "t3@example.com"
+    assert all(isinstance(key, bytes) and len(key) == 32 for key in cache._entries)
+
+def test_disabled_token_cache_stores_nothing():
+    cache = VerifiedTokenCache(enabled=False)
+    cache.put("token", "a@example.com", None)
+    assert cache.get("token") is None
+    assert cache.stats()["entries"] == 0
+
+def test_verified_tokens_skip_decoding():
+    token = create_access_token({"sub": "cached@example.com"})
+    hits = token_cache.hits
+    assert decode_access_token(token) == "cached@example.com"
+    assert decode_access_token(token) == "cached@example.com"
+    assert token_cache.hits == hits + 1
+
+    with pytest.raises(Exception) as excinfo:
+        decode_access_token(token + "x")
+    assert excinfo.value.status_code == 401
+
+def test_login_goes_through_the_hasher(client):
+    headers = register(client)
+    email = client.get("/api/auth/me", headers=headers).json()["email"]
+    assert client.post("/api/auth/login", data={"username": email, "password": "wrong"}).status_code == 401
+    response = client.post("/api/auth/login", data={"username": email, "password": "password123"})
+    assert response.status_code == 200
+    assert client.get("/api/auth/me", headers={"Authorization": f"Bearer {response.json()['access_token']}"}).json()["email"] == email
@@ -0,0 +1,80 @@
+import time
+import pytest
+from app.core.model_router import ModelRouter
+from app.services.benchmark import BenchmarkRunner, percentile, summarize
+
+PROMPTS = {"explanation": [{"message": "What is a hash table?", "context": {"user_level": "Beginner"}}]}
+
+def sample(total_ms, error=None, ttft_ms=5.0, tokens=50):
+    return {"model_id": "m", "agent": "a", "ttft_ms": ttft_ms, "total_ms": total_ms, "output_tokens": tokens, "error": error}
+
+def test_summarize_percentiles_and_errors():
+    assert percentile([], 50) is None
+    assert percentile(list(range(1, 101)), 95) == 96
+
+    summary = summarize([sample(100), sample(200), sample(300), sample(0, error="boom", ttft_ms=None, tokens=0)])
+    assert summary["requests"] == 4
+    assert summary["errors"] == 1
+    assert summary["error_rate"] == 0.25
+    assert summary["latency_ms_p50"] == 200
+    assert summary["ttft_ms_p50"] == 5.0
+    assert summary["output_tokens_per_s"] > 0
+
+def test_recommend_picks_fastest_reliable_model():
+    agents = {
+        "explanation": {
+            "fast-but-flaky": {"requests": 10, "error_rate": 0.5, "latency_ms_p95": 10},
+            "slow": {"requests": 10, "error_rate": 0.0, "latency_ms_p95": 500},
+            "fast": {"requests": 10, "error_rate": 0.0, "latency_ms_p95": 50}
+        },
+        "diagnosis": {"broken": {"requests": 3, "error_rate": 1.0, "latency_ms_p95": None}}
+    }
+    assert BenchmarkRunner.recommend(agents) == {"explanation": "fast", "diagnosis": None}
+
+@pytest.mark.anyio
+async def test_runner_measures_local_models(client):
+    router = ModelRouter(cache=None)
+    router.stub_error_rate = 0.0
+    runner = BenchmarkRunner(router, client.app.state.services.orchestrator.agents, concurrency=2, repeats=2)
+    # Models without an API key aren't benchmarked by default
+    assert runner.default_models() == ["local-research", "local-stub"]
+
+    results = await runner.run(prompt_set=PROMPTS)
+    for model_id in ("local-research", "local-stub"):
+        summary = results["models"][model_id]
+        assert summary["requests"] == 2
+        assert summary["errors"] == 0
+        assert summary["ttft_ms_p50"] is not None
+        assert summary["output_tokens_per_s"] > 0
+    assert results["recommended"]["explanation"] in ("local-research", "local-stub")
+
+    with pytest.raises(ValueError):
+        runner.build_cases({"no-such-agent": ["hi"]})
+
+@pytest.mark.anyio
+async def test_failed_calls_count_as_errors(client):
+    router = ModelRouter(cache=None)
+    router.stub_error_rate = 1.0
+    runner = BenchmarkRunner(router, client.app.state.services.orchestrator.agents)
+    results = await runner.run(["local-stub"], PROMPTS)
+    assert results["models"]["local-stub"]["error_rate"] == 1.0
+    assert results["errors"][0]["model_id"] == "local-stub"
+
+def test_compare_serves_latest_stored_run(client):
+    response = client.post("/api/research/benchmarks", json={"models": ["local-research"], "prompt_set": PROMPTS})
+    assert response.status_code == 202
+    run_id = response.json()["run_id"]
+
+    deadline = time.monotonic() + 10
+    while client.get(f"/api/research/benchmarks/{run_id}").json()["status"] == "running":
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    run = client.get(f"/api/research/benchmarks/{run_id}").json()
+    assert run["status"] == "completed"
+
+    compare = client.get("/api/research/compare").json()
+    assert compare["run_id"] == run_id
+    assert [row["model"] for row in compare["comparison"]] == ["local-research"]
+    assert compare["comparison"][0]["speed_ms"] == run["results"]["models"]["local-research"]["latency_ms_p50"]
+
+    assert client.post("/api/research/benchmarks", json={"models": ["bogus-model"]}).status_code == 400
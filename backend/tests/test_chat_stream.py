@@ -0,0 +1,45 @@
+import json
+import pytest
+from conftest import chat_payload
+from app.core.model_router import ModelRouter
+
+def parse_sse(text):
+    return [json.loads(line[len("data: "):]) for line in text.splitlines() if line.startswith("data: ")]
+
+def test_sse_stream_sends_tokens_then_done(client, auth_headers):
+    response = client.post("/api/chat/stream", headers=auth_headers, json=chat_payload("What is a stack?", target_agent="explanation"))
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    tokens = [e["content"] for e in events if e["type"] == "token"]
+    assert len(tokens) > 1
+    assert events[-1]["type"] == "done"
+    assert events[-1]["output"]["agent_name"] == "explanation_agent"
+    assert "".join(tokens) in events[-1]["output"]["response"]
+
+def test_ndjson_stream(client, auth_headers):
+    response = client.post("/api/chat/stream?format=ndjson", headers=auth_headers, json=chat_payload("What is a queue?", target_agent="explanation"))
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+    assert events[-1]["type"] == "done"
+    assert all(e["type"] == "token" for e in events[:-1])
+
+def test_unknown_stream_format_is_rejected(client, auth_headers):
+    response = client.post("/api/chat/stream?format=xml", headers=auth_headers, json=chat_payload("hi"))
+    assert response.status_code == 400
+
+def test_streamed_answer_is_persisted(client, auth_headers):
+    response = client.post("/api/chat/stream?format=ndjson", headers=auth_headers, json=chat_payload("Explain heaps", target_agent="explanation"))
+    done = json.loads(response.text.splitlines()[-1])
+    history = client.get(f"/api/sessions/{done['session_id']}/messages", headers=auth_headers).json()
+    assert [m["role"] for m in history["messages"]] == ["user", "assistant"]
+    assert history["messages"][1]["content"] == done["output"]["response"]
+
+@pytest.mark.anyio
+async def test_router_stream_matches_full_response():
+    router = ModelRouter(cache=None)
+    full = await router.generate_response("local-research", "system", "hello")
+    chunks = [c async for c in router.stream_response("local-research", "system", "hello")]
+    assert len(chunks) > 1
+    assert "".join(chunks) == full
@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+from app.agents.explanation import ExplanationAgent
+from app.core.context_builder import ContextBuilder, summarize_memory_profile, truncate_to_tokens
+from app.core.model_router import ModelRouter
+from app.core.scheduler import estimate_tokens
+from app.schemas.base import AgentInput
+
+SYSTEM = "You are a tutor."
+PROFILE = {"topics_learned": ["recursion", "graphs"], "weak_areas": ["pointers"], "progress": {"graphs": 0.5}}
+
+def turns(count, size=40):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i}. " + "x" * size} for i in range(count)]
+
+def test_system_prompt_stays_static():
+    builder = ContextBuilder()
+    packed = builder.pack(8192, SYSTEM, "What is a heap?", history=turns(4), memory_profile=PROFILE, summary="Talked about trees.")
+    assert packed.system_prompt == SYSTEM
+    assert packed.personalized
+    # Memory, summary and history go into the user turn, ahead of the message
+    sections = packed.user_message.split("\n\n")
+    assert sections[0].startswith("Learner profile:\nTopics learned: recursion, graphs")
+    assert sections[1] == "Summary of earlier conversation:\nTalked about trees."
+    assert sections[2].startswith("Recent conversation:\nUser: turn 0.")
+    assert sections[-1] == "Current message:\nWhat is a heap?"
+    assert set(packed.tokens) == {"system", "message", "memory", "history", "summary"}
+
+def test_plain_prompt_is_not_personalized():
+    packed = ContextBuilder().pack(8192, SYSTEM, "What is a heap?")
+    assert (packed.system_prompt, packed.user_message) == (SYSTEM, "What is a heap?")
+    assert not packed.personalized
+
+def test_history_that_does_not_fit_is_summarized():
+    builder = ContextBuilder(reserve_output_tokens=0, safety_margin=1.0)
+    history = turns(40, size=200)
+    packed = builder.pack(2000, SYSTEM, "Next question", history=history)
+    assert packed.tokens_used <= packed.budget
+    assert 0 < packed.turns_included < 40
+    assert packed.turns_included + packed.turns_summarized == 40
+    assert "Summary of earlier conversation:\nUser: turn 0." in packed.user_message
+    # The newest turns are the ones kept verbatim
+    assert "turn 39. " in packed.user_message
+
+def test_oversized_message_is_truncated():
+    packed = ContextBuilder().pack(1000, SYSTEM, "word " * 5000)
+    assert packed.truncated
+    assert packed.tokens_used <= packed.budget
+    assert estimate_tokens(truncate_to_tokens("a" * 1000, 10)) <= 10
+
+def test_memory_summary_keeps_recent_items():
+    text = summarize_memory_profile({"topics_learned": [f"t{i}" for i in range(30)]}, max_items=5)
+    assert text == "Learner profile:\nTopics learned: t25, t26, t27, t28, t29 (+25 earlier)"
+    assert summarize_memory_profile({}) == ""
+
+class SpyRouter(ModelRouter):
+    def __init__(self):
+        super().__init__(cache=None)
+        self.calls = []
+
+    async def generate(self, model_id, system_prompt, user_message, temperature=0.7, use_cache=True, priority=0, coalesce=None):
+        self.calls.append({"system_prompt": system_prompt, "use_cache": use_cache, "coalesce": coalesce})
+        return await super().generate(model_id, system_prompt, user_message, temperature, use_cache, priority, coalesce)
+
+@pytest.mark.anyio
+async def test_personalized_prompts_skip_the_cache_but_coalesce():
+    router = SpyRouter()
+    agent = ExplanationAgent(router)
+
+    def request(**context):
+        return AgentInput(user_id="1", session_id="1", message="What is a heap?", selected_model="local-stub", context=context)
+
+    await agent.process(request())
+    await agent.process(request(memory_profile=PROFILE))
+    await agent.process(request(chat_history=turns(2)))
+    assert [c["use_cache"] for c in router.calls] == [True, False, False]
+    # Duplicate submits of a personalized turn still share one provider call
+    assert [c["coalesce"] for c in router.calls] == [True, True, True]
+    # Same level, same system prompt, whatever the learner's memory
+    assert len({c["system_prompt"] for c in router.calls}) == 1
+
+@pytest.mark.anyio
+async def test_duplicate_personalized_turns_share_one_call():
+    router = ModelRouter(cache=None)
+    calls = []
+    dispatch = router._dispatch
+
+    async def counting_dispatch(*args):
+        calls.append(args[0])
+        return await dispatch(*args)
+
+    router._dispatch = counting_dispatch
+    agent = ExplanationAgent(router)
+    request = AgentInput(user_id="1", session_id="1", message="What is a heap?", selected_model="local-stub", context={"memory_profile": PROFILE})
+    await asyncio.gather(agent.process(request), agent.process(request))
+    assert len(calls) == 1
+
+def test_agents_can_opt_in_to_caching_personalized_prompts():
+    agent = ExplanationAgent(ModelRouter(cache=None))
+    packed = ContextBuilder().pack(8192, SYSTEM, "What is a heap?", memory_profile=PROFILE)
+    assert not agent.cache_enabled(packed)
+    agent.cache_personalized = True
+    assert agent.cache_enabled(packed)
@@ -0,0 +1,39 @@
+import os
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from app.db.database import (
+    SCHEMA_LOCK_PATH, DATABASE_URL, EngineProfile, create_db_engine, schema_lock, schema_lock_path, to_async_url
+)
+
+def test_async_url_is_derived_from_the_sync_one():
+    assert to_async_url("sqlite:///data/app.db") == "sqlite+aiosqlite:///data/app.db"
+    assert to_async_url("postgresql://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+
+def test_sqlite_connections_get_the_pragmas(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'wal.db'}", EngineProfile(busy_timeout_ms=1234))
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+        assert conn.execute(text("PRAGMA query_only")).scalar() == 0
+
+    read_only = create_db_engine(f"sqlite:///{tmp_path / 'wal.db'}", EngineProfile(), read_only=True)
+    with read_only.connect() as conn:
+        assert conn.execute(text("PRAGMA query_only")).scalar() == 1
+
+def test_in_memory_database_takes_no_pool_sizing():
+    kwargs = EngineProfile().engine_kwargs(make_url("sqlite://"))
+    assert "pool_size" not in kwargs
+    assert EngineProfile(pool_size=3).engine_kwargs(make_url("postgresql://db/app"))["pool_size"] == 3
+
+def test_schema_lock_follows_the_database(tmp_path):
+    # The configured database is the test one, so its lock is too
+    assert SCHEMA_LOCK_PATH == os.path.abspath(make_url(DATABASE_URL).database) + ".schema.lock"
+    assert schema_lock_path(f"sqlite:///{tmp_path / 'a.db'}") == str(tmp_path / "a.db") + ".schema.lock"
+    # Non-file databases lock in the temp dir, one file per URL
+    postgres = schema_lock_path("postgresql://u:p@db/app")
+    assert postgres != schema_lock_path("postgresql://u:p@db/other")
+    assert not postgres.startswith(str(tmp_path))
+
+    path = schema_lock_path(f"sqlite:///{tmp_path / 'a.db'}")
+    with schema_lock(path):
+        assert os.path.exists(path)
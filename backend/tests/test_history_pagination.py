@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+import pytest
+from app.db import models
+from app.db.database import AsyncSessionLocal, SessionLocal
+from app.services.memory_service import AsyncMemoryService, decode_history_cursor, encode_history_cursor
+from app.services.persistence_queue import PersistenceQueue
+
+@pytest.fixture
+def session_with_messages(user_id):
+    """
+    25 messages; pairs share a timestamp so the id has to break ties.
+    """
+    start = datetime(2024, 1, 1)
+    with SessionLocal() as db:
+        session = models.ChatSession(user_id=user_id, title="Paging")
+        db.add(session)
+        db.flush()
+        db.add_all([
+            models.ChatMessage(session_id=session.id, role="user", content=f"m{i}", timestamp=start + timedelta(seconds=i // 2))
+            for i in range(25)
+        ])
+        db.commit()
+        return session.id
+
+@pytest.mark.anyio
+async def test_pages_cover_every_message_once_in_order(session_with_messages):
+    pages, before = [], None
+    async with AsyncSessionLocal() as db:
+        service = AsyncMemoryService(db)
+        while True:
+            rows = await service.get_chat_history(session_with_messages, limit=10, before=before)
+            if not rows:
+                break
+            pages.append([r.content for r in rows])
+            before = encode_history_cursor(rows[0])
+
+    assert [len(p) for p in pages] == [10, 10, 5]
+    # Newest page first, chronological within a page
+    assert [m for page in reversed(pages) for m in page] == [f"m{i}" for i in range(25)]
+
+@pytest.mark.anyio
+async def test_after_id_only_returns_newer_messages(session_with_messages):
+    async with AsyncSessionLocal() as db:
+        service = AsyncMemoryService(db)
+        everything = await service.get_chat_history(session_with_messages, limit=100)
+        newer = await service.get_chat_history(session_with_messages, limit=100, after_id=everything[19].id)
+    assert [r.content for r in newer] == [f"m{i}" for i in range(20, 25)]
+
+@pytest.mark.anyio
+async def test_cursor_from_pending_message_survives_its_flush(user_id):
+    queue = PersistenceQueue()
+    async with AsyncSessionLocal() as db:
+        service = AsyncMemoryService(db, write_queue=queue)
+        session = await service.create_chat_session(user_id)
+        for content in ("one", "two", "three"):
+            await service.add_chat_message(session.id, "user", content)
+
+        page = await service.get_chat_history(session.id, limit=2)
+        assert [r.content for r in page] == ["two", "three"]
+        before = encode_history_cursor(page[0])
+        # "two" gets its row id between the two page loads
+        await queue.flush()
+        older = await service.get_chat_history(session.id, limit=2, before=before)
+    assert [r.content for r in older] == ["one"]
+
+def test_cursor_round_trip_and_rejects_garbage():
+    row = models.ChatMessage(id=7, timestamp=datetime(2024, 5, 1, 12, 30))
+    assert decode_history_cursor(encode_history_cursor(row)) == (datetime(2024, 5, 1, 12, 30), 7)
+    with pytest.raises(ValueError):
+        decode_history_cursor("not-a-cursor")
+
+def test_endpoint_pages_and_rejects_bad_cursor(client, auth_headers):
+    from conftest import chat_payload
+    session_id = client.post("/api/chat", headers=auth_headers, json=chat_payload("one", target_agent="explanation")).headers["X-Session-Id"]
+    client.post("/api/chat", headers=auth_headers, json=chat_payload("two", target_agent="explanation", session_id=session_id))
+
+    page = client.get(f"/api/sessions/{session_id}/messages?limit=3", headers=auth_headers).json()
+    assert len(page["messages"]) == 3 and page["next_cursor"]
+    older = client.get(f"/api/sessions/{session_id}/messages?limit=3&before={page['next_cursor']}", headers=auth_headers).json()
+    assert [m["content"] for m in older["messages"]] == ["one"]
+    assert older["next_cursor"] is None
+
+    assert client.get(f"/api/sessions/{session_id}/messages?before=garbage", headers=auth_headers).status_code == 400
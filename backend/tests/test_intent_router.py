@@ -0,0 +1,84 @@
+import time
+import pytest
+from conftest import chat_payload
+from app.core.intent_router import INTENTS, IntentRouter, load_logged_examples
+from app.core.model_router import ModelRouter
+from app.core.routing_policy import ModelResult
+from app.db.database import SessionLocal
+from app.services.persistence_queue import persistence_queue
+
+class AnsweringRouter(ModelRouter):
+    """
+    Answers every call with a fixed text, as if from `answered_by`.
+    """
+
+    def __init__(self, text, answered_by=None):
+        super().__init__(cache=None)
+        self.text, self.answered_by = text, answered_by
+        self.calls = 0
+
+    async def generate(self, model_id, system_prompt, user_message, temperature=0.7, use_cache=True, priority=0):
+        self.calls += 1
+        return ModelResult(text=self.text, model_id=self.answered_by or model_id, requested_model=model_id)
+
+@pytest.mark.parametrize("message, intent", [
+    ("Can you explain what a linked list is?", "explanation"),
+    ("Quiz me on graph theory", "diagnosis"),
+    ("Give me a hint, don't tell me the answer", "socratic"),
+    ("This is too hard, can we slow down?", "adaptation")
+])
+def test_classifier_routes_clear_messages(message, intent):
+    decision = IntentRouter().classify(message)
+    assert decision.intent == intent
+    assert decision.source == "classifier"
+    assert set(decision.scores) == set(INTENTS)
+
+def test_llm_fallback_is_opt_in(monkeypatch):
+    monkeypatch.delenv("INTENT_FALLBACK_MODEL", raising=False)
+    assert IntentRouter.from_env().fallback_model is None
+    monkeypatch.setenv("INTENT_FALLBACK_MODEL", "gpt-4")
+    assert IntentRouter.from_env().fallback_model == "gpt-4"
+
+@pytest.mark.anyio
+async def test_confident_messages_skip_the_llm():
+    router = AnsweringRouter("socratic")
+    intents = IntentRouter(fallback_model="gpt-4", model_router=router)
+    decision = await intents.route("Explain how photosynthesis works")
+    assert decision.source == "classifier"
+    assert router.calls == 0
+
+@pytest.mark.anyio
+async def test_low_confidence_uses_the_fallback_answer():
+    intents = IntentRouter(fallback_model="gpt-4", model_router=AnsweringRouter("Socratic."), min_confidence=1.1)
+    decision = await intents.route("hmm")
+    assert (decision.intent, decision.source) == ("socratic", "llm")
+    assert intents.stats()["llm_fallbacks"] == 1
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("text, answered_by", [
+    # Served by another model of the fallback chain
+    ("socratic", "gemini-pro"),
+    # Canned text of a local stand-in that quotes the message
+    ("[Local Model] Analysis: Processed 'socratic explanation please'", "local-research"),
+    # Not a one-word classification
+    ("I would say this is about explanation", None)
+])
+async def test_unusable_fallback_answers_are_ignored(text, answered_by):
+    intents = IntentRouter(fallback_model="gpt-4", model_router=AnsweringRouter(text, answered_by), min_confidence=1.1)
+    decision = await intents.route("socratic explanation please")
+    assert decision.source == "classifier"
+    assert intents.stats()["llm_ignored"] == 1
+
+def test_auto_routed_turns_are_not_training_data(client, auth_headers):
+    explicit = "Trees are graphs without cycles, right?"
+    client.post("/api/chat", headers=auth_headers, json=chat_payload(explicit, target_agent="diagnosis"))
+    response = client.post("/api/chat", headers=auth_headers, json=chat_payload("Tell me about heaps in detail"))
+    assert response.json()["metadata"]["intent"]["source"] == "classifier"
+
+    # Wait for the write-behind worker to store both turns
+    deadline = time.monotonic() + 5
+    while persistence_queue.pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    examples = load_logged_examples(SessionLocal)
+    assert (explicit, "diagnosis") in examples
+    assert not any(message == "Tell me about heaps in detail" for message, _ in examples)
@@ -0,0 +1,55 @@
+import asyncio
+import time
+import pytest
+from types import SimpleNamespace
+from scripts.load_test import LoadRun, compare_with_baseline, server_env
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def post(self, path, json=None, headers=None):
+        self.calls += 1
+        await asyncio.sleep(0.001)
+        return SimpleNamespace(status_code=200, headers={"X-Session-Id": "1"})
+
+def load_args(**overrides):
+    args = dict(requests=5, duration=None, concurrency=2, rate=None, cacheable=False, target_agent="explanation", model="local-stub")
+    args.update(overrides)
+    return SimpleNamespace(**args)
+
+def users():
+    return [{"token": "t", "session_id": None}]
+
+@pytest.mark.anyio
+async def test_closed_loop_sends_requested_count():
+    client = FakeClient()
+    run = LoadRun(client, users(), load_args())
+    await run.closed_loop()
+    assert client.calls == 5
+    assert run.statuses[200] == 5
+
+@pytest.mark.anyio
+async def test_closed_loop_runs_for_duration():
+    client = FakeClient()
+    run = LoadRun(client, users(), load_args(duration=0.2))
+    started = time.perf_counter()
+    await run.closed_loop()
+    # --duration overrides --requests
+    assert time.perf_counter() - started >= 0.2
+    assert client.calls > 5
+
+def test_spawned_server_uses_its_own_database(tmp_path):
+    env = server_env(SimpleNamespace(stub_latency_ms=5, stub_error_rate=0), str(tmp_path))
+    assert env["DATABASE_URL"] == f"sqlite:///{tmp_path / 'app.db'}"
+    for key in ("RUNTIME_STATE_PATH", "USER_CACHE_STAMP_PATH", "RESEARCH_LOG_DIR", "DATABASE_SHARD_DIR"):
+        assert env[key].startswith(str(tmp_path))
+    assert "APP_SCHEMA_READY" not in env
+
+def test_baseline_comparison_flags_regressions():
+    baseline = {"rps": 100, "latency_ms_p50": 10, "latency_ms_p95": 20, "latency_ms_p99": 30, "error_rate": 0.0}
+    _, regressed = compare_with_baseline(dict(baseline, rps=95), baseline, 0.10)
+    assert not regressed
+    rows, regressed = compare_with_baseline(dict(baseline, latency_ms_p95=30), baseline, 0.10)
+    assert regressed
+    assert [row[0] for row in rows if row[4]] == ["latency_ms_p95"]
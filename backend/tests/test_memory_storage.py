@@ -0,0 +1,73 @@
+import sys
+import threading
+from app.db import models
+from app.db.database import SessionLocal
+from app.services.memory_service import MemoryService, memory_update_statements, merge_memory_profile
+
+def update(user_id, data):
+    with SessionLocal() as db:
+        MemoryService(db).update_user_memory(user_id, data)
+
+def profile(user_id):
+    with SessionLocal() as db:
+        return MemoryService(db).get_user_memory(user_id)
+
+def test_updates_render_the_legacy_profile_shape(user_id):
+    update(user_id, {"topics_learned": ["recursion", "graphs"], "progress": {"recursion": 0.4}, "level": "Beginner"})
+    update(user_id, {"topics_learned": ["graphs", "heaps"], "weak_areas": "pointers", "progress": {"recursion": 0.9, "heaps": 0.1}})
+    assert profile(user_id) == {
+        # First-learned order, no duplicates
+        "topics_learned": ["recursion", "graphs", "heaps"],
+        "weak_areas": ["pointers"],
+        "progress": {"recursion": 0.9, "heaps": 0.1},
+        "level": "Beginner"
+    }
+
+def test_pending_update_merge_matches_the_tables():
+    current = {"topics_learned": ["a"], "weak_areas": [], "progress": {"a": 1}}
+    merged = merge_memory_profile(current, {"topics_learned": ["b", "a"], "progress": {"b": 2}, "level": "x"})
+    assert merged == {"topics_learned": ["a", "b"], "weak_areas": [], "progress": {"a": 1, "b": 2}, "level": "x"}
+    assert current["topics_learned"] == ["a"]
+
+def test_write_cost_does_not_grow_with_the_profile(user_id):
+    update(user_id, {"topics_learned": [f"topic-{i}" for i in range(300)]})
+    # One statement per updated field, touching only the named rows
+    assert len(memory_update_statements(user_id, {"topics_learned": ["new"], "progress": {"new": 1}})) == 2
+    update(user_id, {"topics_learned": ["new"]})
+    topics = profile(user_id)["topics_learned"]
+    assert len(topics) == 301
+    assert topics[-1] == "new"
+
+def test_concurrent_updates_keep_each_other(user_id):
+    threads = [threading.Thread(target=update, args=(user_id, {"topics_learned": [f"t{i}"], "progress": {f"t{i}": i}})) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result = profile(user_id)
+    assert sorted(result["topics_learned"]) == sorted(f"t{i}" for i in range(8))
+    assert len(result["progress"]) == 8
+
+def test_migration_moves_legacy_blobs(user_id, monkeypatch):
+    from scripts import migrate_memory_profiles
+    with SessionLocal() as db:
+        user = db.get(models.User, user_id)
+        user.memory_profile = {"topics_learned": ["sets", "maps"], "progress": {"sets": 0.5}}
+        db.commit()
+    update(user_id, {"topics_learned": ["maps", "trees"]})
+
+    monkeypatch.setattr(sys, "argv", ["migrate_memory_profiles.py"])
+    migrate_memory_profiles.main()
+    # Re-running is a no-op
+    migrate_memory_profiles.main()
+
+    with SessionLocal() as db:
+        assert db.get(models.User, user_id).memory_profile == {}
+    result = profile(user_id)
+    assert result["topics_learned"] == ["maps", "trees", "sets"]
+    assert result["progress"] == {"sets": 0.5}
+
+def test_profile_endpoint_shows_memory(client, auth_headers):
+    me = client.get("/api/profile", headers=auth_headers).json()
+    update(me["user_id"], {"topics_learned": ["queues"]})
+    assert client.get("/api/profile", headers=auth_headers).json()["memory_profile"]["topics_learned"] == ["queues"]
@@ -0,0 +1,90 @@
+import json
+import pytest
+from conftest import chat_payload
+from app.core.scheduler import SchedulerOverloaded
+from app.db import models
+from app.db.database import AsyncSessionLocal, SessionLocal
+from app.services.memory_service import AsyncMemoryService, MemoryService
+from app.services.persistence_queue import PersistenceQueue, persistence_queue
+
+@pytest.fixture
+def chat_session(user_id):
+    with SessionLocal() as db:
+        session = models.ChatSession(user_id=user_id, title="Queue")
+        db.add(session)
+        db.commit()
+        return session.id
+
+@pytest.mark.anyio
+async def test_pending_messages_are_read_back_before_and_after_flush(chat_session):
+    queue = PersistenceQueue()
+    async with AsyncSessionLocal() as db:
+        service = AsyncMemoryService(db, write_queue=queue)
+        await service.add_chat_message(chat_session, "user", "queued")
+        assert [m.content for m in await service.get_chat_history(chat_session)] == ["queued"]
+
+        await queue.flush()
+        history = await service.get_chat_history(chat_session)
+    assert [m.content for m in history] == ["queued"]
+    assert history[0].id is not None
+    assert queue.stats()["pending_messages"] == 0
+
+def test_sync_memory_read_merges_pending_updates(user_id):
+    queue = PersistenceQueue()
+    queue.update_user_memory(user_id, {"topics_learned": ["recursion"]})
+    with SessionLocal() as db:
+        assert MemoryService(db).get_user_memory(user_id)["topics_learned"] == []
+        assert MemoryService(db, write_queue=queue).get_user_memory(user_id)["topics_learned"] == ["recursion"]
+
+def test_full_queue_sheds_writes():
+    queue = PersistenceQueue(max_pending=2)
+    queue.add_chat_message(1, "user", "a")
+    queue.update_user_memory(1, {"topics_learned": ["b"]})
+    with pytest.raises(SchedulerOverloaded):
+        queue.add_chat_message(1, "user", "c")
+    assert queue.stats()["shed"] == 1
+
+def test_chat_returns_503_when_the_queue_is_full(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(persistence_queue, "max_pending", 0)
+    response = client.post("/api/chat", headers=auth_headers, json=chat_payload("hi", target_agent="explanation"))
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+@pytest.mark.anyio
+async def test_bad_entry_is_isolated_then_dead_lettered(chat_session, tmp_path, monkeypatch):
+    dead_letter = tmp_path / "dead.jsonl"
+    queue = PersistenceQueue(max_attempts=3, dead_letter_path=str(dead_letter))
+    original = PersistenceQueue._commit_messages
+
+    async def reject_poison(db, messages):
+        if any(m.content == "poison" for m in messages):
+            raise RuntimeError("cannot store this row")
+        await original(db, messages)
+
+    monkeypatch.setattr(PersistenceQueue, "_commit_messages", staticmethod(reject_poison))
+    queue.add_chat_message(chat_session, "user", "before")
+    queue.add_chat_message(chat_session, "user", "poison")
+    queue.add_chat_message(chat_session, "user", "after")
+
+    await queue.flush()
+    # The good writes got through around the bad one
+    assert [m.content for m in queue._messages] == ["poison"]
+    assert queue.stats()["consecutive_failures"] == 1
+
+    await queue.flush()
+    await queue.flush()
+    stats = queue.stats()
+    assert stats["pending_messages"] == 0
+    assert stats["dead_letters"] == 1
+    assert stats["failed_flushes"] == 3
+
+    records = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+    assert [(r["kind"], r["content"], r["attempts"]) for r in records] == [("message", "poison", 3)]
+    async with AsyncSessionLocal() as db:
+        history = await AsyncMemoryService(db).get_chat_history(chat_session)
+    assert [m.content for m in history] == ["before", "after"]
+
+    # Healthy again once the bad entry is gone
+    queue.add_chat_message(chat_session, "user", "later")
+    await queue.flush()
+    assert queue.stats()["consecutive_failures"] == 0
@@ -0,0 +1,83 @@
+import asyncio
+import time
+import pytest
+from conftest import chat_payload
+from app.agents.base import BaseAgent
+from app.core.pipeline import PipelineExecutor
+from app.schemas.base import AgentInput, AgentOutput
+
+class FakeAgent(BaseAgent):
+    def __init__(self, name, inputs=(), outputs=(), delay=0.0, fail=False):
+        super().__init__(model_router=None)
+        self.name, self.inputs, self.outputs = name, inputs, outputs
+        self.delay, self.fail = delay, fail
+        self.seen_context = None
+
+    async def process(self, input_data: AgentInput) -> AgentOutput:
+        self.seen_context = dict(input_data.context)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} broke")
+        return AgentOutput(response=f"{self.name} answer", agent_name=self.name)
+
+def make_input():
+    return AgentInput(user_id="1", session_id="1", message="hi", context={"target_agent": "pipeline", "topic": "graphs"})
+
+def test_dependencies_follow_inputs_and_outputs():
+    executor = PipelineExecutor({
+        "a": FakeAgent("a", outputs=("x",)),
+        "b": FakeAgent("b", inputs=("x",), outputs=("y",)),
+        "c": FakeAgent("c", inputs=("x", "y")),
+        "d": FakeAgent("d", inputs=("unproduced",))
+    })
+    assert executor.resolve_dependencies(["a", "b", "c", "d"]) == {"a": [], "b": ["a"], "c": ["a", "b"], "d": []}
+    # Only producers inside the pipeline count
+    assert executor.resolve_dependencies(["b", "c"]) == {"b": [], "c": ["b"]}
+
+def test_unknown_steps_and_cycles_are_rejected():
+    executor = PipelineExecutor({
+        "a": FakeAgent("a", inputs=("y",), outputs=("x",)),
+        "b": FakeAgent("b", inputs=("x",), outputs=("y",))
+    })
+    with pytest.raises(ValueError, match="Unknown"):
+        executor.resolve_dependencies(["a", "missing"])
+    with pytest.raises(ValueError, match="cycle"):
+        executor.resolve_dependencies(["a", "b"])
+
+@pytest.mark.anyio
+async def test_independent_steps_run_concurrently_and_outputs_flow():
+    agents = {
+        "first": FakeAgent("first", outputs=("x",), delay=0.1),
+        "second": FakeAgent("second", delay=0.1),
+        "third": FakeAgent("third", inputs=("x",))
+    }
+    started = time.perf_counter()
+    output = await PipelineExecutor(agents).run(make_input(), ["first", "second", "third"])
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.18 # first and second overlapped
+    assert agents["third"].seen_context["x"] == "first answer"
+    assert agents["third"].seen_context["topic"] == "graphs"
+    assert "target_agent" not in agents["third"].seen_context
+    steps = output.metadata["pipeline"]["steps"]
+    assert steps["third"]["depends_on"] == ["first"]
+    assert steps["third"]["started_ms"] >= steps["first"]["duration_ms"] - 5
+
+@pytest.mark.anyio
+async def test_failed_step_is_recorded_and_dependents_still_run():
+    agents = {
+        "broken": FakeAgent("broken", outputs=("x",), fail=True),
+        "after": FakeAgent("after", inputs=("x",))
+    }
+    output = await PipelineExecutor(agents).run(make_input(), ["broken", "after"])
+    steps = output.metadata["pipeline"]["steps"]
+    assert steps["broken"]["error"] == "broken broke"
+    assert steps["after"]["response"] == "after answer"
+    assert "x" not in agents["after"].seen_context
+
+def test_pipeline_through_the_chat_endpoint(client, auth_headers):
+    response = client.post("/api/chat", headers=auth_headers, json=chat_payload("Teach me sorting", target_agent="pipeline"))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["agent_name"] == "pipeline"
+    assert set(body["metadata"]["pipeline"]["steps"]) == {"diagnosis", "memory", "explanation", "socratic", "adaptation"}
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+import pytest
+from app.core.model_router import ModelRouter, get_model_router
+from scripts.verify_openai_client import StandInHandler
+
+def test_shared_router_is_a_singleton():
+    assert get_model_router() is get_model_router()
+
+@pytest.mark.anyio
+async def test_gemini_models_are_reused_per_system_prompt(monkeypatch):
+    created = []
+
+    class FakeModel:
+        def __init__(self, model_name, system_instruction):
+            created.append((model_name, system_instruction))
+
+    router = ModelRouter(cache=None)
+    router._genai = SimpleNamespace(GenerativeModel=FakeModel)
+    router._gemini_models_max = 2
+
+    first = await router._get_gemini_model("gemini-pro", "tutor")
+    assert await router._get_gemini_model("gemini-pro", "tutor") is first
+    await router._get_gemini_model("gemini-pro", "critic")
+    await router._get_gemini_model("gemini-pro", "coach") # evicts "tutor"
+    assert await router._get_gemini_model("gemini-pro", "tutor") is not first
+    assert len(created) == 4
+
+@pytest.fixture
+def stand_in_server(monkeypatch):
+    StandInHandler.connections = set()
+    StandInHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setenv("OPENAI_MAX_RETRIES", "0")
+    yield server
+    server.shutdown()
+
+@pytest.mark.anyio
+async def test_openai_calls_share_one_pooled_client(stand_in_server):
+    router = ModelRouter(cache=None)
+    router.coalesce = False
+    clients = await asyncio.gather(*(router._get_openai_client() for _ in range(5)))
+    assert all(c is clients[0] for c in clients)
+
+    results = []
+    for batch in range(4):
+        results += await asyncio.gather(*(router.generate_response("gpt-4", "You are a tutor.", f"q{batch * 5 + i}") for i in range(5)))
+    streamed = "".join([c async for c in router.stream_response("gpt-4", "You are a tutor.", "stream me", use_cache=False)])
+    await router.aclose()
+
+    assert results == [f"echo: q{i}" for i in range(20)]
+    assert streamed.strip() == "echo: stream me"
+    assert all(body["messages"][0] == {"role": "system", "content": "You are a tutor."} for body in StandInHandler.requests_seen)
+    # Keep-alive: later batches reuse the first batch's connections
+    assert len(StandInHandler.connections) <= 6
+    assert router._openai_client is None
@@ -0,0 +1,93 @@
+import json
+import os
+import pytest
+from datetime import datetime
+from app.services.research_log import ResearchLog, decode_log_cursor, encode_log_cursor, research_log
+
+@pytest.mark.anyio
+async def test_events_are_flushed_and_queried(tmp_path):
+    log = ResearchLog(directory=str(tmp_path))
+    first = log.append("chat", {"n": 1}, user_id=1)
+    log.append("intent", {"n": 2}, user_id=2)
+    log.append("chat", {"n": 3}, user_id=2)
+    assert datetime.fromisoformat(first["timestamp"]).timestamp() == pytest.approx(first["ts"])
+
+    # Pending events are visible before the flush
+    assert [e["data"]["n"] for e in log.query()] == [1, 2, 3]
+    await log.flush()
+    assert log.buffered == 0
+    assert log.stats()["segments"] == 1
+
+    # A new instance (another process or a restart) reads the same segments
+    reopened = ResearchLog(directory=str(tmp_path))
+    assert [e["data"]["n"] for e in reopened.query()] == [1, 2, 3]
+    assert [e["data"]["n"] for e in reopened.query(event_type="chat")] == [1, 3]
+    assert [e["data"]["n"] for e in reopened.query(user_id="2")] == [2, 3]
+    assert list(reopened.query(since=first["ts"] + 3600)) == []
+
+@pytest.mark.anyio
+async def test_cursor_pagination(tmp_path):
+    log = ResearchLog(directory=str(tmp_path))
+    for n in range(5):
+        log.append("chat", {"n": n})
+    await log.flush()
+    log.append("chat", {"n": 5}) # still pending
+
+    pages, cursor = [], None
+    while True:
+        page = list(log.query(cursor=cursor, limit=2))
+        if not page:
+            break
+        pages.append([e["data"]["n"] for e in page])
+        cursor = encode_log_cursor(page[-1])
+    assert pages == [[0, 1], [2, 3], [4, 5]]
+    with pytest.raises(ValueError):
+        decode_log_cursor("not-a-cursor")
+
+def test_ring_buffer_drops_oldest(tmp_path):
+    log = ResearchLog(directory=str(tmp_path), buffer_size=3)
+    for n in range(5):
+        log.append("chat", {"n": n})
+    assert log.buffered == 3
+    assert log.dropped == 2
+    assert [e["data"]["n"] for e in log.query()] == [2, 3, 4]
+
+@pytest.mark.anyio
+async def test_segments_rotate_and_retention_removes_old_ones(tmp_path):
+    log = ResearchLog(directory=str(tmp_path), segment_max_bytes=1, retention_bytes=10 ** 9)
+    for n in range(3):
+        log.append("chat", {"n": n})
+        await log.flush()
+    segments = log._segments()
+    assert len(segments) == 3
+
+    # Expired segments go, the one being written stays
+    for path in segments:
+        os.utime(path, (0, 0))
+    log.retention_seconds = 60
+    log.append("chat", {"n": 3})
+    await log.flush()
+    assert log._segments() == [log._segment_path]
+    assert log.segments_deleted == 3
+
+    log.retention_seconds = 10 ** 9
+    log.retention_bytes = 0
+    log.append("chat", {"n": 4})
+    await log.flush()
+    assert len(log._segments()) == 1
+
+def test_logs_endpoint_filters_and_streams(client):
+    research_log.append("endpoint-test", {"n": 1}, user_id="42")
+    research_log.append("endpoint-test", {"n": 2}, user_id="43")
+
+    page = client.get("/api/research/logs", params={"type": "endpoint-test", "limit": 1}).json()
+    assert [e["data"]["n"] for e in page["logs"]] == [1]
+    rest = client.get("/api/research/logs", params={"type": "endpoint-test", "cursor": page["next_cursor"]}).json()
+    assert [e["data"]["n"] for e in rest["logs"]] == [2]
+    assert rest["next_cursor"] is None
+
+    lines = client.get("/api/research/logs", params={"type": "endpoint-test", "user_id": "43", "format": "ndjson"}).text.splitlines()
+    assert [json.loads(line).get("data", {}).get("n") for line in lines[:-1]] == [2]
+    assert json.loads(lines[-1]) == {"next_cursor": None}
+
+    assert client.get("/api/research/logs", params={"cursor": "bogus"}).status_code == 400
@@ -0,0 +1,81 @@
+import pytest
+from app.core import response_cache
+from app.core.response_cache import LRUTTLCache, ResponseCache
+from app.core.model_router import ModelRouter
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUTTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1" # a is now the most recent
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.evictions == 1
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, "monotonic", clock)
+    cache = LRUTTLCache(max_entries=10, ttl_seconds=5)
+    cache.set("a", "1")
+    clock.now += 4
+    assert cache.get("a") == "1"
+    clock.now += 2
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+def test_key_ignores_surrounding_whitespace_only():
+    key = ResponseCache.make_key("m", "You are a tutor.", "What is entropy?", 0.2)
+    assert key == ResponseCache.make_key("m", " You are a tutor.\n", "What is entropy?\n\n", 0.2)
+    # Indentation changes what a program does
+    nested = "for x in xs:\n    if x:\n        f(x)\n    g(x)"
+    flat = "for x in xs:\n    if x:\n        f(x)\n        g(x)"
+    assert ResponseCache.make_key("m", "You are a tutor.", nested, 0.2) != ResponseCache.make_key("m", "You are a tutor.", flat, 0.2)
+    assert key != ResponseCache.make_key("m", "You are a tutor.", "What is entropy?", 0.3)
+    assert key != ResponseCache.make_key("other", "You are a tutor.", "What is entropy?", 0.2)
+
+@pytest.mark.anyio
+async def test_disk_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = ResponseCache(disk_path=path)
+    await first.set("k", "stored")
+
+    second = ResponseCache(disk_path=path)
+    assert await second.get("k") == "stored"
+    assert second.disk_hits == 1
+    # Promoted into the memory tier
+    assert second.memory.get("k") == "stored"
+
+@pytest.mark.anyio
+async def test_router_serves_repeated_calls_from_cache():
+    router = ModelRouter(cache=ResponseCache())
+    calls = []
+    original = router._dispatch
+
+    async def counting(*args):
+        calls.append(args)
+        return await original(*args)
+
+    router._dispatch = counting
+    first = await router.generate("local-stub", "system", "same question", temperature=0.2)
+    second = await router.generate("local-stub", "system", "same question", temperature=0.2)
+    assert len(calls) == 1
+    assert not first.cached and second.cached
+    assert second.text == first.text
+
+    # Above max_temperature the cache is bypassed
+    await router.generate("local-stub", "system", "same question", temperature=0.9)
+    await router.generate("local-stub", "system", "same question", temperature=0.9)
+    assert len(calls) == 3
+    # use_cache=False also bypasses it
+    await router.generate("local-stub", "system", "same question", temperature=0.2, use_cache=False)
+    assert len(calls) == 4
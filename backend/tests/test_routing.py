@@ -0,0 +1,134 @@
+import asyncio
+import json
+import uuid
+import pytest
+from conftest import chat_payload
+from app.core.model_router import ModelRouter, get_model_router
+from app.core.routing_policy import LatencyStats, ProviderError, RoutingPolicy
+
+class FlakyRouter(ModelRouter):
+    """
+    Hosted models answer from a script instead of calling the provider.
+    """
+
+    def __init__(self, failing=(), delays=None, **kwargs):
+        super().__init__(cache=None, **kwargs)
+        self.gemini_key = self.openai_key = "test-key"
+        self.failing = set(failing)
+        self.delays = delays or {}
+        self.calls = []
+
+    async def _dispatch(self, model_id, system_prompt, user_message, temperature):
+        self.calls.append(model_id)
+        await asyncio.sleep(self.delays.get(model_id, 0))
+        if model_id in self.failing:
+            raise ProviderError(model_id, "scripted failure")
+        return f"{model_id} answer"
+
+def policy(**kwargs):
+    return RoutingPolicy(fallback_chain=["gemini-pro", "gpt-4", "local-research"], **kwargs)
+
+def test_error_rate_decays_while_idle():
+    stats = LatencyStats(half_life=10)
+    for _ in range(10):
+        stats.record(ok=False)
+    assert stats.error_rate > 0.8
+    stats._updated -= 20
+    assert stats.error_rate == pytest.approx(stats._error_rate / 4)
+
+def test_unhealthy_model_is_tried_last_then_recovers():
+    routing = policy(unhealthy_error_rate=0.5, error_half_life_seconds=10)
+    for _ in range(5):
+        routing.record("gemini-pro", ok=False)
+    assert routing.candidates("gemini-pro") == ["gpt-4", "local-research", "gemini-pro"]
+
+    # Left alone for a while, the model gets traffic again
+    routing.models["gemini-pro"]._updated -= 30
+    assert routing.candidates("gemini-pro")[0] == "gemini-pro"
+    routing.record("gemini-pro", ok=True)
+    assert routing.is_healthy("gemini-pro")
+
+@pytest.mark.anyio
+async def test_failure_falls_back_to_the_next_hosted_model():
+    router = FlakyRouter(failing={"gemini-pro"}, routing=policy())
+    result = await router.generate("gemini-pro", "system", "hello")
+    assert result.model_id == "gpt-4"
+    assert result.fell_back
+    assert result.attempts[0]["model_id"] == "gemini-pro"
+    assert router.routing.fallbacks == 1
+
+@pytest.mark.anyio
+async def test_local_model_is_not_a_fallback():
+    router = FlakyRouter(failing={"gemini-pro", "gpt-4"}, routing=policy())
+    with pytest.raises(ProviderError):
+        await router.generate("gemini-pro", "system", "hello")
+    assert "local-research" not in router.calls
+    # Asked for by name it still answers
+    assert (await router.generate("local-research", "system", "hello")).model_id == "local-research"
+
+@pytest.mark.anyio
+async def test_models_without_api_key_are_unavailable():
+    router = ModelRouter(cache=None, routing=policy())
+    router.gemini_key = router.openai_key = None
+    assert not router.is_configured("gemini-pro")
+    with pytest.raises(ProviderError, match="no API key"):
+        await router.generate("gemini-pro", "system", "hello")
+    with pytest.raises(ProviderError):
+        [chunk async for chunk in router.stream_response("gpt-4", "system", "hello")]
+
+    # With only OpenAI configured, Gemini requests are served by gpt-4
+    router = FlakyRouter(routing=policy())
+    router.gemini_key = None
+    result = await router.generate("gemini-pro", "system", "hello")
+    assert result.model_id == "gpt-4"
+    assert router.calls == ["gpt-4"]
+
+@pytest.mark.anyio
+async def test_stream_falls_back_before_first_chunk():
+    router = FlakyRouter(failing={"gemini-pro"}, routing=policy())
+
+    async def failing_stream(model_id, *args):
+        if model_id in router.failing:
+            raise ProviderError(model_id, "scripted failure")
+        yield f"{model_id} "
+        yield "answer"
+
+    router._open_stream = failing_stream
+    route = {}
+    chunks = [chunk async for chunk in router.stream_response("gemini-pro", "system", "hello", route=route)]
+    assert "".join(chunks) == "gpt-4 answer"
+    assert route["model_id"] == "gpt-4"
+    assert route["routing"]["fallback"]
+
+@pytest.mark.anyio
+async def test_slow_call_is_hedged():
+    routing = policy(hedge_enabled=True, hedge_min_samples=3)
+    for _ in range(3):
+        routing.record("gemini-pro", ok=True, latency_ms=10)
+    router = FlakyRouter(delays={"gemini-pro": 1.0}, routing=routing)
+    result = await router.generate("gemini-pro", "system", "hello")
+    assert result.model_id == "gpt-4"
+    assert result.hedged
+    assert routing.hedges_sent == 1
+    assert routing.hedges_won == 1
+
+def test_chat_without_configured_model_is_unavailable(client, auth_headers):
+    # No API keys in the test environment, and gemini-pro is the default model
+    payload = {**chat_payload("What is a heap?", target_agent="explanation"), "selected_model": None}
+    for path in ("/api/chat", "/api/chat/stream"):
+        response = client.post(path, headers=auth_headers, json=payload)
+        assert response.status_code == 503
+        assert "API key" not in response.json()["detail"]
+
+def test_failing_provider_is_a_bad_gateway(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(get_model_router(), "stub_error_rate", 1.0)
+    # A fresh message, so no cached answer hides the failure
+    message = f"What is a trie? {uuid.uuid4().hex}"
+    response = client.post("/api/chat", headers=auth_headers, json=chat_payload(message, target_agent="explanation"))
+    assert response.status_code == 502
+    assert "Stub Error" not in response.json()["detail"]
+
+    response = client.post("/api/chat/stream", headers=auth_headers, json=chat_payload(message, target_agent="explanation"))
+    last = json.loads(response.text.strip().splitlines()[-1][len("data: "):])
+    assert last["type"] == "error"
+    assert "Stub Error" not in last["content"]
@@ -0,0 +1,65 @@
+import threading
+from conftest import chat_payload
+from app.services.runtime_state import RuntimeState, runtime_state
+
+def two_workers(tmp_path):
+    path = str(tmp_path / "state.db")
+    worker_a = RuntimeState(path, check_interval=0)
+    worker_b = RuntimeState(path, check_interval=0)
+    # Separate processes in production; tell their rows apart by writer id (set on connect)
+    worker_b._connection()
+    worker_b.writer = worker_a.writer + "-b"
+    return worker_a, worker_b
+
+def test_flags_reach_other_workers(tmp_path):
+    worker_a, worker_b = two_workers(tmp_path)
+    assert worker_b.get_flag("research_mode", False) is False
+    worker_a.set_flag("research_mode", True)
+    assert worker_b.get_flag("research_mode", False) is True
+    assert worker_b.reloads >= 1
+
+def test_counters_add_up_across_workers(tmp_path):
+    worker_a, worker_b = two_workers(tmp_path)
+    worker_a.incr("chat_turns", 2)
+    worker_b.incr("chat_turns")
+    # Unflushed increments count for the worker holding them only
+    assert worker_a.counters() == {"chat_turns": 2}
+    worker_a.flush()
+    worker_b.flush()
+    assert worker_a.counters() == {"chat_turns": 3}
+    assert len(worker_a.workers()) == 2
+
+def test_loop_side_calls_never_wait_for_a_write(tmp_path):
+    worker_a, worker_b = two_workers(tmp_path)
+    worker_a.set_flag("research_mode", True)
+    # A flush stuck on a contended commit holds the write connection
+    with worker_b._conn_lock:
+        done = threading.Event()
+
+        def loop_side():
+            worker_b.incr("chat_turns")
+            worker_b.get_flag("research_mode")
+            done.set()
+
+        threading.Thread(target=loop_side).start()
+        assert done.wait(1)
+    assert worker_b.get_flag("research_mode") is True
+    worker_b.flush()
+    assert worker_a.counters() == {"chat_turns": 1}
+
+def test_metrics_read_the_shared_state_off_the_event_loop(client, auth_headers, monkeypatch):
+    client.post("/api/chat", headers=auth_headers, json=chat_payload("What is a queue?", target_agent="explanation"))
+    threads = []
+    counters = runtime_state.counters
+
+    def recording_counters():
+        threads.append(threading.current_thread())
+        return counters()
+
+    monkeypatch.setattr(runtime_state, "counters", recording_counters)
+    text = client.get("/metrics").text
+    assert 'app_events_total{name="chat_turns"}' in text
+    assert "app_workers " in text
+    # The handler runs on the event loop thread; the SQLite reads must not
+    loop_thread = client.portal.call(threading.current_thread)
+    assert threads and all(thread is not loop_thread for thread in threads)
@@ -0,0 +1,129 @@
+import asyncio
+import pytest
+from conftest import chat_payload
+from app.core.scheduler import (
+    Limits, LimitGroup, RequestScheduler, SchedulerOverloaded, TokenBucket,
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, resolve_priority
+)
+
+async def hold(scheduler, release, order, name, priority=PRIORITY_INTERACTIVE, tokens=1):
+    async with scheduler.slot("google", "gemini-pro", tokens=tokens, priority=priority):
+        order.append(name)
+        await release.wait()
+
+def test_resolve_priority():
+    assert resolve_priority(None) == PRIORITY_INTERACTIVE
+    assert resolve_priority("batch") == PRIORITY_BATCH
+    assert resolve_priority("5") == 5
+    assert resolve_priority("unknown") == PRIORITY_INTERACTIVE
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(60)
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0, abs=0.05)
+    bucket._updated -= 2
+    assert bucket.wait_time(1) == 0.0
+    # Reconciling actual usage may overdraw the bucket
+    bucket.adjust(100)
+    assert bucket.level < 0
+
+@pytest.mark.anyio
+async def test_in_flight_limit_queues_and_admits_by_priority():
+    scheduler = RequestScheduler({"google": Limits(max_in_flight=1)})
+    release, order = asyncio.Event(), []
+    first = asyncio.create_task(hold(scheduler, release, order, "first"))
+    await asyncio.sleep(0)
+    batch = asyncio.create_task(hold(scheduler, release, order, "batch", PRIORITY_BATCH))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(hold(scheduler, release, order, "interactive"))
+    await asyncio.sleep(0)
+
+    stats = scheduler.stats()["provider:google"]
+    assert stats["in_flight"] == 1
+    assert stats["queue_depth"] == 2
+
+    release.set()
+    await asyncio.gather(first, batch, interactive)
+    # The interactive call was queued later but goes ahead of the batch job
+    assert order == ["first", "interactive", "batch"]
+    stats = scheduler.stats()["provider:google"]
+    assert stats["in_flight"] == 0
+    assert stats["admitted"] == 3
+    assert stats["peak_queue_depth"] == 2
+
+@pytest.mark.anyio
+async def test_full_queue_sheds_with_retry_after():
+    scheduler = RequestScheduler({"google": Limits(max_in_flight=1, max_queue=1)})
+    release, order = asyncio.Event(), []
+    running = asyncio.create_task(hold(scheduler, release, order, "running"))
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(hold(scheduler, release, order, "queued"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(SchedulerOverloaded) as shed:
+        scheduler.ensure_capacity("google", "gemini-pro")
+    assert shed.value.retry_after >= 1
+    with pytest.raises(SchedulerOverloaded):
+        await hold(scheduler, release, order, "shed")
+    assert scheduler.stats()["provider:google"]["shed"] == 2
+
+    release.set()
+    await asyncio.gather(running, queued)
+    scheduler.ensure_capacity("google", "gemini-pro")
+
+@pytest.mark.anyio
+async def test_queue_wait_times_out():
+    scheduler = RequestScheduler({"google": Limits(max_in_flight=1, max_wait_seconds=0.05)})
+    release, order = asyncio.Event(), []
+    running = asyncio.create_task(hold(scheduler, release, order, "running"))
+    await asyncio.sleep(0)
+    with pytest.raises(SchedulerOverloaded) as timed_out:
+        await hold(scheduler, release, order, "waiting")
+    assert timed_out.value.reason == "queue wait timed out"
+    stats = scheduler.stats()["provider:google"]
+    assert stats["timed_out"] == 1
+    assert stats["queue_depth"] == 0
+    release.set()
+    await running
+
+@pytest.mark.anyio
+async def test_tokens_per_minute_budget_delays_calls():
+    # 60000 tokens/min refills 1000 tokens per second
+    scheduler = RequestScheduler({"google": Limits(tokens_per_minute=60000)})
+    release, order = asyncio.Event(), []
+    release.set()
+    await hold(scheduler, release, order, "large", tokens=60000)
+    started = asyncio.get_running_loop().time()
+    await hold(scheduler, release, order, "small", tokens=100)
+    assert asyncio.get_running_loop().time() - started >= 0.05
+    assert order == ["large", "small"]
+
+@pytest.mark.anyio
+async def test_model_limits_apply_on_top_of_provider_limits():
+    scheduler = RequestScheduler({"google": Limits(max_in_flight=8)}, {"gemini-pro": Limits(max_in_flight=1, max_queue=0)})
+    release, order = asyncio.Event(), []
+    running = asyncio.create_task(hold(scheduler, release, order, "running"))
+    await asyncio.sleep(0)
+    with pytest.raises(SchedulerOverloaded) as shed:
+        scheduler.ensure_capacity("google", "gemini-pro")
+    assert shed.value.limit_name == "model:gemini-pro"
+    # Other models of the provider are unaffected
+    scheduler.ensure_capacity("google", "gemini-flash")
+    release.set()
+    await running
+
+def test_saturated_provider_answers_503(client, auth_headers):
+    scheduler = client.app.state.services.model_router.scheduler
+    group = LimitGroup("provider:local", Limits(max_in_flight=1, max_queue=0))
+    group.in_flight = 1
+    previous = scheduler.groups.get("provider:local")
+    scheduler.groups["provider:local"] = group
+    try:
+        response = client.post("/api/chat/stream", headers=auth_headers, json=chat_payload("hello"))
+    finally:
+        if previous is None:
+            scheduler.groups.pop("provider:local")
+        else:
+            scheduler.groups["provider:local"] = previous
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
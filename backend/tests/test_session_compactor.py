@@ -0,0 +1,83 @@
+import json
+import pytest
+from types import SimpleNamespace
+from app.db import models
+from app.db.database import SessionLocal
+from app.services.persistence_queue import persistence_queue
+from app.services.session_compactor import SessionCompactor, parse_summary_response
+
+class ScriptedRouter:
+    def __init__(self, text):
+        self.text = text
+        self.calls = []
+
+    async def generate(self, model_id, system_prompt, user_message, **kwargs):
+        self.calls.append({"user_message": user_message, **kwargs})
+        return SimpleNamespace(text=self.text, model_id=model_id)
+
+def make_session(user_id, messages):
+    with SessionLocal() as db:
+        session = models.ChatSession(user_id=user_id, title="long")
+        db.add(session)
+        db.commit()
+        for i in range(messages):
+            db.add(models.ChatMessage(session_id=session.id, role="user" if i % 2 == 0 else "assistant", content=f"Message {i}. More text."))
+        db.commit()
+        return session.id
+
+def summary_of(session_id):
+    with SessionLocal() as db:
+        return db.query(models.SessionSummary).filter_by(session_id=session_id).first()
+
+def test_parse_summary_response():
+    parsed = parse_summary_response('```json\n{"summary": "Covered trees.", "topics": ["trees"], "weak_areas": []}\n```')
+    assert parsed == {"summary": "Covered trees.", "topics": ["trees"], "weak_areas": []}
+    assert parse_summary_response("[Local Model] Analysis: ...") is None
+    assert parse_summary_response('{"summary": ""}') is None
+
+@pytest.mark.anyio
+async def test_long_session_is_compacted(user_id):
+    session_id = make_session(user_id, 25)
+    answer = json.dumps({"summary": "Learner asked about trees.", "topics": ["trees"], "weak_areas": ["pointers"]})
+    router = ScriptedRouter(answer)
+    compactor = SessionCompactor(model_router=router, model_id="local-stub", threshold=20, keep_recent=5, max_batch=60)
+
+    assert await compactor.compact(session_id)
+    summary = summary_of(session_id)
+    assert summary.summary == "Learner asked about trees."
+    assert summary.messages_covered == 20
+    assert summary.model_id == "local-stub"
+    assert router.calls[0]["use_cache"] is False
+    assert {"topics_learned": ["trees"], "weak_areas": ["pointers"]} in persistence_queue.pending_memory_updates(user_id)
+
+    # Only the five newest messages are uncovered now
+    assert not await compactor.compact(session_id)
+    assert compactor.stats()["messages_compacted"] == 20
+
+@pytest.mark.anyio
+async def test_backlog_is_compacted_in_batches(user_id):
+    session_id = make_session(user_id, 40)
+    router = ScriptedRouter(json.dumps({"summary": "Rolling.", "topics": []}))
+    compactor = SessionCompactor(model_router=router, threshold=10, keep_recent=5, max_batch=15)
+    passes = 0
+    while await compactor.compact(session_id):
+        passes += 1
+    assert passes == 2
+    assert summary_of(session_id).messages_covered == 30
+    # The second pass builds on the first summary
+    assert router.calls[1]["user_message"].startswith("Current summary:\nRolling.")
+
+@pytest.mark.anyio
+async def test_unusable_answer_falls_back_to_extractive_summary(user_id):
+    session_id = make_session(user_id, 12)
+    compactor = SessionCompactor(model_router=ScriptedRouter("not json"), threshold=10, keep_recent=2)
+    assert await compactor.compact(session_id)
+    summary = summary_of(session_id)
+    assert summary.summary.startswith("User: Message 0.")
+    assert summary.model_id is None
+    assert compactor.fallback_summaries == 1
+
+def test_disabled_compactor_ignores_notifications():
+    compactor = SessionCompactor(enabled=False)
+    compactor.notify(1)
+    assert compactor.stats()["pending_sessions"] == 0
@@ -0,0 +1,147 @@
+import pytest
+from types import SimpleNamespace
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from app.db import models
+from app.db.database import Base, SessionLocal, create_async_db_engine, create_db_engine, to_async_url
+from app.db.sharding import ShardRouter, shard_urls_from_env
+from app.services import memory_service
+from app.services.memory_service import AsyncMemoryService
+from scripts import shard_tool
+
+@pytest.fixture
+def shards(tmp_path, monkeypatch):
+    """
+    Two SQLite shards in a temp dir, installed as the router the services use.
+    """
+    router = ShardRouter([f"sqlite:///{tmp_path / f'shard_{i}.db'}" for i in range(2)])
+    router.init_shards()
+    monkeypatch.setattr(memory_service, "shard_router", router)
+    monkeypatch.setattr(shard_tool, "shard_router", router)
+    yield router
+    for engine in router.engines:
+        engine.dispose()
+
+def count_sessions(factory, user_id):
+    with factory() as db:
+        return db.execute(select(func.count()).select_from(models.ChatSession).where(models.ChatSession.user_id == user_id)).scalar()
+
+def test_shard_urls_from_env(monkeypatch, tmp_path):
+    monkeypatch.delenv("DATABASE_SHARD_URLS", raising=False)
+    monkeypatch.delenv("DATABASE_SHARDS", raising=False)
+    assert shard_urls_from_env() == []
+    monkeypatch.setenv("DATABASE_SHARDS", "2")
+    monkeypatch.setenv("DATABASE_SHARD_DIR", str(tmp_path))
+    assert shard_urls_from_env()[1] == f"sqlite:///{tmp_path / 'shard_1.db'}"
+    monkeypatch.setenv("DATABASE_SHARD_URLS", "sqlite:///a.db, sqlite:///b.db")
+    assert shard_urls_from_env() == ["sqlite:///a.db", "sqlite:///b.db"]
+
+@pytest.mark.anyio
+async def test_users_are_placed_once_and_cached(shards, user_id):
+    try:
+        assert await shards.shard_for_user(user_id) == user_id % 2
+        lookups = shards.directory_lookups
+        assert await shards.shard_for_user(user_id) == user_id % 2
+        assert shards.directory_lookups == lookups
+
+        # The placement is stored, so another worker agrees
+        shards.forget()
+        assert await shards.shard_for_user(user_id) == user_id % 2
+        assert await shards.shard_for_session(10 ** 9) is None
+    finally:
+        await shards.dispose()
+
+@pytest.mark.anyio
+async def test_chat_data_lives_in_the_users_shard(shards, user_id):
+    try:
+        service = AsyncMemoryService()
+        session = await service.create_chat_session(user_id, title="Sharded")
+        other = await service.create_chat_session(user_id)
+        assert other.id != session.id
+        await service.add_chat_message(session.id, "user", "hello shard")
+
+        shard = user_id % 2
+        assert count_sessions(shards.session_factories[shard], user_id) == 2
+        assert count_sessions(shards.session_factories[1 - shard], user_id) == 0
+        assert count_sessions(SessionLocal, user_id) == 0
+
+        # A session id alone resolves to its shard through the directory
+        shards.forget()
+        history = await service.get_chat_history(session.id)
+        assert [m.content for m in history] == ["hello shard"]
+        groups = await shards.group_by_shard([SimpleNamespace(session_id=session.id), SimpleNamespace(session_id=10 ** 9)])
+        assert set(groups) == {shard, None}
+        assert shards.stats()["sessions_allocated"] == 2
+    finally:
+        await shards.dispose()
+
+@pytest.mark.anyio
+async def test_unsharded_sessions_keep_their_ids(tmp_path, monkeypatch):
+    # A main database with sessions 1..3 from before sharding was turned on
+    url = f"sqlite:///{tmp_path / 'main.db'}"
+    engine = create_db_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([models.ChatSession(user_id=1, title="before sharding") for _ in range(3)])
+        db.commit()
+        db.add(models.ChatMessage(session_id=1, role="user", content="old message"))
+        db.commit()
+    async_engine = create_async_db_engine(to_async_url(url))
+    main_factory = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    router = ShardRouter([f"sqlite:///{tmp_path / f'shard_{i}.db'}" for i in range(2)], directory_factory=main_factory)
+    router.init_shards()
+    monkeypatch.setattr(memory_service, "shard_router", router)
+
+    try:
+        async with main_factory() as db:
+            service = AsyncMemoryService(db)
+            new = await service.create_chat_session(2)
+            assert new.id == 4
+
+            # The old session is still served from the main database, and only to its owner
+            assert (await service.get_chat_session(1, 1)).title == "before sharding"
+            assert await service.get_chat_session(1, 2) is None
+            assert (await service.get_chat_session(4, 2)).id == 4
+            history = await service.get_chat_history(1)
+            assert [m.content for m in history] == ["old message"]
+    finally:
+        await router.dispose()
+        await async_engine.dispose()
+        engine.dispose()
+
+def test_shard_tool_migrates_and_moves_users(shards, tmp_path, monkeypatch):
+    # The tool works on the whole main database, so give it one of its own
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'main.db'}")
+    Base.metadata.create_all(bind=engine)
+    main_factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(shard_tool, "SessionLocal", main_factory)
+    user_id = 3
+
+    with main_factory() as db:
+        session = models.ChatSession(user_id=user_id, title="old")
+        db.add(session)
+        db.commit()
+        first = models.ChatMessage(session_id=session.id, role="user", content="first")
+        db.add_all([first, models.ChatMessage(session_id=session.id, role="assistant", content="second")])
+        db.commit()
+        db.add(models.SessionSummary(session_id=session.id, summary="s", covered_until_id=first.id, messages_covered=1))
+        db.commit()
+        session_id = session.id
+
+    shard_tool.migrate(SimpleNamespace(dry_run=False))
+    source = user_id % 2
+    assert count_sessions(main_factory, user_id) == 0
+    with shards.session_factories[source]() as db:
+        messages = db.execute(select(models.ChatMessage).where(models.ChatMessage.session_id == session_id)).scalars().all()
+        summary = db.execute(select(models.SessionSummary).where(models.SessionSummary.session_id == session_id)).scalars().one()
+    assert [m.content for m in messages] == ["first", "second"]
+    # The summary points at the first message's new id
+    assert summary.covered_until_id == messages[0].id
+
+    assert shard_tool.move_user(user_id, 1 - source) == (1, 2)
+    assert count_sessions(shards.session_factories[source], user_id) == 0
+    assert count_sessions(shards.session_factories[1 - source], user_id) == 1
+    with main_factory() as db:
+        assert db.get(models.UserShard, user_id).shard == 1 - source
+    engine.dispose()
@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from app.core.model_router import ModelRouter
+from app.core.single_flight import SingleFlight
+
+class Work:
+    def __init__(self, result="done", error=None):
+        self.calls = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+        self.result, self.error = result, error
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.result
+
+@pytest.mark.anyio
+async def test_concurrent_calls_share_one_execution():
+    flight, work = SingleFlight(), Work()
+    waiters = [asyncio.create_task(flight.do("k", work)) for _ in range(5)]
+    await asyncio.sleep(0)
+    work.release.set()
+    assert await asyncio.gather(*waiters) == ["done"] * 5
+    assert work.calls == 1
+    assert flight.stats()["coalesced_calls"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+    # A later call starts fresh
+    work.release = asyncio.Event()
+    later = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0)
+    work.release.set()
+    await later
+    assert work.calls == 2
+
+@pytest.mark.anyio
+async def test_errors_reach_every_waiter():
+    flight, work = SingleFlight(), Work(error=RuntimeError("provider down"))
+    waiters = [asyncio.create_task(flight.do("k", work)) for _ in range(3)]
+    await asyncio.sleep(0)
+    work.release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert work.calls == 1
+
+@pytest.mark.anyio
+async def test_cancelling_one_waiter_keeps_the_call_for_the_others():
+    flight, work = SingleFlight(), Work()
+    first = asyncio.create_task(flight.do("k", work))
+    second = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    work.release.set()
+    assert await second == "done"
+    assert not work.cancelled
+    assert first.cancelled()
+
+@pytest.mark.anyio
+async def test_call_is_cancelled_when_every_waiter_leaves():
+    flight, work = SingleFlight(), Work()
+    waiters = [asyncio.create_task(flight.do("k", work)) for _ in range(2)]
+    await asyncio.sleep(0)
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert work.cancelled
+    assert flight.stats()["abandoned_calls"] == 1
+    assert flight.stats()["in_flight"] == 0
+
+@pytest.mark.anyio
+async def test_router_coalesces_identical_in_flight_calls():
+    router = ModelRouter(cache=None)
+    calls = []
+    original = router._dispatch
+
+    async def counting(*args):
+        calls.append(args)
+        await asyncio.sleep(0.02)
+        return await original(*args)
+
+    router._dispatch = counting
+    results = await asyncio.gather(*(router.generate_response("local-stub", "system", "same") for _ in range(4)))
+    assert len(calls) == 1
+    assert len(set(results)) == 1
+    # Agents that opt out of caching aren't coalesced either
+    await asyncio.gather(*(router.generate_response("local-stub", "system", "same", use_cache=False) for _ in range(2)))
+    assert len(calls) == 3
@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from app.core.speculation import SpeculativeExecutor
+from app.schemas.base import AgentInput, AgentOutput
+
+class SlowAgent:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay, self.fail = delay, fail
+        self.calls = []
+
+    async def process(self, input_data):
+        self.calls.append(input_data)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("speculative step broke")
+        return AgentOutput(response="What do you think happens next?", agent_name="socratic_agent")
+
+def turn(message="What is a stack?", session_id="s1", **context):
+    return AgentInput(user_id="1", session_id=session_id, message=message, context=context)
+
+EXPLANATION = AgentOutput(response="A stack is LIFO.", agent_name="explanation_agent", next_action="check_understanding")
+
+@pytest.mark.anyio
+async def test_announced_step_is_precomputed_and_served():
+    agent = SlowAgent()
+    executor = SpeculativeExecutor({"socratic": agent}, enabled=True)
+    assert executor.maybe_launch(turn(chat_history=[{"role": "user", "content": "hi"}]), EXPLANATION)
+    await asyncio.sleep(0.01)
+
+    step_input = agent.calls[0]
+    assert step_input.context["priority"] == "batch"
+    assert step_input.context["chat_history"][-1] == {"role": "assistant", "content": "A stack is LIFO."}
+
+    output = await executor.take(turn("ok", next_action="check_understanding"))
+    assert output.agent_name == "socratic_agent"
+    assert output.metadata["speculative"]["ready"] is True
+    assert executor.stats()["hits"] == 1
+    assert executor.stats()["hit_rate"] == 1.0
+
+@pytest.mark.anyio
+async def test_running_step_is_awaited_not_restarted():
+    agent = SlowAgent(delay=0.05)
+    executor = SpeculativeExecutor({"socratic": agent}, enabled=True)
+    executor.maybe_launch(turn(), EXPLANATION)
+    output = await executor.take(turn(target_agent="socratic"))
+    assert output.metadata["speculative"]["ready"] is False
+    assert len(agent.calls) == 1
+    assert executor.hits_in_flight == 1
+
+@pytest.mark.anyio
+async def test_other_request_cancels_the_step():
+    agent = SlowAgent(delay=1.0)
+    executor = SpeculativeExecutor({"socratic": agent}, enabled=True)
+    executor.maybe_launch(turn(), EXPLANATION)
+    task = executor._steps["s1"].task
+    assert await executor.take(turn("Something else entirely")) is None
+    await asyncio.sleep(0)
+    assert task.cancelled()
+    assert executor.stats()["discarded"] == 1
+    # Unspent budget was handed back
+    assert executor.budget.wait_time(executor.budget.capacity) == pytest.approx(0, abs=0.1)
+
+@pytest.mark.anyio
+async def test_speculation_is_off_by_default_and_capped():
+    agent = SlowAgent(delay=1.0)
+    assert not SpeculativeExecutor({"socratic": agent}).maybe_launch(turn(), EXPLANATION)
+
+    executor = SpeculativeExecutor({"socratic": agent}, enabled=True, max_in_flight=1)
+    assert executor.maybe_launch(turn(session_id="a"), EXPLANATION)
+    assert not executor.maybe_launch(turn(session_id="b"), EXPLANATION)
+    assert executor.skipped_budget == 1
+
+    # Per-request opt-in, and only for side-effect free steps
+    opted_in = SpeculativeExecutor({"socratic": agent})
+    assert opted_in.maybe_launch(turn(session_id="c", speculate=True), EXPLANATION)
+    memory_step = AgentOutput(response="saved", agent_name="memory_agent", next_action="update_memory")
+    assert not opted_in.maybe_launch(turn(session_id="d", speculate=True), memory_step)
+
+    executor.cancel_all()
+    opted_in.cancel_all()
+
+@pytest.mark.anyio
+async def test_failed_step_falls_back_to_a_normal_run():
+    executor = SpeculativeExecutor({"socratic": SlowAgent(fail=True)}, enabled=True)
+    executor.maybe_launch(turn(), EXPLANATION)
+    await asyncio.sleep(0.01)
+    assert await executor.take(turn(next_action="check_understanding")) is None
+    assert executor.failed == 1
+
+@pytest.mark.anyio
+async def test_expired_result_is_not_served():
+    executor = SpeculativeExecutor({"socratic": SlowAgent()}, enabled=True, ttl_seconds=0.01)
+    executor.maybe_launch(turn(), EXPLANATION)
+    await asyncio.sleep(0.02)
+    assert await executor.take(turn(next_action="check_understanding")) is None
@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+import pytest
+from app.agents.base import BaseAgent
+from app.agents.registry import AgentRegistry
+from app.core import model_router as model_router_module
+from app.core.app_state import AppState
+from app.core.model_router import ModelRouter, get_model_router, import_sdk
+from app.core.orchestrator import AgentOrchestrator
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class CountingAgent(BaseAgent):
+    built = 0
+
+    def __init__(self, model_router):
+        super().__init__(model_router)
+        CountingAgent.built += 1
+
+    async def process(self, input_data):
+        raise NotImplementedError
+
+def test_registry_builds_agents_on_first_access():
+    CountingAgent.built = 0
+    registry = AgentRegistry(model_router=None)
+    registry.register("counting", CountingAgent)
+    # Membership and names don't construct anything
+    assert "counting" in registry
+    assert "missing" not in registry
+    assert list(registry) == ["counting"]
+    assert CountingAgent.built == 0 and registry.loaded == []
+
+    agent = registry["counting"]
+    assert registry["counting"] is agent
+    assert CountingAgent.built == 1
+    assert registry.loaded == ["counting"]
+
+    # Re-registering drops the built instance
+    registry.register("counting", CountingAgent)
+    assert registry.loaded == []
+    with pytest.raises(KeyError):
+        registry["missing"]
+
+def test_orchestrator_builds_no_agents_up_front():
+    orchestrator = AgentOrchestrator(ModelRouter(cache=None))
+    assert set(orchestrator.agents) == {"diagnosis", "explanation", "socratic", "memory", "adaptation"}
+    assert orchestrator.agents.loaded == []
+
+    agent = CountingAgent(orchestrator.model_router)
+    orchestrator.register_agent("custom", agent)
+    assert orchestrator.agents["custom"] is agent
+
+@pytest.mark.anyio
+async def test_sdks_are_imported_once_on_first_use(monkeypatch):
+    imported = []
+    monkeypatch.setattr(model_router_module, "_sdks", {})
+    monkeypatch.setattr(model_router_module.importlib, "import_module", lambda name: imported.append(name) or name.upper())
+    assert await import_sdk("fake.sdk") == "FAKE.SDK"
+    assert await import_sdk("fake.sdk") == "FAKE.SDK"
+    assert imported == ["fake.sdk"]
+
+def test_app_import_does_not_load_provider_sdks():
+    code = "import sys, app.main; print(sorted(m for m in ('google.generativeai', 'openai') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+def test_services_are_created_in_the_lifespan(client):
+    services = client.app.state.services
+    assert isinstance(services, AppState)
+    assert services.model_router is get_model_router()
+    assert services.orchestrator.model_router is services.model_router
+    assert client.get("/api/models").status_code == 200
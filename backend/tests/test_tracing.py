@@ -0,0 +1,77 @@
+import pytest
+from conftest import chat_payload
+from app.core.model_router import ModelRouter
+from app.core.tracing import (
+    OVERFLOW_LABEL, SPAN_SECONDS, Counter, Histogram, MetricsRegistry, end_trace, span, start_trace, timing_breakdown
+)
+
+def test_span_feeds_histogram_and_trace():
+    trace, token = start_trace()
+    try:
+        with span("unit.phase", agent="tester", model="local-stub"):
+            pass
+        with pytest.raises(RuntimeError):
+            with span("unit.failing"):
+                raise RuntimeError("boom")
+        breakdown = timing_breakdown()
+    finally:
+        end_trace(token)
+    assert [s["span"] for s in breakdown["spans"]] == ["unit.phase", "unit.failing"]
+    assert breakdown["spans"][0]["agent"] == "tester"
+    assert timing_breakdown() is None
+
+def test_registry_renders_exposition_format():
+    registry = MetricsRegistry()
+    counter = registry.counter("things_total", "Things", ("kind",))
+    histogram = registry.histogram("thing_seconds", "Thing time", ("kind",), buckets=(0.1, 1.0))
+    registry.register_collector(lambda: [("thing_depth", "gauge", "Depth", [({"queue": "a"}, 3)])])
+    counter.inc(kind='say "hi"')
+    histogram.observe(0.5, kind="a")
+
+    text = registry.render()
+    assert 'things_total{kind="say \\"hi\\""} 1.0' in text
+    assert 'thing_seconds_bucket{kind="a",le="0.1"} 0' in text
+    assert 'thing_seconds_bucket{kind="a",le="1.0"} 1' in text
+    assert 'thing_seconds_count{kind="a"} 1' in text
+    assert 'thing_depth{queue="a"} 3' in text
+
+def test_label_cardinality_is_bounded():
+    counter = Counter("c", "c", ("model",), max_series=2)
+    histogram = Histogram("h", "h", ("model",), max_series=2)
+    for i in range(10):
+        counter.inc(model=f"m{i}")
+        histogram.observe(0.1, model=f"m{i}")
+    assert set(counter._values) == {("m0",), ("m1",), (OVERFLOW_LABEL,)}
+    assert counter._values[(OVERFLOW_LABEL,)] == 8
+    assert len(histogram._series) == 3
+    # Known series keep counting on their own
+    counter.inc(model="m0")
+    assert counter._values[("m0",)] == 2
+
+def test_chat_is_traced_and_exported(client, auth_headers):
+    response = client.post("/api/chat", headers=auth_headers, json=chat_payload("What is a tree?", target_agent="explanation", research_mode=True))
+    assert response.status_code == 200
+    spans = {s["span"] for s in response.json()["metadata"]["timing"]["spans"]}
+    assert {"auth.decode", "session.resolve", "history.load", "orchestrator", "agent", "llm", "persist.enqueue"} <= spans
+
+    text = client.get("/metrics").text
+    assert 'app_span_duration_seconds_count{span="llm",agent="",model="local-stub"}' in text
+    assert 'http_requests_total{method="POST",route="/api/chat",status="200"}' in text
+
+@pytest.mark.parametrize("path", ["/api/chat", "/api/chat/stream"])
+def test_unknown_model_is_rejected(client, auth_headers, path):
+    payload = dict(chat_payload("hi"), selected_model="bogus-model")
+    response = client.post(path, headers=auth_headers, json=payload)
+    assert response.status_code == 400
+    assert "bogus-model" in response.json()["detail"]
+    assert 'model="bogus-model"' not in client.get("/metrics").text
+
+@pytest.mark.anyio
+async def test_router_rejects_unknown_model_before_scheduling():
+    router = ModelRouter(cache=None)
+    with pytest.raises(ValueError):
+        await router.generate("bogus-model", "system", "hello")
+    with pytest.raises(ValueError):
+        [chunk async for chunk in router.stream_response("bogus-model", "system", "hello")]
+    assert not any("bogus-model" in key for key in SPAN_SECONDS._series)
+    assert router.get_routing_stats()["models"] == {}
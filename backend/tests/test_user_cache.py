@@ -0,0 +1,88 @@
+import asyncio
+import time
+import pytest
+from app.services.user_cache import CurrentUser, InvalidationStamp, UserCache, user_cache
+
+def snapshot(user_id=1, email="a@example.com", **preferences):
+    return CurrentUser(id=user_id, email=email, preferences=preferences)
+
+def test_users_are_cached_by_email_until_invalidated():
+    cache = UserCache()
+    cache.put_user(snapshot(theme="dark"), cache.load_token())
+    assert cache.get_user("a@example.com").preferences == {"theme": "dark"}
+    cache.invalidate_user(1, "a@example.com")
+    assert cache.get_user("a@example.com") is None
+    assert cache.stats()["hits"]["user"] == 1
+    assert cache.stats()["misses"]["user"] == 1
+
+def test_load_racing_an_invalidation_is_not_cached():
+    cache = UserCache()
+    token = cache.load_token()
+    # A write lands while the loader is still querying
+    cache.invalidate_memory(1)
+    cache.put_memory(1, {"topics_learned": ["stale"]}, token)
+    assert cache.get_memory(1) is None
+
+    cache.put_memory(1, {"topics_learned": ["fresh"]}, cache.load_token())
+    assert cache.get_memory(1) == {"topics_learned": ["fresh"]}
+
+def test_memory_profiles_are_handed_out_as_copies():
+    cache = UserCache()
+    cache.put_memory(1, {"topics_learned": ["a"]}, cache.load_token())
+    cache.get_memory(1)["topics_learned"].append("b")
+    assert cache.get_memory(1) == {"topics_learned": ["a"]}
+
+def test_entries_are_bounded_and_expire():
+    cache = UserCache(max_entries=2, ttl_seconds=0.05)
+    for user_id in range(3):
+        cache.put_user(snapshot(user_id, f"{user_id}@example.com"), cache.load_token())
+    assert cache.get_user("0@example.com") is None
+    assert cache.get_user("2@example.com") is not None
+    time.sleep(0.06)
+    assert cache.get_user("2@example.com") is None
+
+def test_invalidations_reach_other_workers(tmp_path):
+    path = str(tmp_path / "stamp.db")
+    worker_a = UserCache(stamp=InvalidationStamp(path), stamp_check_interval=0)
+    worker_b = UserCache(stamp=InvalidationStamp(path), stamp_check_interval=0)
+    # Separate processes in production; tell the stamps apart by writer id
+    worker_b.stamp.writer = worker_a.stamp.writer + 1
+
+    worker_b.put_memory(7, {"topics_learned": ["old"]}, worker_b.load_token())
+    worker_a.invalidate_memory(7)
+    # Buffered until the background flush, never written on the caller's thread
+    assert worker_a.stats()["unpublished_invalidations"] == 1
+    assert worker_b.get_memory(7) == {"topics_learned": ["old"]}
+    worker_a.stamp.flush()
+    assert worker_b.get_memory(7) is None
+    assert worker_b.remote_invalidations == 1
+    # A worker ignores its own invalidations when polling
+    assert worker_a.stamp.poll() == []
+
+@pytest.mark.anyio
+async def test_background_task_publishes_invalidations(tmp_path):
+    path = str(tmp_path / "stamp.db")
+    cache = UserCache(stamp=InvalidationStamp(path, flush_interval=0.01))
+    other = InvalidationStamp(path)
+    other.writer = cache.stamp.writer + 1
+    cache.start()
+    try:
+        cache.invalidate_user(3)
+        await asyncio.sleep(0.1)
+        assert other.poll() == [(3, "user")]
+    finally:
+        await cache.stop()
+    # Stopping flushes what is still buffered
+    cache.invalidate_memory(4)
+    await cache.stop()
+    assert other.poll() == [(4, "memory")]
+
+def test_profile_update_invalidates_the_cached_user(client, auth_headers):
+    # First request loads the user, the second is served from the cache
+    client.get("/api/profile", headers=auth_headers)
+    hits = user_cache.stats()["hits"]["user"]
+    client.get("/api/profile", headers=auth_headers)
+    assert user_cache.stats()["hits"]["user"] == hits + 1
+
+    client.put("/api/profile/update", headers=auth_headers, json={"research_mode": True})
+    assert client.get("/api/profile", headers=auth_headers).json()["preferences"]["research_mode"] is True